@@ -4,7 +4,7 @@ from fastapi import APIRouter
 from app.api.v1.endpoints import (
     image_generation, auth, character, chat, entity,
     feedback, conversation_intent, interaction, message, session,
-    user, user_preference, models
+    user, user_preference, models, metrics
 )
 
 api_router = APIRouter()
@@ -30,4 +30,7 @@ api_router.include_router(session.router, prefix="/session", tags=["Session"])
 api_router.include_router(message.router, prefix="/messages", tags=["Messages"])
 
 # Feedback route
-api_router.include_router(feedback.router, prefix="/feedback", tags=["Feedback"])
\ No newline at end of file
+api_router.include_router(feedback.router, prefix="/feedback", tags=["Feedback"])
+
+# Runtime metrics
+api_router.include_router(metrics.router, prefix="/metrics", tags=["Metrics"])
\ No newline at end of file
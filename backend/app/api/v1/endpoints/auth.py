@@ -3,8 +3,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from app.core.security import create_access_token, get_current_user
+from app.core.security import create_access_token
+from app.core.dependencies import get_current_identity
 from app.schemas.schemas import UserCreate, Token, UserRead
+from app.services.db.user_cache import UserIdentity
 from app.services.db.user_manager import UserManager
 from app.services.db.database_setup import get_db
 from datetime import timedelta
@@ -45,8 +47,5 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), use
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=UserRead)
-async def read_users_me(current_user_email: str = Depends(get_current_user), user_manager: UserManager = Depends(get_user_manager)):
-    user = user_manager.get_user_by_email(current_user_email)
-    if user is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-    return user
\ No newline at end of file
+async def read_users_me(current_user: UserIdentity = Depends(get_current_identity)):
+    return current_user
\ No newline at end of file
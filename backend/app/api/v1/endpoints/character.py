@@ -5,6 +5,7 @@ from app.schemas.schemas import CharacterCreate, CharacterRead, CharacterUpdate
 from app.services.db.character_database import CharacterDatabase
 from app.services.characters.character_details import CHARACTER_DETAILS
 from app.services.db.database_setup import get_db
+from app.core.dependencies import get_chatbot_registry
 
 router = APIRouter()
 
@@ -44,6 +45,7 @@ def update_character(character_id: int, character_update: CharacterUpdate, db: S
     )
     if updated_character is None:
         raise HTTPException(status_code=404, detail=CHARACTER_NOT_FOUND)
+    get_chatbot_registry().invalidate(character_id)
     return updated_character
 
 @router.delete("/{character_id}")
@@ -52,6 +54,7 @@ def delete_character(character_id: int, db: Session = Depends(get_db)):
     deleted = character_database.delete_character(character_id)
     if not deleted:
         raise HTTPException(status_code=404, detail=CHARACTER_NOT_FOUND)
+    get_chatbot_registry().invalidate(character_id)
     return {"message": "Character deleted successfully"}
 
 @router.get("", response_model=List[CharacterRead])
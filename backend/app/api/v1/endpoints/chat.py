@@ -1,30 +1,39 @@
 # app/api/v1/endpoints/chat.py
 
+import asyncio
+import json
 import uuid
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
 from app.schemas.schemas import ChatInput, ChatInputMessage, ImageGenerationRequest, ImageGenerationResponse, UserCreate, MessageRead
-from app.services.ai.lm_client import LMStudioClient
+from app.services.ai.model_registry import ModelRegistry
 from app.services.chat.context_manager import ChatContextManager
 from app.services.nlp.casual_conversation_handler import CasualConversation
 from app.services.ai.personalized_chatbot import PersonalizedChatbot
-from app.services.db.interaction_manager import InteractionManager
-from app.services.db.character_database import CharacterDatabase
+from app.services.ai.chatbot_registry import ChatbotRegistry
+from app.services.ai.trait_store import TraitStore
+from app.services.ai.prompt_assembler import TokenUsage
+from app.services.db.aio.character_database import AsyncCharacterDatabase
 from app.services.ai.comfy_ui_service import ComfyUIService
-from app.services.db.user_manager import UserManager
+from app.services.db.aio.user_manager import AsyncUserManager
+from app.services.post_response_queue import PostResponseQueue
+from app.services.interaction_recorder import InteractionRecorder
 from app.models.messages import Message
+from app.utils.stage_timings import StageTimings, chat_stage_stats
 from app.core.dependencies import (
-    get_db,
     get_comfy_ui_service,
-    get_lm_client,
+    get_model_registry,
     get_context_manager,
     get_casual_conversation_handler,
-    get_interaction_manager,
-    get_character_database,
-    get_user_manager
+    get_post_response_queue,
+    get_interaction_recorder,
+    get_async_character_database,
+    get_chatbot_registry,
+    get_trait_store,
+    get_async_user_manager
 )
 import logging
-from typing import Dict, Any, List, Optional
+from typing import AsyncGenerator, Dict, Any, List, Optional, Tuple
 import time
 
 router = APIRouter()
@@ -36,58 +45,92 @@ DEFAULT_TEST_USER_ID = "test_user_001"
 @router.post("/completions", response_model=Dict[str, Any])
 async def chat_endpoint(
     chat_input: ChatInput,
-    db: Session = Depends(get_db),
+    response: Response,
     comfy_ui: ComfyUIService = Depends(get_comfy_ui_service),
-    lm_client: LMStudioClient = Depends(get_lm_client),
+    model_registry: ModelRegistry = Depends(get_model_registry),
     context_manager: ChatContextManager = Depends(get_context_manager),
     casual_conversation_handler: CasualConversation = Depends(get_casual_conversation_handler),
-    interaction_manager: InteractionManager = Depends(get_interaction_manager),
-    character_database: CharacterDatabase = Depends(get_character_database),
-    user_manager: UserManager = Depends(get_user_manager)
+    post_response_queue: PostResponseQueue = Depends(get_post_response_queue),
+    interaction_recorder: InteractionRecorder = Depends(get_interaction_recorder),
+    character_database: AsyncCharacterDatabase = Depends(get_async_character_database),
+    chatbot_registry: ChatbotRegistry = Depends(get_chatbot_registry),
+    user_manager: AsyncUserManager = Depends(get_async_user_manager)
 ):
+    timings = StageTimings()
     try:
-        # Validate model
-        loaded_models = await lm_client.get_models()
-        if chat_input.model not in [model["id"] for model in loaded_models["data"]]:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Model '{chat_input.model}' is not loaded."
-            )
-
         # Extract user message and context
         last_message: ChatInputMessage = chat_input.messages[-1]
         user_message = last_message.content
+        request_started = time.time()
 
-        # Ensure the default test user exists
-        user = user_manager.get_or_create_test_user(
-            user_id=DEFAULT_TEST_USER_ID,
-            username="Test User",
-            email="testuser@example.com",
-            password="test_password"
+        # Stage 1: validate the model while the user and the character's chatbot are looked up.
+        # Both lookups share the request's DB session, so they run one after the other.
+        model_loaded, (user, personalized_chatbot) = await asyncio.gather(
+            timings.timed("model", model_registry.is_model_loaded(chat_input.model)),
+            timings.timed("lookup", resolve_user_and_chatbot(
+                user_manager, chatbot_registry, chat_input.character_id, character_database
+            ))
         )
+        if not model_loaded:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Model '{chat_input.model}' is not loaded."
+            )
 
         if not user:
             raise HTTPException(status_code=500, detail="Failed to create or retrieve test user")
 
         user_id = user.user_id  # Use the actual user ID from the database
         logging.info(f"Using user with id: {user_id}")
+        character_id = personalized_chatbot.character.id
 
-        context = context_manager.get_context(user_id)
-
-        # Get or create character
-        character_id = chat_input.character_id or character_database.get_or_create_default_character()
-        personalized_chatbot = PersonalizedChatbot(character_id, character_database)
-
-        # Generate response
         if GENERATE_IMAGE in user_message.lower():
             return await generate_image(user_message, character_id, comfy_ui)
-        else:
-            generated_response = await generate_chat_response(
-                user_message,
-                context,
-                casual_conversation_handler,
-                personalized_chatbot
+
+        # Stage 2: everything that only needs the user and the chatbot
+        context, summary, _ = await asyncio.gather(
+            timings.timed("context", context_manager.get_context(user_id)),
+            timings.timed("summary", context_manager.get_summary(user_id)),
+            timings.timed("traits", personalized_chatbot.load_traits(user_id))
+        )
+
+        # Stage 3: generate; trait analysis runs alongside the LLM call
+        if chat_input.stream:
+            return StreamingResponse(
+                stream_chat_response(
+                    chat_input.model,
+                    user_message,
+                    user_id,
+                    character_id,
+                    context,
+                    summary,
+                    casual_conversation_handler,
+                    personalized_chatbot,
+                    post_response_queue,
+                    interaction_recorder,
+                    timings
+                ),
+                media_type="text/event-stream",
+                headers={
+                    "Cache-Control": "no-cache",
+                    "X-Accel-Buffering": "no",
+                    # Only the stages before the first token; the rest end up in the metrics
+                    "Server-Timing": timings.server_timing()
+                }
             )
+        else:
+            usage = TokenUsage()
+            with timings.stage("generate"):
+                generated_response = await generate_chat_response(
+                    user_message,
+                    user_id,
+                    context,
+                    casual_conversation_handler,
+                    personalized_chatbot,
+                    usage,
+                    summary,
+                    timings
+                )
 
         logging.debug(f"Generated response from generate_chat_response: {generated_response}")
         logging.debug(f"Generated response type: {type(generated_response)}")
@@ -101,33 +144,48 @@ async def chat_endpoint(
             response_role = "assistant"
 
         # Create a MessageRead object
-        message_read = MessageRead(
-            id=str(uuid.uuid4()),
-            role=response_role,
-            content=response_content,
-            user_id=user_id,
-            timestamp=time.time(),
-            relevance=1.0
-        )
+        user_turn = build_message_read(user_id, user_message, "user", timestamp=request_started)
+        message_read = build_message_read(user_id, response_content, response_role)
         logging.debug(f"Created MessageRead object: {message_read}")
         logging.debug(f"MessageRead content type: {type(message_read.content)}")
 
-        # Update context and record interaction
-        context_manager.update_context(user_id, [message_read])
-        interaction_manager.create_interaction(user_id, character_id, "chat_completion")
+        # Stage 4: queue the context update and buffer the interaction; neither is awaited here
+        with timings.stage("update"):
+            await queue_bookkeeping(post_response_queue, interaction_recorder, user_id, character_id, [user_turn, message_read])
 
-        # Get adaptive traits
-        character = character_database.get_character_by_id(character_id)
-        adaptive_traits = character.personality_traits if character else None
+        # Get this user's adaptive traits for the character
+        adaptive_traits = personalized_chatbot.get_personality_traits(user_id)
 
-        formatted_response = format_chat_response(chat_input.model, message_read.content, adaptive_traits)
+        formatted_response = format_chat_response(chat_input.model, message_read.content, adaptive_traits, usage)
         logging.debug(f"Formatted response: {formatted_response}")
+        response.headers["Server-Timing"] = timings.server_timing()
+        chat_stage_stats.record(timings)
         return formatted_response
 
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"API call failed: {str(e)}", exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
+async def resolve_user_and_chatbot(
+    user_manager: AsyncUserManager,
+    chatbot_registry: ChatbotRegistry,
+    character_id: Optional[int],
+    character_database: AsyncCharacterDatabase
+) -> Tuple[Any, PersonalizedChatbot]:
+    """Ensure the default test user exists and get the shared chatbot for the character, falling back to the default."""
+    user = await get_test_user(user_manager)
+    return user, await chatbot_registry.get_chatbot_async(character_id, character_database)
+
+async def get_test_user(user_manager: AsyncUserManager):
+    return await user_manager.get_or_create_test_user(
+        user_id=DEFAULT_TEST_USER_ID,
+        username="Test User",
+        email="testuser@example.com",
+        password="test_password"
+    )
+
 async def generate_image(user_message: str, character_id: int, comfy_ui: ComfyUIService) -> ImageGenerationResponse:
     image_request = ImageGenerationRequest(prompt=extract_image_prompt(user_message), character_id=character_id)
     try:
@@ -145,19 +203,135 @@ async def generate_image(user_message: str, character_id: int, comfy_ui: ComfyUI
 
 async def generate_chat_response(
     user_message: str,
+    user_id: str,
     context: List[str],
     casual_conversation_handler: CasualConversation,
-    personalized_chatbot: PersonalizedChatbot
+    personalized_chatbot: PersonalizedChatbot,
+    usage: Optional[TokenUsage] = None,
+    summary: Optional[str] = None,
+    timings: Optional[StageTimings] = None
 ) -> str:
     if casual_conversation_handler.casual_conversation(user_message):
-        return await casual_conversation_handler.generate_casual_conversation_response(user_message, context)
+        return await casual_conversation_handler.generate_casual_conversation_response(user_message, context, usage, summary)
+    else:
+        return await personalized_chatbot.generate_response(user_message, context, user_id, usage, summary, timings)
+
+async def stream_chat_response(
+    model: str,
+    user_message: str,
+    user_id: str,
+    character_id: int,
+    context: List[Message],
+    summary: Optional[str],
+    casual_conversation_handler: CasualConversation,
+    personalized_chatbot: PersonalizedChatbot,
+    post_response_queue: PostResponseQueue,
+    interaction_recorder: InteractionRecorder,
+    timings: Optional[StageTimings] = None
+) -> AsyncGenerator[str, None]:
+    completion_id = f"chatcmpl-{int(time.time())}"
+    created = int(time.time())
+
+    # Send the role straight away so the client can render the reply bubble
+    yield format_sse(format_chat_chunk(completion_id, created, model, {"role": "assistant", "content": ""}))
+
+    timings = timings or StageTimings()
+    usage = TokenUsage()
+    if casual_conversation_handler.casual_conversation(user_message):
+        deltas = casual_conversation_handler.stream_casual_conversation_response(user_message, context, usage, summary)
     else:
-        return await personalized_chatbot.generate_response(user_message, context)
+        deltas = personalized_chatbot.stream_response(user_message, context, user_id, usage, summary, timings)
+
+    parts: List[str] = []
+    generate_started = time.perf_counter()
+    try:
+        async for delta in deltas:
+            if not parts:
+                timings.stages["first_token"] = time.perf_counter() - generate_started
+            parts.append(delta)
+            yield format_sse(format_chat_chunk(completion_id, created, model, {"content": delta}))
+    except Exception as e:
+        # The client has part of a reply; end the stream as failed and keep the fragment out of the context
+        logging.error(f"Streaming failed after {len(parts)} chunks: {str(e)}", exc_info=True)
+        error_chunk = format_chat_chunk(completion_id, created, model, {}, finish_reason="error")
+        error_chunk["error"] = {"message": "The response was interrupted.", "type": "generation_error"}
+        error_chunk["usage"] = usage.as_dict()
+        yield format_sse(error_chunk)
+        yield "data: [DONE]\n\n"
+        return
+    timings.stages["generate"] = time.perf_counter() - generate_started
+
+    # Bookkeeping happens once the last token is out, so it never delays the stream
+    adaptive_traits = None
+    try:
+        user_turn = build_message_read(user_id, user_message, "user", timestamp=created)
+        message_read = build_message_read(user_id, "".join(parts))
+        with timings.stage("update"):
+            await queue_bookkeeping(post_response_queue, interaction_recorder, user_id, character_id, [user_turn, message_read])
+        adaptive_traits = personalized_chatbot.get_personality_traits(user_id)
+    except Exception as e:
+        logging.error(f"Post-stream bookkeeping failed: {str(e)}", exc_info=True)
+    chat_stage_stats.record(timings)
+
+    final_chunk = format_chat_chunk(completion_id, created, model, {}, finish_reason="stop")
+    final_chunk["adaptive_traits"] = adaptive_traits
+    final_chunk["usage"] = usage.as_dict()
+    yield format_sse(final_chunk)
+    yield "data: [DONE]\n\n"
+
+async def queue_bookkeeping(
+    post_response_queue: PostResponseQueue,
+    interaction_recorder: InteractionRecorder,
+    user_id: str,
+    character_id: Optional[int],
+    messages: List[MessageRead]
+) -> None:
+    await post_response_queue.submit("context", (user_id, messages), key=user_id)
+    interaction_recorder.record(user_id, character_id, "chat_completion")
+
+def build_message_read(user_id: str, content: str, role: str = "assistant", timestamp: Optional[float] = None) -> MessageRead:
+    return MessageRead(
+        id=str(uuid.uuid4()),
+        role=role,
+        content=content,
+        user_id=user_id,
+        timestamp=timestamp if timestamp is not None else time.time(),
+        relevance=1.0
+    )
+
+def format_sse(payload: Dict[str, Any]) -> str:
+    return f"data: {json.dumps(payload)}\n\n"
+
+def format_chat_chunk(
+    completion_id: str,
+    created: int,
+    model: str,
+    delta: Dict[str, Any],
+    finish_reason: Optional[str] = None
+) -> Dict[str, Any]:
+    return {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "delta": delta,
+                "finish_reason": finish_reason
+            }
+        ]
+    }
 
 def extract_image_prompt(message: str) -> str:
     return message.lower().replace(GENERATE_IMAGE, "").strip()
 
-def format_chat_response(model: str, generated_response: str, adaptive_traits: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+def format_chat_response(
+    model: str,
+    generated_response: str,
+    adaptive_traits: Optional[Dict[str, Any]],
+    usage: Optional[TokenUsage] = None
+) -> Dict[str, Any]:
     return {
         "id": f"chatcmpl-{int(time.time())}",
         "object": "chat.completion",
@@ -173,31 +347,28 @@ def format_chat_response(model: str, generated_response: str, adaptive_traits: O
                 "finish_reason": "stop"
             }
         ],
-        "usage": {
-            "prompt_tokens": 0,
-            "completion_tokens": 0,
-            "total_tokens": 0
-        },
+        "usage": (usage or TokenUsage()).as_dict(),
         "adaptive_traits": adaptive_traits
     }
 
 @router.get("/adaptive-traits/{character_id}")
 async def get_adaptive_traits(
     character_id: int,
-    character_database: CharacterDatabase = Depends(get_character_database)
+    user_id: Optional[str] = None,
+    trait_store: TraitStore = Depends(get_trait_store),
+    user_manager: AsyncUserManager = Depends(get_async_user_manager)
 ):
     try:
-        character = character_database.get_character_by_id(character_id)
-        
-        if character and character.personality_traits:
-            return character.personality_traits
-        else:
-            return {
-                "formality": 0,
-                "enthusiasm": 0,
-                "humor": 0,
-                "empathy": 0,
-            }
+        if user_id is None:
+            user = await get_test_user(user_manager)
+            if not user:
+                raise HTTPException(status_code=500, detail="Failed to create or retrieve test user")
+            user_id = user.user_id
+
+        # Served from memory; only the first lookup for a pair reads the database
+        return await trait_store.load(user_id, character_id)
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Failed to get adaptive traits: {str(e)}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to get adaptive traits")
\ No newline at end of file
@@ -22,7 +22,7 @@ def create_interaction(
     interaction_manager: InteractionManager = Depends(get_interaction_manager),
     character_database: CharacterDatabase = Depends(get_character_database)
 ):
-    if interaction.character_id is None or not character_database.get_character_by_id(interaction.character_id):
+    if interaction.character_id is None or not character_database.get_profile(interaction.character_id):
         interaction.character_id = character_database.get_or_create_default_character()
     
     created_interaction = interaction_manager.create_interaction(
@@ -0,0 +1,47 @@
+# app/api/v1/endpoints/metrics.py
+
+from typing import Any, Dict
+from fastapi import APIRouter, Depends
+from app.services.ai.lm_client import get_pool_stats
+from app.services.ai.model_registry import ModelRegistry
+from app.services.ai.chatbot_registry import ChatbotRegistry
+from app.services.ai.prompt_assembler import get_prompt_assembler
+from app.services.nlp.nlp_service import get_nlp_engine_stats, get_nlp_worker_pool, get_nlp_micro_batcher
+from app.services.nlp.analysis_cache import get_analysis_cache
+from app.services.db.user_cache import get_user_cache
+from app.services.characters.character_cache import get_character_cache
+from app.utils.stage_timings import chat_stage_stats
+from app.core.dependencies import get_model_registry, get_chatbot_registry, get_trait_store, get_context_manager, get_post_response_queue, get_interaction_recorder
+
+router = APIRouter()
+
+@router.get("")
+async def metrics_endpoint(
+    model_registry: ModelRegistry = Depends(get_model_registry),
+    chatbot_registry: ChatbotRegistry = Depends(get_chatbot_registry)
+) -> Dict[str, Any]:
+    micro_batcher = get_nlp_micro_batcher()
+    summarizer = get_context_manager().summarizer
+    memory = get_context_manager().memory
+    return {
+        "chat_stages": chat_stage_stats.stats(),
+        "post_response_queue": get_post_response_queue().stats(),
+        "interaction_recorder": get_interaction_recorder().stats(),
+        "user_cache": get_user_cache().stats(),
+        "character_cache": get_character_cache().stats(),
+        "lm_client_pool": get_pool_stats(),
+        "model_registry": model_registry.stats(),
+        "chatbot_registry": chatbot_registry.stats(),
+        "trait_store": get_trait_store().stats(),
+        "context_store": get_context_manager().store.stats(),
+        "context_expiry": get_context_manager().expiry_stats(),
+        "context_memory": get_context_manager().memory_stats(),
+        "context_snapshot": get_context_manager().snapshot_stats(),
+        "context_summarizer": summarizer.stats() if summarizer else None,
+        "long_term_memory": memory.stats() if memory else None,
+        "prompt_assembler": get_prompt_assembler().stats(),
+        "nlp_engine": get_nlp_engine_stats(),
+        "nlp_worker_pool": get_nlp_worker_pool().stats(),
+        "nlp_micro_batcher": micro_batcher.stats() if micro_batcher else None,
+        "nlp_analysis_cache": get_analysis_cache().stats(),
+    }
\ No newline at end of file
@@ -2,16 +2,16 @@
 
 from fastapi import APIRouter, HTTPException, Depends, status
 from fastapi.responses import JSONResponse
-from app.services.ai.lm_client import LMStudioClient
-from app.core.dependencies import get_lm_client
+from app.services.ai.model_registry import ModelRegistry
+from app.core.dependencies import get_model_registry
 import logging
 
 router = APIRouter()
 
 @router.get("")
-async def models_endpoint(lm_client: LMStudioClient = Depends(get_lm_client)):
+async def models_endpoint(model_registry: ModelRegistry = Depends(get_model_registry)):
     try:
-        models = await lm_client.get_models()
+        models = await model_registry.get_models()
         return JSONResponse(status_code=status.HTTP_200_OK, content=models)
     except Exception as e:
         logging.error(f"API call failed: {e}")
@@ -2,28 +2,63 @@
 
 import asyncio
 import os
-from typing import Optional, Generator
+from typing import AsyncGenerator, Optional, Generator
 from sqlalchemy.orm import Session
-from fastapi import Depends
-from app.services.db.database_setup import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import Depends, HTTPException, status
+from app.services.db.database_setup import SessionLocal, get_async_session_factory
+from app.core.config import settings
+from app.core.security import get_current_user
 
 from app.services.ai.comfy_ui_service import ComfyUIService
 from app.services.ai.lm_client import LMStudioClient
+from app.services.ai.model_registry import ModelRegistry
+from app.services.ai.trait_store import TraitStore
+from app.services.ai.chatbot_registry import ChatbotRegistry
 from app.services.chat.context_manager import ChatContextManager
+from app.services.chat.context_store import create_context_store
+from app.services.chat.conversation_summarizer import ConversationSummarizer
+from app.services.chat.long_term_memory import get_long_term_memory
+from app.services.chat.memory_budget import SpillStore
 from app.services.nlp.casual_conversation_handler import CasualConversation
 from app.services.db.interaction_manager import InteractionManager
 from app.services.db.character_database import CharacterDatabase
 from app.services.db.user_manager import UserManager
+from app.services.db.user_cache import UserIdentity
 from app.services.db.user_preference_manager import UserPreferenceManager
 from app.services.db.session_manager import SessionManager
 from app.services.db.message_manager import MessageManager
 from app.services.db.conversation_intent_manager import ConversationIntentManager
+from app.services.db.aio import AsyncCharacterDatabase, AsyncUserManager
 from app.services.nlp.nlp_service import NLPService
 from app.services.chat.chat_response_handler import ChatResponseHandler
+from app.services.post_response_queue import PostResponseQueue, create_post_response_queue
+from app.services.interaction_recorder import InteractionRecorder
 
 # ComfyUIService instance
 _comfy_ui_service = None
 
+# LMStudioClient instance, backed by the process-wide connection pool
+_lm_client = None
+
+# ModelRegistry instance
+_model_registry = None
+
+# ChatContextManager instance, shared by every request and the background tasks
+_context_manager = None
+
+# Per-(user, character) adaptive trait state
+_trait_store = None
+
+# ChatbotRegistry instance, one chatbot per character
+_chatbot_registry = None
+
+# Queue for work done after a chat reply is sent
+_post_response_queue = None
+
+# Write-behind buffer for interaction rows
+_interaction_recorder = None
+
 def get_comfy_ui_service() -> ComfyUIService:
     global _comfy_ui_service
     if _comfy_ui_service is None:
@@ -60,11 +95,60 @@ def get_db() -> Generator[Session, None, None]:
     finally:
         db.close()
 
-def get_lm_client():
-    return LMStudioClient()
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with get_async_session_factory()() as db:
+        yield db
+
+def get_lm_client() -> LMStudioClient:
+    global _lm_client
+    if _lm_client is None:
+        _lm_client = LMStudioClient()
+    return _lm_client
+
+def get_model_registry() -> ModelRegistry:
+    global _model_registry
+    if _model_registry is None:
+        _model_registry = ModelRegistry(get_lm_client())
+    return _model_registry
+
+def get_trait_store() -> TraitStore:
+    global _trait_store
+    if _trait_store is None:
+        _trait_store = TraitStore()
+    return _trait_store
+
+def get_chatbot_registry() -> ChatbotRegistry:
+    global _chatbot_registry
+    if _chatbot_registry is None:
+        _chatbot_registry = ChatbotRegistry(get_trait_store())
+    return _chatbot_registry
+
+def get_context_manager() -> ChatContextManager:
+    global _context_manager
+    if _context_manager is None:
+        store = create_context_store()
+        spill = SpillStore(settings.CONTEXT_SPILL_DIR) if settings.CONTEXT_SPILL_DIR else None
+        _context_manager = ChatContextManager(
+            store,
+            max_length=settings.CONTEXT_ACTIVE_WINDOW,
+            summarizer=ConversationSummarizer(store, get_lm_client()) if settings.CONTEXT_SUMMARY_ENABLED else None,
+            memory=get_long_term_memory(),
+            spill=spill,
+            snapshot_path=settings.CONTEXT_SNAPSHOT_PATH or None
+        )
+    return _context_manager
 
-def get_context_manager():
-    return ChatContextManager()
+def get_post_response_queue() -> PostResponseQueue:
+    global _post_response_queue
+    if _post_response_queue is None:
+        _post_response_queue = create_post_response_queue(get_context_manager())
+    return _post_response_queue
+
+def get_interaction_recorder() -> InteractionRecorder:
+    global _interaction_recorder
+    if _interaction_recorder is None:
+        _interaction_recorder = InteractionRecorder()
+    return _interaction_recorder
 
 def get_casual_conversation_handler():
     return CasualConversation()
@@ -93,5 +177,25 @@ def get_nlp_service():
 def get_interaction_manager(db: Session = Depends(get_db)):
     return InteractionManager(db)
 
+def get_async_character_database(db: AsyncSession = Depends(get_async_db)) -> AsyncCharacterDatabase:
+    return AsyncCharacterDatabase(db)
+
+def get_async_user_manager(db: AsyncSession = Depends(get_async_db)):
+    return AsyncUserManager(db)
+
+async def get_current_identity(
+    subject: str = Depends(get_current_user),
+    user_manager: AsyncUserManager = Depends(get_async_user_manager)
+) -> UserIdentity:
+    """The authenticated user, resolved from the access token's subject through the user cache."""
+    identity = await user_manager.get_identity_by_token_subject(subject)
+    if identity is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return identity
+
 def get_chat_response_handler():
     return ChatResponseHandler()
\ No newline at end of file
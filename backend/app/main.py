@@ -6,19 +6,20 @@ from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy import text
 from app.api.v1 import api_router
 from app.core.config import settings
-from app.services.chat.context_manager import ChatContextManager
+from app.services.ai.lm_client import get_shared_http_client, close_shared_http_client, get_pool_stats
+from app.services.redis_client import close_redis
 from app.services.background_tasks import start_background_tasks
 from contextlib import asynccontextmanager
-from app.services.db.database_setup import init_db, get_db
+from app.services.db.database_setup import init_db, get_db, dispose_async_engine
 from app.services.db.character_database import CharacterDatabase
-from app.core.dependencies import get_comfy_ui_service
+from app.core.dependencies import get_comfy_ui_service, get_model_registry, get_trait_store, get_context_manager, get_post_response_queue, get_interaction_recorder
+from app.services.nlp.nlp_service import get_nlp_engine, get_nlp_worker_pool, shutdown_nlp_worker_pool
+import asyncio
 import nltk
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-context_manager = ChatContextManager()
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.debug("Starting application lifespan.")
@@ -49,7 +50,13 @@ async def startup_tasks():
     
     comfy_ui_service = get_comfy_ui_service()
     await comfy_ui_service.connect()
-    await start_background_tasks(context_manager)
+    get_shared_http_client()
+    get_model_registry().start()
+    get_trait_store().start()
+    get_context_manager().start()
+    get_post_response_queue().start()
+    get_interaction_recorder().start()
+    await start_background_tasks(get_context_manager())
 
     # Ensure NLTK data is downloaded
     try:
@@ -57,10 +64,24 @@ async def startup_tasks():
     except LookupError:
         nltk.download('stopwords')
 
+    # Warm the shared NLP engine so the first chat request doesn't pay for loading spaCy
+    await asyncio.to_thread(get_nlp_engine)
+    get_nlp_worker_pool()
+
 async def shutdown_tasks():
-    await context_manager.shutdown()
+    # Apply queued context updates before the context manager takes its final snapshot
+    await get_post_response_queue().stop()
+    await get_context_manager().shutdown()
     comfy_ui_service = get_comfy_ui_service()
     await comfy_ui_service.disconnect()
+    await get_model_registry().stop()
+    await get_trait_store().stop()
+    await get_interaction_recorder().stop()
+    shutdown_nlp_worker_pool()
+    logger.info(f"LM Studio connection pool at shutdown: {get_pool_stats()}")
+    await close_shared_http_client()
+    await close_redis()
+    await dispose_async_engine()
     logger.debug("Shutting down application lifespan.")
 
 app = FastAPI(
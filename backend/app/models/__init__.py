@@ -15,6 +15,7 @@ from .feedback import Feedback
 from .session import Session
 from .user_preference import UserPreference
 from .image import GeneratedImage
+from .adaptive_trait import AdaptiveTrait
 
 def init_models():
     # This function doesn't need to do anything, 
@@ -35,5 +36,6 @@ __all__ = [
     "Feedback",
     "Session",
     "UserPreference",
+    "AdaptiveTrait",
     "init_models"
 ]
\ No newline at end of file
@@ -0,0 +1,18 @@
+# app/models/adaptive_trait.py
+from sqlalchemy import Column, String, Float, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship
+from .base import BaseModel
+
+class AdaptiveTrait(BaseModel):
+    __tablename__ = "adaptive_traits"
+    __table_args__ = (UniqueConstraint("user_id", "character_id", name="uq_adaptive_traits_user_character"),)
+
+    user_id = Column(String(36), ForeignKey('users.user_id'), nullable=False)
+    character_id = Column(ForeignKey('characters.id'), nullable=False)
+    formality = Column(Float, default=0.0)
+    enthusiasm = Column(Float, default=0.0)
+    humor = Column(Float, default=0.0)
+    empathy = Column(Float, default=0.0)
+
+    user = relationship("User")
+    character = relationship("Character")
\ No newline at end of file
@@ -60,6 +60,7 @@ class ChatInput(BaseSchema):
     temperature: float = Field(0.7, ge=0, le=1)
     max_tokens: int = Field(150, gt=0)
     character_id: Optional[int] = None
+    stream: bool = False
 
 class ConversationIntentBase(BaseSchema):
     conversation_intent_name: str
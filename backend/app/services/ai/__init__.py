@@ -1,5 +1,8 @@
 from .lm_client import LMStudioClient
+from .model_registry import ModelRegistry
 from .personalized_chatbot import PersonalizedChatbot
+from .chatbot_registry import ChatbotRegistry
+from .trait_store import TraitStore
 from .comfy_ui_service import ComfyUIService
 
-__all__ = ["LMStudioClient", "PersonalizedChatbot", "ComfyUIService"]
\ No newline at end of file
+__all__ = ["LMStudioClient", "ModelRegistry", "PersonalizedChatbot", "ChatbotRegistry", "TraitStore", "ComfyUIService"]
\ No newline at end of file
@@ -0,0 +1,123 @@
+# app/services/ai/chatbot_registry.py
+
+import logging
+from typing import Any, Dict, Optional
+from app.services.ai.personalized_chatbot import PersonalizedChatbot
+from app.services.ai.trait_store import TraitStore
+from app.services.characters.character_profile import CharacterProfile
+from app.services.db.character_database import CharacterDatabase
+from app.services.db.aio.character_database import AsyncCharacterDatabase
+
+class ChatbotRegistry:
+    """
+    One PersonalizedChatbot per character, built on first use and shared across requests.
+
+    Only persona state lives on the chatbots; per-user adaptive traits are kept in the
+    TraitStore so they survive between turns. Chatbots are built from the character
+    cache's profiles and dropped whenever its version moves, so a character edited in
+    any worker process is picked up without a lookup per request.
+    """
+
+    def __init__(self, trait_store: TraitStore):
+        self.trait_store = trait_store
+        self._chatbots: Dict[int, PersonalizedChatbot] = {}
+        self._default_character_id: Optional[int] = None
+        self._cache_version: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+
+    def get_chatbot(self, character_id: Optional[int], character_database: CharacterDatabase) -> PersonalizedChatbot:
+        """
+        Get the chatbot for a character, falling back to the default character.
+
+        Args:
+            character_id (Optional[int]): The requested character, or None/0 for the default.
+            character_database (CharacterDatabase): Used to load the character on a miss.
+
+        Returns:
+            PersonalizedChatbot: The shared chatbot for the resolved character.
+        """
+        character_database.refresh_cache()
+        chatbot = self._lookup(character_id, character_database.cache.version)
+        if chatbot is not None:
+            return chatbot
+
+        profile = character_database.get_profile(character_id) if character_id else None
+        if profile is None:
+            if character_id:
+                logging.warning(f"No character found for id: {character_id}. Using default adaptive personality.")
+            default_id = character_database.get_or_create_default_character()
+            chatbot = self._lookup_default(default_id)
+            if chatbot is not None:
+                return chatbot
+            profile = character_database.get_profile(default_id)
+
+        return self._build(profile)
+
+    async def get_chatbot_async(self, character_id: Optional[int], character_database: AsyncCharacterDatabase) -> PersonalizedChatbot:
+        """`get_chatbot` for the async database layer; misses are loaded without blocking the event loop."""
+        await character_database.refresh_cache()
+        chatbot = self._lookup(character_id, character_database.cache.version)
+        if chatbot is not None:
+            return chatbot
+
+        profile = await character_database.get_profile(character_id) if character_id else None
+        if profile is None:
+            if character_id:
+                logging.warning(f"No character found for id: {character_id}. Using default adaptive personality.")
+            default_id = await character_database.get_or_create_default_character()
+            chatbot = self._lookup_default(default_id)
+            if chatbot is not None:
+                return chatbot
+            profile = await character_database.get_profile(default_id)
+
+        return self._build(profile)
+
+    def _lookup(self, character_id: Optional[int], cache_version: int) -> Optional[PersonalizedChatbot]:
+        if cache_version != self._cache_version:
+            if self._cache_version is not None and self._chatbots:
+                self.rebuilds += 1
+            self.invalidate()
+            self._cache_version = cache_version
+        if not character_id:
+            character_id = self._default_character_id
+        chatbot = self._chatbots.get(character_id) if character_id else None
+        if chatbot is not None:
+            self.hits += 1
+        return chatbot
+
+    def _lookup_default(self, default_id: int) -> Optional[PersonalizedChatbot]:
+        self._default_character_id = default_id
+        chatbot = self._chatbots.get(default_id)
+        if chatbot is not None:
+            self.hits += 1
+        return chatbot
+
+    def _build(self, profile: CharacterProfile) -> PersonalizedChatbot:
+        self.misses += 1
+        # Another request may have built it while this one awaited the database
+        chatbot = self._chatbots.get(profile.id)
+        if chatbot is None:
+            chatbot = PersonalizedChatbot(profile, self.trait_store)
+            self._chatbots[profile.id] = chatbot
+        return chatbot
+
+    def invalidate(self, character_id: Optional[int] = None) -> None:
+        """Drop one cached chatbot, or all of them when no ID is given."""
+        if character_id is None:
+            self._chatbots.clear()
+            self._default_character_id = None
+        else:
+            self._chatbots.pop(character_id, None)
+            if character_id == self._default_character_id:
+                self._default_character_id = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "chatbots": len(self._chatbots),
+            "hits": self.hits,
+            "misses": self.misses,
+            "rebuilds": self.rebuilds,
+            "cache_version": self._cache_version,
+        }
\ No newline at end of file
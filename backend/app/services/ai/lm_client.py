@@ -1,27 +1,126 @@
 # app/services/ai/lm_client.py
 import datetime
+import json
 import httpx
 import logging
-from typing import List, Dict, Union, Optional
+from contextlib import contextmanager
+from typing import Any, AsyncGenerator, Callable, Iterator, List, Dict, Union, Optional
 from app.models import Message
 from app.schemas.schemas import ChatInputMessage
+from app.services.ai.prompt_assembler import TokenUsage
 from app.core.config import settings
 
+class PoolMetrics:
+    """Usage counters for the shared LM Studio connection pool."""
+
+    def __init__(self):
+        self.requests_total = 0
+        self.requests_failed = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    @contextmanager
+    def track(self) -> Iterator[None]:
+        """Count a request for as long as it holds a connection."""
+        self.requests_total += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            yield
+        except Exception:
+            self.requests_failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    def snapshot(self, client: Optional[httpx.AsyncClient]) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {
+            "requests_total": self.requests_total,
+            "requests_failed": self.requests_failed,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "max_connections": settings.LM_HTTP_MAX_CONNECTIONS,
+            "max_keepalive_connections": settings.LM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        }
+        # httpx does not expose its connection pool publicly, so read it defensively
+        pool = getattr(getattr(client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is not None:
+            stats["connections_open"] = len(connections)
+            stats["connections_idle"] = sum(1 for connection in connections if connection.is_idle())
+        return stats
+
+_shared_client: Optional[httpx.AsyncClient] = None
+pool_metrics = PoolMetrics()
+_model_missing_listeners: List[Callable[[str], None]] = []
+
+def add_model_missing_listener(listener: Callable[[str], None]) -> None:
+    """Register a callback invoked with the model id whenever LM Studio reports it missing."""
+    _model_missing_listeners.append(listener)
+
+def _notify_if_model_missing(error: httpx.HTTPStatusError, model: str) -> None:
+    if error.response.status_code in (400, 404) and "model" in error.response.text.lower():
+        for listener in _model_missing_listeners:
+            listener(model)
+
+def _http2_enabled() -> bool:
+    if not settings.LM_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logging.warning("LM_HTTP2 is set but the 'h2' package is not installed; falling back to HTTP/1.1.")
+        return False
+    return True
+
+def get_shared_http_client() -> httpx.AsyncClient:
+    """
+    Return the process-wide HTTP client used to talk to LM Studio.
+
+    The client is created on first use and reused until close_shared_http_client()
+    is called from the application lifespan.
+
+    Returns:
+        httpx.AsyncClient: The shared, pooled client.
+    """
+    global _shared_client
+    if _shared_client is None or _shared_client.is_closed:
+        _shared_client = httpx.AsyncClient(
+            base_url=settings.CURRENT_API_BASE_URL,
+            timeout=httpx.Timeout(settings.LM_HTTP_TIMEOUT, connect=settings.LM_HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=settings.LM_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.LM_HTTP_KEEPALIVE_EXPIRY
+            ),
+            http2=_http2_enabled()
+        )
+    return _shared_client
+
+async def close_shared_http_client() -> None:
+    """Close the shared client and release its pooled connections."""
+    global _shared_client
+    if _shared_client is not None and not _shared_client.is_closed:
+        await _shared_client.aclose()
+    _shared_client = None
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Return usage counters and connection counts for the shared pool."""
+    return pool_metrics.snapshot(_shared_client)
+
 class LMStudioClient:
     def __init__(self, client: Optional[httpx.AsyncClient] = None):
-        self.client = client
-        self._client_created = client is None
-        if self._client_created:
-            self.client = httpx.AsyncClient(
-                base_url=settings.CURRENT_API_BASE_URL,
-                timeout=httpx.Timeout(300.0, connect=60.0)
-            )
+        self.client = client or get_shared_http_client()
 
     async def close(self) -> None:
-        """Close the client session if it was created by this instance."""
-        if self._client_created and not self.client.is_closed:
-            await self.client.aclose()
-        
+        """
+        Release this client.
+
+        The underlying connection pool is shared by the whole process and is closed
+        by close_shared_http_client() at shutdown, so there is nothing to do here.
+        """
+        return None
+
     async def get_models(self) -> Dict:
         """
         Retrieve available models from the LM Studio API.
@@ -33,8 +132,9 @@ class LMStudioClient:
             HTTPException: If there's an error in the API call.
         """
         try:
-            response = await self.client.get("/models")
-            response.raise_for_status()
+            with pool_metrics.track():
+                response = await self.client.get("/models")
+                response.raise_for_status()
             return response.json()
         except httpx.HTTPStatusError as e:
             logging.error(f"HTTP status error occurred: {e.response.text}")
@@ -43,13 +143,34 @@ class LMStudioClient:
             logging.error(f"An unexpected error occurred: {e}")
             raise
 
+    def _build_payload(
+        self,
+        messages: List[Union[ChatInputMessage, dict]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        stream: bool
+    ) -> Dict:
+        """Build the request body for the chat completions endpoint."""
+        return {
+            "model": model,
+            "messages": [
+                {"role": msg.role, "content": msg.content} if isinstance(msg, ChatInputMessage) else msg
+                for msg in messages
+            ],
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": stream
+        }
+
     async def create_chat_completion(
         self, 
         messages: List[Union[ChatInputMessage, dict]], 
         model: str, 
         temperature: float, 
         max_tokens: int, 
-        stream: bool = False
+        stream: bool = False,
+        usage: Optional[TokenUsage] = None
     ) -> Message:
         """
         Create a chat completion using the LM Studio API.
@@ -60,6 +181,7 @@ class LMStudioClient:
             temperature (float): The temperature to use for completion.
             max_tokens (int): The maximum number of tokens to generate.
             stream (bool, optional): Whether to stream the response. Defaults to False.
+            usage (Optional[TokenUsage]): Filled in with the server's token counts if it reports them.
 
         Returns:
             Message: The generated message.
@@ -67,21 +189,15 @@ class LMStudioClient:
         Raises:
             HTTPException: If there's an error in the API call.
         """
-        payload = {
-            "model": model,
-            "messages": [
-                {"role": msg.role, "content": msg.content} if isinstance(msg, ChatInputMessage) else msg
-                for msg in messages
-            ],
-            "temperature": temperature,
-            "max_tokens": max_tokens,
-            "stream": stream
-        }
+        payload = self._build_payload(messages, model, temperature, max_tokens, stream)
 
         try:
-            response = await self.client.post("/chat/completions", json=payload)
-            response.raise_for_status()
+            with pool_metrics.track():
+                response = await self.client.post("/chat/completions", json=payload)
+                response.raise_for_status()
             data = response.json()
+            if usage is not None:
+                usage.report(data.get("usage"))
             if data.get("choices") and len(data["choices"]) > 0:
                 message_data = data["choices"][0]["message"]
                 return Message(
@@ -96,10 +212,75 @@ class LMStudioClient:
             
         except httpx.HTTPStatusError as e:
             logging.error(f"HTTP status error occurred: {e.response.text}")
+            _notify_if_model_missing(e, model)
             raise
         except ValueError as e:
             logging.error(f"Unexpected response format: {e}")
             raise
         except Exception as e:
             logging.error(f"An unexpected error occurred: {e}")
-            raise
\ No newline at end of file
+            raise
+
+    async def stream_chat_completion(
+        self,
+        messages: List[Union[ChatInputMessage, dict]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        usage: Optional[TokenUsage] = None
+    ) -> AsyncGenerator[str, None]:
+        """
+        Stream a chat completion from the LM Studio API.
+
+        The upstream server answers with server-sent events; each ``data:`` line
+        carries a ``chat.completion.chunk`` whose delta may hold a piece of content.
+
+        Args:
+            messages (List[Union[ChatInputMessage, dict]]): The messages to use for completion.
+            model (str): The model to use for completion.
+            temperature (float): The temperature to use for completion.
+            max_tokens (int): The maximum number of tokens to generate.
+            usage (Optional[TokenUsage]): Filled in with the server's token counts if it reports them.
+
+        Yields:
+            str: Content deltas in the order they are generated.
+
+        Raises:
+            httpx.HTTPStatusError: If the API answers with an error status.
+        """
+        payload = self._build_payload(messages, model, temperature, max_tokens, stream=True)
+        # Ask for a final chunk carrying the exact usage; servers that do not support it ignore the option
+        payload["stream_options"] = {"include_usage": True}
+
+        try:
+            with pool_metrics.track():
+                async with self.client.stream("POST", "/chat/completions", json=payload) as response:
+                    if response.is_error:
+                        await response.aread()
+                        response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+                        try:
+                            chunk = json.loads(data)
+                        except json.JSONDecodeError:
+                            logging.warning(f"Skipping malformed stream chunk: {data}")
+                            continue
+                        if usage is not None:
+                            usage.report(chunk.get("usage"))
+                        choices = chunk.get("choices") or []
+                        if not choices:
+                            continue
+                        content = (choices[0].get("delta") or {}).get("content")
+                        if content:
+                            yield content
+        except httpx.HTTPStatusError as e:
+            logging.error(f"HTTP status error occurred: {e.response.text}")
+            _notify_if_model_missing(e, model)
+            raise
+        except Exception as e:
+            logging.error(f"An unexpected error occurred while streaming: {e}")
+            raise
@@ -0,0 +1,146 @@
+# app/services/ai/model_registry.py
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional, Set
+from app.core.config import settings
+from app.services.ai.lm_client import LMStudioClient, add_model_missing_listener
+
+class ModelRegistry:
+    """
+    Cached view of the models LM Studio has loaded.
+
+    The list is kept for `ttl` seconds and refreshed in the background every
+    `refresh_interval` seconds, so request handlers normally never wait on /models.
+    It is dropped as soon as an upstream call fails because a model is missing.
+    """
+
+    def __init__(
+        self,
+        lm_client: LMStudioClient,
+        ttl: float = settings.MODEL_REGISTRY_TTL,
+        refresh_interval: float = settings.MODEL_REGISTRY_REFRESH_INTERVAL,
+        recheck_interval: float = settings.MODEL_REGISTRY_RECHECK_INTERVAL
+    ):
+        self.lm_client = lm_client
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self.recheck_interval = recheck_interval
+        self._models: Optional[Dict[str, Any]] = None
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.invalidations = 0
+        self.rechecks = 0
+        self.rechecks_skipped = 0
+        add_model_missing_listener(self._on_model_missing)
+
+    def _is_fresh(self) -> bool:
+        return self._models is not None and time.monotonic() - self._fetched_at < self.ttl
+
+    async def get_models(self) -> Dict[str, Any]:
+        """
+        Return the model list in the shape of LM Studio's /models response.
+
+        Returns:
+            Dict[str, Any]: The cached response, fetched first if it is missing or expired.
+        """
+        if self._is_fresh():
+            self.hits += 1
+            return self._models
+        async with self._lock:
+            # Another request may have refreshed the list while we waited
+            if self._is_fresh():
+                self.hits += 1
+                return self._models
+            self.misses += 1
+            return await self.refresh()
+
+    async def refresh(self) -> Dict[str, Any]:
+        """Fetch the model list from LM Studio and replace the cached copy."""
+        models = await self.lm_client.get_models()
+        self._models = models
+        self._fetched_at = time.monotonic()
+        self.refreshes += 1
+        return models
+
+    async def is_model_loaded(self, model_id: str) -> bool:
+        """
+        Check whether a model is currently loaded.
+
+        A miss on a cached list triggers an upstream re-check, so a model loaded after
+        the last refresh is picked up without waiting for the TTL. Re-checks run at most
+        once every `recheck_interval` seconds and replace the list rather than dropping
+        it, so requests naming unknown models cannot defeat the cache for everyone.
+        """
+        models = await self.get_models()
+        if model_id in self._model_ids(models):
+            return True
+        if time.monotonic() - self._fetched_at < self.recheck_interval:
+            self.rechecks_skipped += 1
+            return False
+        async with self._lock:
+            # Another miss may have re-checked while we waited
+            if time.monotonic() - self._fetched_at >= self.recheck_interval:
+                self.rechecks += 1
+                await self.refresh()
+            return model_id in self._model_ids(self._models)
+
+    def invalidate(self) -> None:
+        """Drop the cached list so the next lookup goes upstream."""
+        self._models = None
+        self._fetched_at = 0.0
+        self.invalidations += 1
+
+    def _on_model_missing(self, model_id: str) -> None:
+        logging.warning(f"LM Studio reported model '{model_id}' as missing; invalidating model cache.")
+        self.invalidate()
+
+    @staticmethod
+    def _model_ids(models: Dict[str, Any]) -> Set[str]:
+        return {model["id"] for model in models.get("data", [])}
+
+    async def _refresh_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Keep serving the previous list until it expires
+                self.refresh_failures += 1
+                logging.warning(f"Background model list refresh failed: {e}")
+
+    def start(self) -> None:
+        """Start refreshing the model list in the background."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_periodically())
+
+    async def stop(self) -> None:
+        """Stop the background refresh task."""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cached": self._models is not None,
+            "age_seconds": time.monotonic() - self._fetched_at if self._models is not None else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "invalidations": self.invalidations,
+            "rechecks": self.rechecks,
+            "rechecks_skipped": self.rechecks_skipped,
+        }
\ No newline at end of file
@@ -1,114 +1,157 @@
 # app/services/ai/personalized_chatbot.py
 
+import asyncio
 import logging
 import datetime
 import random
+from contextlib import nullcontext
+from typing import AsyncGenerator, Optional
 from app.models.messages import Message
-from app.schemas.schemas import ChatInputMessage
 from app.services.ai.lm_client import LMStudioClient
-from app.utils.text_cleaning import clean_ai_response
+from app.utils.text_cleaning import clean_ai_response, StreamingResponseCleaner
 from app.utils.text_processing import post_process_response
-from app.services.db.character_database import CharacterDatabase
-from app.services.characters.character_details import get_character_details
+from app.services.ai.prompt_assembler import PromptAssembly, TokenUsage, get_prompt_assembler
+from app.services.ai.trait_store import TraitStore
+from app.services.chat.long_term_memory import MemoryRecord, get_long_term_memory
+from app.services.characters.character_profile import CharacterProfile
 from app.services.nlp.nlp_service import NLPService
+from app.utils.stage_timings import StageTimings
+
+CHAT_MODEL = "mlabonne/AlphaMonarch-7B-GGUF/alphamonarch-7b.Q2_K.gguf"
+MAX_RESPONSE_TOKENS = 150
+MAX_MEMORY_CHARS = 300
 
 class PersonalizedChatbot:
-    def __init__(self, character_id=None, character_database=None):
-        self.character_database = character_database
+    def __init__(self, character: CharacterProfile, trait_store: TraitStore):
+        self.character = character
+        self.character_details = character.details
+        self.trait_store = trait_store
         self.nlp_service = NLPService()
-        
-        if character_id is None or character_id == 0:
-            character_id = self.character_database.get_or_create_default_character()
-        
-        self.character = self.character_database.get_character_by_id(character_id)
-        
-        if self.character is None:
-            logging.warning(f"No character found for id: {character_id}. Creating default adaptive personality.")
-            character_id = self.character_database.get_or_create_default_character()
-            self.character = self.character_database.get_character_by_id(character_id)
-        
-        self.character_details = get_character_details(self.character.character_type)
         self.lm_client = LMStudioClient()
-        
-        # Always initialize personality traits, defaulting to adaptive
-        self.personality_traits = {
-            "formality": 0,
-            "enthusiasm": 0,
-            "humor": 0,
-            "empathy": 0,
-        } if self.character.character_type == "adaptive" else None
-
-    def get_system_prompt(self):
+        self.prompt_assembler = get_prompt_assembler()
+        self.long_term_memory = get_long_term_memory()
+
+    @property
+    def is_adaptive(self) -> bool:
+        return self.character.character_type == "adaptive"
+
+    def get_personality_traits(self, user_id: str):
+        # Only the adaptive character develops traits
+        return self.trait_store.get(user_id, self.character.id) if self.is_adaptive else None
+
+    def get_system_prompt(self, personality_traits=None):
         base_prompt = f"""You are {self.character.name}. {self.character.description} 
         Your personality traits are: {self.character.personality_traits}.
         Backstory: {self.character_details['backstory']}
         Speak in a {self.character_details['speech_style']} manner.
         You have expertise in: {', '.join(self.character_details['knowledge_areas'])}."""
 
-        if self.personality_traits:
-            adaptive_prompt = self.generate_adaptive_prompt()
+        if personality_traits:
+            adaptive_prompt = self.generate_adaptive_prompt(personality_traits)
             base_prompt += f"\n{adaptive_prompt}"
 
         return base_prompt
 
-    def generate_adaptive_prompt(self):
+    def generate_adaptive_prompt(self, personality_traits):
         prompts = []
-        if self.personality_traits["formality"] > 0.5:
+        if personality_traits["formality"] > 0.5:
             prompts.append("Speak formally and professionally.")
-        elif self.personality_traits["formality"] < -0.5:
+        elif personality_traits["formality"] < -0.5:
             prompts.append("Speak casually and informally.")
-        if self.personality_traits["enthusiasm"] > 0.5:
+        if personality_traits["enthusiasm"] > 0.5:
             prompts.append("Be very enthusiastic and energetic in your responses.")
-        elif self.personality_traits["enthusiasm"] < -0.5:
+        elif personality_traits["enthusiasm"] < -0.5:
             prompts.append("Remain calm and composed in your responses.")
-        if self.personality_traits["humor"] > 0.5:
+        if personality_traits["humor"] > 0.5:
             prompts.append("Incorporate humor and light-heartedness in your responses.")
-        elif self.personality_traits["humor"] < -0.5:
+        elif personality_traits["humor"] < -0.5:
             prompts.append("Maintain a serious and straightforward tone.")
-        if self.personality_traits["empathy"] > 0.5:
+        if personality_traits["empathy"] > 0.5:
             prompts.append("Show strong empathy and emotional understanding.")
-        elif self.personality_traits["empathy"] < -0.5:
+        elif personality_traits["empathy"] < -0.5:
             prompts.append("Focus on facts and logic rather than emotions.")
 
         return " ".join(prompts)
     
 
-    async def analyze_message(self, message: str):
-        if self.personality_traits:
+    async def load_traits(self, user_id: str) -> None:
+        """Bring in the traits earlier conversations built up; a no-op once they are cached."""
+        if self.is_adaptive:
+            await self.trait_store.load(user_id, self.character.id)
+
+    async def analyze_message(self, message: str, user_id: str):
+        if not self.is_adaptive:
+            return
+        # Bring in what earlier conversations built up before adding to it
+        await self.load_traits(user_id)
+        try:
             analysis = await self.nlp_service.analyze_text(message)
-            
-            # Adjust personality traits based on sentiment and conversation intent
-            self.personality_traits["enthusiasm"] += analysis["vader_sentiment"]["compound"] * 0.1
-            self.personality_traits["empathy"] += analysis["vader_sentiment"]["pos"] * 0.1
-
-            if analysis["primary_conversation_intent"].lower() in ["joke", "humor"]:
-                self.personality_traits["humor"] += 0.1
-            elif analysis["primary_conversation_intent"].lower() in ["formal_request", "professional_inquiry"]:
-                self.personality_traits["formality"] += 0.1
-
-            # Cap values between -1 and 1
-            for trait in self.personality_traits:
-                self.personality_traits[trait] = max(-1, min(1, self.personality_traits[trait]))
-
-    async def generate_response(self, user_input: str, context: list[Message]):
-        if self.personality_traits:
-            await self.analyze_message(user_input)
+        except asyncio.TimeoutError:
+            # Skip this turn's trait update rather than hold up the reply
+            return
+
+        # Adjust personality traits based on sentiment and conversation intent
+        deltas = {
+            "enthusiasm": analysis["sentiment"]["compound"] * 0.1,
+            "empathy": analysis["sentiment"]["pos"] * 0.1,
+        }
+        if analysis["primary_conversation_intent"].lower() in ["joke", "humor"]:
+            deltas["humor"] = 0.1
+        elif analysis["primary_conversation_intent"].lower() in ["formal_request", "professional_inquiry"]:
+            deltas["formality"] = 0.1
+
+        # The store caps values between -1 and 1 and persists the change on its next flush
+        self.trait_store.apply(user_id, self.character.id, deltas)
+
+    async def start_analysis(self, message: str, user_id: str, timings: Optional[StageTimings] = None) -> Optional[asyncio.Task]:
+        """
+        Analyze the message for trait updates alongside the LLM call rather than before it.
+
+        Traits are loaded first, so the prompt for this turn reflects every earlier turn;
+        this turn's own analysis lands while the model is generating and shapes the next
+        one. Await the returned task to have it applied before replying.
+        """
+        if not self.is_adaptive:
+            return None
+        await self.load_traits(user_id)
+        return asyncio.create_task(self._analyze_in_background(message, user_id, timings))
+
+    async def _analyze_in_background(self, message: str, user_id: str, timings: Optional[StageTimings]) -> None:
+        try:
+            with timings.stage("nlp") if timings is not None else nullcontext():
+                await self.analyze_message(message, user_id)
+        except Exception as e:
+            logging.error(f"Trait analysis failed for user {user_id}: {str(e)}")
+
+    async def generate_response(
+        self,
+        user_input: str,
+        context: list[Message],
+        user_id: str,
+        usage: Optional[TokenUsage] = None,
+        summary: Optional[str] = None,
+        timings: Optional[StageTimings] = None
+    ):
+        analysis = await self.start_analysis(user_input, user_id, timings)
         logging.debug(f"Generating character response for input: {user_input}")
     
         try:
-            input_text = self.prepare_input(user_input, context)
-            messages = [
-                ChatInputMessage(role="system", content=self.get_system_prompt(), user_id="system"),
-                *[ChatInputMessage(role=msg.role, content=msg.content, user_id=msg.user_id) for msg in context],
-                ChatInputMessage(role="user", content=input_text, user_id="user")
-            ]
-
-            response = await self.lm_client.create_chat_completion(
-                messages=messages,
-                model="mlabonne/AlphaMonarch-7B-GGUF/alphamonarch-7b.Q2_K.gguf",
-                temperature=0.7,
-                max_tokens=150
-            )
+            prompt = await self.build_prompt(user_input, context, user_id, summary)
+            try:
+                with timings.stage("llm") if timings is not None else nullcontext():
+                    response = await self.lm_client.create_chat_completion(
+                        messages=prompt.messages,
+                        model=CHAT_MODEL,
+                        temperature=0.7,
+                        max_tokens=MAX_RESPONSE_TOKENS,
+                        usage=usage
+                    )
+            finally:
+                if analysis is not None:
+                    # Usually done already: analysis is far quicker than generation
+                    await analysis
+            if usage is not None:
+                usage.estimate(prompt.prompt_tokens, self.prompt_assembler.counter.count(response.content))
 
             # Clean the response content
             cleaned_content = clean_ai_response(response.content)
@@ -133,8 +176,73 @@ class PersonalizedChatbot:
             logging.error(f"Error generating character response: {str(e)}")
             return "I apologize, but I am unable to generate a response at the moment."
 
-    def prepare_input(self, user_input: str, context: list[Message]) -> str:
-        return user_input
+    async def stream_response(
+        self,
+        user_input: str,
+        context: list[Message],
+        user_id: str,
+        usage: Optional[TokenUsage] = None,
+        summary: Optional[str] = None,
+        timings: Optional[StageTimings] = None
+    ) -> AsyncGenerator[str, None]:
+        """
+        Stream the character's reply, cleaned incrementally as it is generated.
+
+        A failure before anything is yielded produces the usual apology; a failure
+        after that is re-raised, so the caller doesn't mistake a partial reply for a whole one.
+        """
+        analysis = await self.start_analysis(user_input, user_id, timings)
+        logging.debug(f"Streaming character response for input: {user_input}")
+
+        cleaner = StreamingResponseCleaner()
+        raw_parts = []
+        try:
+            prompt = await self.build_prompt(user_input, context, user_id, summary)
+            if usage is not None:
+                usage.estimate(prompt_tokens=prompt.prompt_tokens)
+            async for delta in self.lm_client.stream_chat_completion(
+                messages=prompt.messages,
+                model=CHAT_MODEL,
+                temperature=0.7,
+                max_tokens=MAX_RESPONSE_TOKENS,
+                usage=usage
+            ):
+                raw_parts.append(delta)
+                cleaned = cleaner.feed(delta)
+                if cleaned:
+                    yield cleaned
+            remaining = cleaner.flush()
+            if remaining:
+                yield remaining
+            catchphrase = self.post_process_response("").strip()
+            if catchphrase:
+                yield f" {catchphrase}" if cleaner.has_emitted else catchphrase
+            if analysis is not None:
+                await analysis
+        except Exception as e:
+            logging.error(f"Error streaming character response: {str(e)}")
+            if cleaner.has_emitted:
+                # Part of the reply is already out; the caller has to end the stream as failed
+                raise
+            yield "I apologize, but I am unable to generate a response at the moment."
+        finally:
+            if usage is not None:
+                usage.estimate(completion_tokens=self.prompt_assembler.counter.count("".join(raw_parts)))
+
+    async def build_prompt(self, user_input: str, context: list[Message], user_id: str, summary: Optional[str] = None) -> PromptAssembly:
+        memories = self.format_memories(await self.recall(user_id, user_input, context))
+        system_prompt = self.get_system_prompt(self.get_personality_traits(user_id))
+        # Memories and then the summary give way first if the prompt runs over budget
+        return self.prompt_assembler.assemble(system_prompt, context, user_input, MAX_RESPONSE_TOKENS, summary, memories)
+
+    async def recall(self, user_id: str, user_input: str, context: list[Message]) -> list[MemoryRecord]:
+        """Find earlier messages related to the user's input that are no longer in the context."""
+        if self.long_term_memory is None:
+            return []
+        return await self.long_term_memory.search(user_id, user_input, exclude=[msg.content for msg in context])
+
+    def format_memories(self, memories: list[MemoryRecord]) -> list[str]:
+        return [f"- {memory.role}: {memory.content[:MAX_MEMORY_CHARS]}" for memory in memories]
 
     def post_process_response(self, response: str) -> str:
         if self.character.character_type != "adaptive" and random.random() < 0.3:
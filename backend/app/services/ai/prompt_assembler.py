@@ -0,0 +1,305 @@
+# app/services/ai/prompt_assembler.py
+
+import logging
+import re
+import threading
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.models.messages import Message
+from app.schemas.schemas import ChatInputMessage
+
+# Tokens the chat template adds around every message (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# How a conversation summary and recalled memories are worked into the prompt
+SUMMARY_PREFIX = "\nSummary of the earlier conversation: "
+MEMORIES_HEADER = "[From earlier in our conversations]"
+
+# Words, numbers and single punctuation marks, roughly how BPE vocabularies split text
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximate a BPE token count without a tokenizer.
+
+    Every word or punctuation mark counts as one token, and long words as one per
+    four characters, which tracks Llama/Mistral vocabularies closely on chat text.
+    """
+    return sum(max(1, len(piece) // 4) for piece in _TOKEN_PATTERN.findall(text))
+
+class TokenCounter:
+    """
+    Counts tokens, memoizing the result per distinct text.
+
+    Uses the model's own tokenizer when `tokenizer_path` points at a tokenizer.json
+    (loaded with the `tokenizers` package), and `estimate_tokens` otherwise. Context
+    messages are re-counted on every turn, so the cache turns most counts into lookups.
+    """
+
+    def __init__(self, tokenizer_path: str = settings.TOKENIZER_PATH, cache_size: int = settings.TOKEN_COUNT_CACHE_SIZE):
+        self.backend = "estimate"
+        encode: Callable[[str], int] = estimate_tokens
+        if tokenizer_path:
+            try:
+                from tokenizers import Tokenizer
+            except ImportError as e:
+                raise RuntimeError("The 'tokenizers' package is required when TOKENIZER_PATH is set") from e
+            tokenizer = Tokenizer.from_file(tokenizer_path)
+            encode = lambda text: len(tokenizer.encode(text, add_special_tokens=False).ids)
+            self.backend = tokenizer_path
+        self._count = lru_cache(maxsize=cache_size)(encode)
+
+    def count(self, text: Optional[str]) -> int:
+        return self._count(text) if text else 0
+
+    def count_message(self, content: Optional[str]) -> int:
+        """Count a chat message, including the template overhead around it."""
+        return self.count(content) + MESSAGE_OVERHEAD_TOKENS
+
+    def stats(self) -> Dict[str, Any]:
+        info = self._count.cache_info()
+        return {
+            "backend": self.backend,
+            "cache_hits": info.hits,
+            "cache_misses": info.misses,
+            "cache_size": info.currsize,
+        }
+
+@dataclass
+class TokenUsage:
+    """
+    Token counts for one chat completion, in the shape of the OpenAI `usage` object.
+
+    The LM Studio client fills in the server's exact counts when its response carries
+    them; the local estimate is only used for whatever it left out.
+    """
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    # Whether the counts came from the server rather than the local TokenCounter
+    reported: bool = False
+
+    def estimate(self, prompt_tokens: Optional[int] = None, completion_tokens: Optional[int] = None) -> None:
+        """Record locally counted tokens, unless the server has already reported exact ones."""
+        if self.reported:
+            return
+        if prompt_tokens is not None:
+            self.prompt_tokens = prompt_tokens
+        if completion_tokens is not None:
+            self.completion_tokens = completion_tokens
+
+    def report(self, upstream: Optional[Dict[str, Any]]) -> None:
+        """Take the counts from an upstream `usage` object, if the response had a valid one."""
+        if not upstream:
+            return
+        try:
+            prompt_tokens, completion_tokens = int(upstream["prompt_tokens"]), int(upstream["completion_tokens"])
+        except (KeyError, TypeError, ValueError):
+            return
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.reported = True
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+        }
+
+@dataclass
+class PromptAssembly:
+    """The messages chosen for a prompt and what they cost."""
+    messages: List[ChatInputMessage]
+    context: List[Message] = field(default_factory=list)
+    prompt_tokens: int = 0
+    dropped_messages: int = 0
+
+class PromptAssembler:
+    """
+    Fits system prompt, conversation history and the user turn into a token budget.
+
+    The budget is the model's context window less the tokens reserved for the reply.
+    System prompt and user turn are always kept; if they don't fit on their own,
+    recalled memories are dropped first, then the conversation summary, and only then
+    is the user turn truncated. History fills what is left, most relevant messages
+    first (ties go to the newer one), and is then put back in chronological order.
+    """
+
+    def __init__(self, counter: TokenCounter, context_window: int = settings.PROMPT_TOKEN_BUDGET):
+        self.counter = counter
+        self.context_window = context_window
+        self.assemblies = 0
+        self.dropped_messages = 0
+        self.dropped_memories = 0
+        self.dropped_summaries = 0
+        self.truncated_turns = 0
+
+    def available_tokens(self, max_tokens: int) -> int:
+        """Tokens left for the prompt once the reply's `max_tokens` is reserved."""
+        return self.context_window - max_tokens
+
+    def select_context(self, context: List[Message], budget: int) -> List[Message]:
+        """
+        Pick the history that fits in `budget` tokens, preferring relevant messages.
+
+        Args:
+            context (List[Message]): Candidate messages, oldest first.
+            budget (int): Tokens available for history.
+
+        Returns:
+            List[Message]: The selected messages, oldest first.
+        """
+        if budget <= 0 or not context:
+            return []
+        costs = [self.counter.count_message(msg.content) for msg in context]
+        if sum(costs) <= budget:
+            return list(context)
+
+        ranked = sorted(
+            range(len(context)),
+            key=lambda i: (context[i].relevance if context[i].relevance is not None else 1.0, i),
+            reverse=True
+        )
+        selected = []
+        remaining = budget
+        for i in ranked:
+            if costs[i] <= remaining:
+                selected.append(i)
+                remaining -= costs[i]
+        return [context[i] for i in sorted(selected)]
+
+    def with_summary(self, system_prompt: str, summary: Optional[str]) -> str:
+        # Older turns arrive as a summary, so the prompt stays about the same size however long the chat runs
+        return f"{system_prompt}{SUMMARY_PREFIX}{summary}" if summary else system_prompt
+
+    def with_memories(self, user_turn: str, memories: Optional[List[str]]) -> str:
+        if not memories:
+            return user_turn
+        recalled = "\n".join(memories)
+        return f"{MEMORIES_HEADER}\n{recalled}\n\n{user_turn}"
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Return the longest prefix of `text` that counts as at most `max_tokens` tokens."""
+        if self.counter.count(text) <= max_tokens:
+            return text
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.counter.count(text[:middle]) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        return text[:low].rstrip()
+
+    def fit(
+        self,
+        system_prompt: str,
+        user_turn: str,
+        budget: int,
+        summary: Optional[str] = None,
+        memories: Optional[List[str]] = None
+    ) -> Tuple[str, str]:
+        """
+        Build the system message and user turn so that together they fit in `budget` tokens.
+
+        Args:
+            system_prompt (str): The system message, without the summary.
+            user_turn (str): The user's message, without recalled memories.
+            budget (int): Tokens available for both messages, template overhead included.
+            summary (Optional[str]): Summary of older turns, appended to the system message.
+            memories (Optional[List[str]]): Recalled memory lines, best first, put ahead of the user turn.
+
+        Returns:
+            Tuple[str, str]: The system message and the user turn to send.
+        """
+        memories = list(memories or [])
+        while True:
+            system = self.with_summary(system_prompt, summary)
+            user = self.with_memories(user_turn, memories)
+            if self.counter.count_message(system) + self.counter.count_message(user) <= budget:
+                return system, user
+            if memories:
+                # The least relevant memory goes first
+                memories.pop()
+                self.dropped_memories += 1
+            elif summary:
+                summary = None
+                self.dropped_summaries += 1
+            else:
+                break
+
+        room = budget - self.counter.count_message(system) - MESSAGE_OVERHEAD_TOKENS
+        self.truncated_turns += 1
+        logging.warning(f"Truncating the user turn to {max(0, room)} tokens to fit the {budget} token prompt budget")
+        return system, self.truncate(user_turn, room)
+
+    def assemble(
+        self,
+        system_prompt: str,
+        context: List[Message],
+        user_turn: str,
+        max_tokens: int,
+        summary: Optional[str] = None,
+        memories: Optional[List[str]] = None
+    ) -> PromptAssembly:
+        """
+        Build the message list for a chat completion within the token budget.
+
+        Args:
+            system_prompt (str): The system message.
+            context (List[Message]): Conversation history, oldest first.
+            user_turn (str): The user's message.
+            max_tokens (int): Tokens reserved for the reply.
+            summary (Optional[str]): Summary of older turns, if any.
+            memories (Optional[List[str]]): Recalled memory lines, best first, if any.
+
+        Returns:
+            PromptAssembly: The messages to send, with their token count.
+        """
+        system_prompt, user_turn = self.fit(system_prompt, user_turn, self.available_tokens(max_tokens), summary, memories)
+        fixed = self.counter.count_message(system_prompt) + self.counter.count_message(user_turn)
+        selected = self.select_context(context, self.available_tokens(max_tokens) - fixed)
+        messages = [
+            ChatInputMessage(role="system", content=system_prompt, user_id="system"),
+            *[ChatInputMessage(role=msg.role, content=msg.content, user_id=msg.user_id) for msg in selected],
+            ChatInputMessage(role="user", content=user_turn, user_id="user")
+        ]
+        prompt_tokens = fixed + sum(self.counter.count_message(msg.content) for msg in selected)
+        return self.record(PromptAssembly(messages, selected, prompt_tokens, len(context) - len(selected)))
+
+    def record(self, assembly: PromptAssembly) -> PromptAssembly:
+        """Count an assembly in the stats; also used for prompts built outside `assemble`."""
+        self.assemblies += 1
+        self.dropped_messages += assembly.dropped_messages
+        if assembly.dropped_messages:
+            logging.debug(f"Dropped {assembly.dropped_messages} context messages to fit the prompt budget")
+        return assembly
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "context_window": self.context_window,
+            "assemblies": self.assemblies,
+            "dropped_messages": self.dropped_messages,
+            "dropped_memories": self.dropped_memories,
+            "dropped_summaries": self.dropped_summaries,
+            "truncated_turns": self.truncated_turns,
+            "token_counter": self.counter.stats(),
+        }
+
+_prompt_assembler: Optional[PromptAssembler] = None
+_prompt_assembler_lock = threading.Lock()
+
+def get_prompt_assembler() -> PromptAssembler:
+    """Return the process-wide prompt assembler, loading the tokenizer on first use."""
+    global _prompt_assembler
+    if _prompt_assembler is None:
+        with _prompt_assembler_lock:
+            if _prompt_assembler is None:
+                _prompt_assembler = PromptAssembler(TokenCounter())
+    return _prompt_assembler
\ No newline at end of file
@@ -0,0 +1,219 @@
+# app/services/ai/trait_store.py
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.services.db.aio.adaptive_trait_manager import AsyncAdaptiveTraitManager
+from app.services.db.database_setup import get_async_session_factory
+
+DEFAULT_TRAITS: Dict[str, float] = {
+    "formality": 0,
+    "enthusiasm": 0,
+    "humor": 0,
+    "empathy": 0,
+}
+
+TraitKey = Tuple[str, int]
+
+class TraitStore:
+    """
+    Adaptive personality traits per (user, character) pair, persisted write-behind.
+
+    Chatbots are shared between users, so the traits a conversation has built up
+    live here rather than on the chatbot instance. Traits are loaded from the
+    database the first time a pair is seen, updated in memory on every turn, and
+    written back in one batched transaction every `flush_interval` seconds. Reads and
+    writes go through an AsyncSession, so neither occupies a worker thread.
+
+    If a pair's read fails, its changes are kept apart as deltas and never flushed, so
+    they cannot overwrite the saved row; the next `load` reads again and applies them
+    on top of what it finds. At most `max_pairs` pairs are cached, least recently used
+    first out; pairs with unflushed changes stay until they are written.
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], AsyncSession]] = None,
+        flush_interval: float = settings.TRAIT_FLUSH_INTERVAL,
+        max_pairs: int = settings.TRAIT_STORE_MAX_PAIRS
+    ):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.max_pairs = max_pairs
+        # Pairs whose saved values are known, least recently used first
+        self._traits: "OrderedDict[TraitKey, Dict[str, float]]" = OrderedDict()
+        # Deltas for pairs that could not be read yet, applied once a read succeeds
+        self._unloaded: Dict[TraitKey, Dict[str, float]] = {}
+        self._dirty: Set[TraitKey] = set()
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self.loads = 0
+        self.load_failures = 0
+        self.flushes = 0
+        self.flush_failures = 0
+        self.rows_written = 0
+        self.evicted = 0
+        self.last_flush_seconds = 0.0
+
+    def get(self, user_id: str, character_id: int) -> Dict[str, float]:
+        """
+        Get the traits for a user and character, starting from neutral if there are none yet.
+
+        Returns:
+            Dict[str, float]: A copy of the current trait values.
+        """
+        key = (user_id, character_id)
+        traits = self._traits.get(key)
+        if traits is not None:
+            return dict(traits)
+        # Not read yet: neutral plus whatever this process has added since
+        return self._with_deltas(dict(DEFAULT_TRAITS), self._unloaded.get(key, {}))
+
+    @staticmethod
+    def _with_deltas(traits: Dict[str, float], deltas: Dict[str, float]) -> Dict[str, float]:
+        for trait, delta in deltas.items():
+            traits[trait] = max(-1, min(1, traits.get(trait, 0) + delta))
+        return traits
+
+    async def load(self, user_id: str, character_id: int) -> Dict[str, float]:
+        """
+        Make sure a pair's persisted traits are in memory, reading them from the database once.
+
+        A failed read is not cached; the next call tries again.
+
+        Returns:
+            Dict[str, float]: A copy of the current trait values.
+        """
+        key = (user_id, character_id)
+        if key in self._traits:
+            self._traits.move_to_end(key)
+            return self.get(user_id, character_id)
+        try:
+            stored = await self._read(user_id, character_id)
+            self.loads += 1
+        except Exception as e:
+            self.load_failures += 1
+            logging.warning(f"Failed to load adaptive traits for {key}: {e}")
+            return self.get(user_id, character_id)
+        # A concurrent turn may have loaded the pair while we were reading
+        if key not in self._traits:
+            self._traits[key] = {**DEFAULT_TRAITS, **(stored or {})}
+        deltas = self._unloaded.pop(key, None)
+        if deltas:
+            self._with_deltas(self._traits[key], deltas)
+            self._dirty.add(key)
+        self._evict(keep=key)
+        return self.get(user_id, character_id)
+
+    def apply(self, user_id: str, character_id: int, deltas: Dict[str, float]) -> Dict[str, float]:
+        """
+        Add deltas to a user's traits for a character, capping each value between -1 and 1.
+
+        The change is only made in memory. A loaded pair is marked dirty for the next
+        flush; for a pair that could not be read, the deltas wait for the next `load`.
+
+        Args:
+            user_id (str): The ID of the user.
+            character_id (int): The ID of the character.
+            deltas (Dict[str, float]): Amount to add to each trait.
+
+        Returns:
+            Dict[str, float]: A copy of the updated trait values.
+        """
+        key = (user_id, character_id)
+        traits = self._traits.get(key)
+        if traits is None:
+            pending = self._unloaded.setdefault(key, {})
+            for trait, delta in deltas.items():
+                pending[trait] = pending.get(trait, 0) + delta
+            return self.get(user_id, character_id)
+        self._with_deltas(traits, deltas)
+        self._traits.move_to_end(key)
+        self._dirty.add(key)
+        return dict(traits)
+
+    def _evict(self, keep: Optional[TraitKey] = None) -> None:
+        """Drop least recently used pairs with nothing left to flush, other than `keep`, until at most `max_pairs` remain."""
+        if len(self._traits) <= self.max_pairs:
+            return
+        for key in list(self._traits):
+            if len(self._traits) <= self.max_pairs:
+                break
+            if key not in self._dirty and key != keep:
+                del self._traits[key]
+                self.evicted += 1
+
+    async def flush(self) -> int:
+        """
+        Write every pair changed since the last flush in a single transaction.
+
+        Returns:
+            int: The number of rows written.
+        """
+        async with self._flush_lock:
+            if not self._dirty:
+                return 0
+            dirty, self._dirty = self._dirty, set()
+            batch = {key: dict(self._traits[key]) for key in dirty}
+            started = time.perf_counter()
+            try:
+                written = await self._write(batch)
+            except Exception as e:
+                # Keep the pairs dirty so the next flush retries them with their latest values
+                self._dirty |= dirty
+                self.flush_failures += 1
+                logging.error(f"Failed to flush {len(batch)} adaptive trait rows: {e}")
+                return 0
+            self.flushes += 1
+            self.rows_written += written
+            self.last_flush_seconds = time.perf_counter() - started
+            self._evict()
+            return written
+
+    async def _read(self, user_id: str, character_id: int) -> Optional[Dict[str, float]]:
+        async with (self.session_factory or get_async_session_factory())() as db:
+            return await AsyncAdaptiveTraitManager(db).get_traits(user_id, character_id)
+
+    async def _write(self, batch: Dict[TraitKey, Dict[str, float]]) -> int:
+        async with (self.session_factory or get_async_session_factory())() as db:
+            return await AsyncAdaptiveTraitManager(db).save_traits(batch)
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self) -> None:
+        """Start flushing changed traits in the background."""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self) -> None:
+        """Stop the background task and write out anything still pending."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pairs": len(self._traits),
+            "max_pairs": self.max_pairs,
+            "dirty": len(self._dirty),
+            "unloaded": len(self._unloaded),
+            "evicted": self.evicted,
+            "loads": self.loads,
+            "load_failures": self.load_failures,
+            "flushes": self.flushes,
+            "flush_failures": self.flush_failures,
+            "rows_written": self.rows_written,
+            "last_flush_seconds": self.last_flush_seconds,
+        }
\ No newline at end of file
@@ -0,0 +1,181 @@
+# app/services/characters/character_cache.py
+
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Tuple
+from sqlalchemy import case, func
+from app.core.config import settings
+from app.models.character import Character
+from app.services.characters.character_profile import CharacterProfile
+
+# Row count, highest id, latest updated_at, total length of the text columns and number
+# of available characters in the characters table
+CharacterStamp = Tuple[int, Optional[int], Optional[datetime], Optional[int], Optional[int]]
+
+def stamp_columns() -> Tuple[Any, ...]:
+    """
+    The aggregates making up a CharacterStamp, selected together in one query.
+
+    updated_at only has one-second resolution on MySQL, so an edit landing in the same
+    second as the latest one is caught by the text lengths or available count instead.
+    """
+    text_length = (
+        func.length(Character.name)
+        + func.length(func.coalesce(Character.description, ""))
+        + func.length(func.coalesce(Character.personality_traits, ""))
+        + func.length(func.coalesce(Character.character_type, ""))
+    )
+    return (
+        func.count(Character.id),
+        func.max(Character.id),
+        func.max(Character.updated_at),
+        func.sum(text_length),
+        func.sum(case((Character.available == True, 1), else_=0)),
+    )
+
+class CharacterCache:
+    """
+    Process-wide read-through cache of character profiles and the default character's ID.
+
+    Characters almost never change, so the profiles are preloaded when
+    `populate_characters` runs at startup and served from memory afterwards.
+
+    `version` goes up whenever the cached set may have changed. Every write made
+    through a CharacterDatabase in this process drops the cache. Writes from other
+    worker processes are noticed by comparing a stamp of the table, taken with one
+    aggregate query, against the last one seen; that check runs at most once every
+    `check_interval` seconds. An edit the stamp can't see (same second, same lengths)
+    is picked up anyway, since the cache is dropped at the first check after it has
+    been trusted for `max_age` seconds. Anything built from profiles, like the chatbot
+    registry, compares versions instead of re-reading characters.
+    """
+
+    def __init__(
+        self,
+        check_interval: float = settings.CHARACTER_CACHE_CHECK_INTERVAL,
+        max_age: float = settings.CHARACTER_CACHE_MAX_AGE
+    ):
+        self.check_interval = check_interval
+        self.max_age = max_age
+        self._profiles: Dict[int, CharacterProfile] = {}
+        self._default_id: Optional[int] = None
+        self._stamp: Optional[CharacterStamp] = None
+        self._checked_at = float("-inf")
+        # When the cached set was last known to match the table
+        self._loaded_at = time.monotonic()
+        # Sync routes use the cache from the threadpool, the chat path from the event loop
+        self._lock = threading.Lock()
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.stale_detected = 0
+        self.expired = 0
+        self.checks = 0
+
+    def get(self, character_id: int) -> Optional[CharacterProfile]:
+        profile = self._profiles.get(character_id)
+        if profile is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return profile
+
+    def put(self, character: Any, version: int) -> CharacterProfile:
+        """
+        Cache a character read from the database at `version`.
+
+        If the cache was invalidated while it was being read, the profile is returned
+        but not kept, since it may predate the write.
+        """
+        profile = CharacterProfile.from_character(character)
+        with self._lock:
+            if version == self.version:
+                self._profiles[profile.id] = profile
+        return profile
+
+    @property
+    def default_id(self) -> Optional[int]:
+        return self._default_id
+
+    def set_default_id(self, character_id: int, version: int) -> None:
+        with self._lock:
+            if version == self.version:
+                self._default_id = character_id
+
+    def preload(self, characters: Iterable[Any], stamp: CharacterStamp) -> None:
+        """Replace the cache with every character, as of `stamp`."""
+        with self._lock:
+            self.version += 1
+            self._profiles = {character.id: CharacterProfile.from_character(character) for character in characters}
+            self._default_id = None
+            self._stamp = stamp
+            self._checked_at = self._loaded_at = time.monotonic()
+
+    def _drop(self) -> None:
+        self.version += 1
+        self._profiles.clear()
+        self._default_id = None
+        self._loaded_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        """
+        Drop every cached character after a write.
+
+        Which character is the default, and the table's stamp, can change with any
+        write, so nothing is kept; characters are few and reloaded on demand.
+        """
+        with self._lock:
+            self._drop()
+            # Adopt whatever stamp is seen next rather than treating our own write as stale
+            self._stamp = None
+            self.invalidations += 1
+
+    def check_due(self) -> bool:
+        return time.monotonic() - self._checked_at >= self.check_interval
+
+    def validate(self, stamp: CharacterStamp) -> bool:
+        """
+        Compare the table's current stamp with the last one seen, dropping the cache if it
+        moved or has been trusted for longer than `max_age`.
+
+        Returns:
+            bool: False if the cache was dropped.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._checked_at = now
+            self.checks += 1
+            if self._stamp is not None and stamp != self._stamp:
+                self.stale_detected += 1
+            elif now - self._loaded_at >= self.max_age:
+                self.expired += 1
+            else:
+                self._stamp = stamp
+                return True
+            self._drop()
+            self._stamp = stamp
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "profiles": len(self._profiles),
+            "default_id": self._default_id,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "checks": self.checks,
+            "stale_detected": self.stale_detected,
+            "expired": self.expired,
+        }
+
+_character_cache: Optional[CharacterCache] = None
+
+def get_character_cache() -> CharacterCache:
+    """Return the process-wide character cache, creating it on first use."""
+    global _character_cache
+    if _character_cache is None:
+        _character_cache = CharacterCache()
+    return _character_cache
\ No newline at end of file
@@ -0,0 +1,28 @@
+# app/services/characters/character_profile.py
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+from app.models.character import Character
+from app.services.characters.character_details import get_character_details
+
+@dataclass(frozen=True)
+class CharacterProfile:
+    """An immutable snapshot of a character, detached from the database session."""
+
+    id: int
+    name: str
+    description: Optional[str]
+    personality_traits: Optional[str]
+    character_type: str
+    details: Dict[str, Any] = field(hash=False, compare=False)
+
+    @classmethod
+    def from_character(cls, character: Character) -> "CharacterProfile":
+        return cls(
+            id=character.id,
+            name=character.name,
+            description=character.description,
+            personality_traits=character.personality_traits,
+            character_type=character.character_type,
+            details=get_character_details(character.character_type)
+        )
\ No newline at end of file
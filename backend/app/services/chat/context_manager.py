@@ -1,128 +1,392 @@
 # app/services/chat/context_manager.py
 
+import asyncio
 import logging
-from collections import deque
+import os
 import time
-from typing import List, Tuple, Dict, Optional
+from collections import deque
+from typing import Any, Deque, List, Tuple, Dict, Optional
+from app.core.config import settings
 from app.models.messages import Message
+from app.services.chat.context_record import ContextRecord
+from app.services.chat.context_snapshot import SnapshotReader, UserState, prepare_snapshot, write_snapshot
+from app.services.chat.context_store import ContextEntry, ContextStore, InMemoryContextStore
+from app.services.chat.conversation_summarizer import ConversationSummarizer
+from app.services.chat.expiry_scheduler import ExpiryScheduler
+from app.services.chat.memory_budget import MemoryBudget, SpillStore
+from app.services.chat.long_term_memory import LongTermMemory
 from app.services.chat.context_triggers import ContextTriggers
 from app.utils.text_cleaning import clean_ai_response
 from app.utils.text_processing import post_process_response
 
+# Messages whose decayed relevance falls to this level are dropped from the context
+MIN_RELEVANCE = 0.1
+
 class ChatContextManager:
-    def __init__(self, max_length: int = 100, max_age: int = 900, decay_rate: float = 0.05):
-        self.contexts: Dict[str, deque] = {}
-        self.conversation_history: Dict[str, List[Tuple[Message, float]]] = {}
+    def __init__(
+        self,
+        store: Optional[ContextStore] = None,
+        max_length: int = 100,
+        max_age: int = 900,
+        decay_rate: float = 0.05,
+        summarizer: Optional[ConversationSummarizer] = None,
+        memory: Optional[LongTermMemory] = None,
+        history_max_age: float = settings.CONVERSATION_HISTORY_MAX_AGE,
+        expiry: Optional[ExpiryScheduler] = None,
+        budget: Optional[MemoryBudget] = None,
+        spill: Optional[SpillStore] = None,
+        snapshot_path: Optional[str] = None,
+        snapshot_interval: float = settings.CONTEXT_SNAPSHOT_INTERVAL
+    ):
+        self.store = store or InMemoryContextStore()
+        # Messages leaving the window are folded into a running summary instead of being forgotten
+        self.summarizer = summarizer
+        # Every message is also indexed for semantic recall, long after it leaves the window
+        self.memory = memory
+        # Per-user history in arrival order, so expired messages are always at the head
+        self.conversation_history: Dict[str, Deque[Tuple[ContextRecord, float]]] = {}
+        self.history_max_age = history_max_age
+        # Contexts and history are expired per user as they fall due rather than by periodic full scans
+        self.expiry = expiry or ExpiryScheduler()
+        self.expiry.register("context", self._expire_context)
+        self.expiry.register("history", self._expire_history)
+        self.expiry.register("spill", self._expire_spill)
+        if memory is not None:
+            # Loaded long-term memory indexes are unloaded once their user goes idle
+            self.expiry.register("memory", self._expire_memory)
+        # Idle users are evicted least recently used first once memory holds too many messages,
+        # to the spill store if there is one (and faulted back in on their next access)
+        self.budget = budget or MemoryBudget(settings.CONTEXT_MEMORY_BUDGET)
+        self.spill = spill
+        # Live state is snapshotted periodically and on shutdown, and restored lazily per user on restart
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self.snapshot = self._open_snapshot()
+        self._snapshot_task: Optional[asyncio.Task] = None
+        self._snapshot_lock = asyncio.Lock()
+        self.snapshots_written = 0
+        self.last_snapshot_users = 0
+        self.last_snapshot_bytes = 0
+        self.last_snapshot_seconds = 0.0
+        self.expired_history_messages = 0
         self.max_length = max_length
         self.max_age = max_age  # max_age in seconds
         self.decay_rate = decay_rate  # Decay rate per minute
         self.context_triggers = ContextTriggers()
 
-    def update_context(self, user_id: str, new_messages: List[Message]) -> None:
+    async def update_context(self, user_id: str, new_messages: List[Message]) -> None:
         """
         Update the context for a user with new messages.
 
+        Relevance is never stored back; it is derived from each message's timestamp when
+        the context is read, so an update is a single append-and-trim on the store.
+        Messages are copied into compact `ContextRecord`s; nothing keeps the originals.
+
         Args:
             user_id (str): The ID of the user whose context is being updated.
             new_messages (List[Message]): List of new messages to add to the context.
         """
         logging.debug(f"Received messages for update: {[{'role': m.role, 'content': m.content, 'timestamp': m.timestamp} for m in new_messages]}")
 
-        context_queue = self._get_or_create_context_queue(user_id)
         current_time = time.time() 
-
-        self._update_existing_messages(context_queue, current_time)
-        new_messages = self._filter_new_messages(new_messages, current_time)
-        self._add_new_messages(context_queue, new_messages)
+        new_messages = self._filter_new_messages([ContextRecord.from_message(msg) for msg in new_messages], current_time)
+        self._fault_in(user_id)
+        evicted = await self.store.append(user_id, self._build_entries(new_messages), self.max_length, self.max_age)
+        if self.store.needs_expiry:
+            # Already-scheduled users keep their earlier deadline and are re-armed when it fires
+            self.expiry.schedule("context", user_id, current_time + self.max_age)
+        if self.summarizer is not None:
+            self.summarizer.fold(user_id, [entry.message for entry in evicted])
         self._update_conversation_history(user_id, new_messages)
-        self._trim_context_queue(context_queue)
-
-        self._log_final_context_state(context_queue)
+        self._account(user_id)
+        self.budget.touch(user_id)
+        self._enforce_budget(user_id)
+        if self.memory is not None:
+            # Last, since indexing awaits a file write; everything above happens in one step
+            self.expiry.schedule("memory", user_id, current_time + self.memory.idle_ttl)
+            await self.memory.add(user_id, new_messages)
 
-    def _get_or_create_context_queue(self, user_id: str) -> deque:
-        """Get or create a context queue for a user."""
-        return self.contexts.setdefault(user_id, deque())
+        logging.debug(f"Added {len(new_messages)} messages to the context for user {user_id}")
 
-    def _update_existing_messages(self, context_queue: deque, current_time: float) -> None:
-        """Update relevance of existing messages and remove outdated ones."""
-        context_queue_copy = list(context_queue)
-        for msg in context_queue_copy:
-            age_seconds = current_time - msg.timestamp
-            if age_seconds >= self.max_age:
-                context_queue.remove(msg)
-                logging.debug(f"Removed message due to age: {msg.content}")
-            elif not self._update_message_relevance(msg, age_seconds):
-                context_queue.remove(msg)
-                logging.debug(f"Removed message due to low relevance: {msg.content}")
+    def _expires_at(self, timestamp: float, base_relevance: float) -> float:
+        """Work out when a message will be too old or too decayed to keep."""
+        lifetime = float(self.max_age)
+        if self.decay_rate > 0:
+            lifetime = min(lifetime, (base_relevance - MIN_RELEVANCE) / self.decay_rate * 60)
+        return timestamp + lifetime
 
-    def _update_message_relevance(self, msg: Message, age_seconds: float) -> bool:
+    def _relevance(self, entry: ContextEntry, current_time: float) -> float:
         """
-        Update the relevance of a message based on its age.
+        Compute a message's relevance from its age.
 
         Args:
-            msg (Message): The message to update.
-            age_seconds (float): The age of the message in seconds.
+            entry (ContextEntry): The queued message.
+            current_time (float): The time to compute the relevance at.
 
         Returns:
-            bool: True if the message is still relevant, False otherwise.
+            float: The base relevance, decayed by `decay_rate` per minute of age.
         """
-        if msg.relevance is None:
-            msg.relevance = 1.0
-        msg.relevance -= self.decay_rate * (age_seconds / 60)
-        if msg.relevance <= 0.1:
-            logging.debug(f"Message relevance too low: {msg.content}")
-            return False
-        return True
+        age_seconds = current_time - entry.message.timestamp
+        return max(0.0, entry.base_relevance - self.decay_rate * (age_seconds / 60))
 
-    def _filter_new_messages(self, new_messages: List[Message], current_time: float) -> List[Message]:
+    def _filter_new_messages(self, new_messages: List[ContextRecord], current_time: float) -> List[ContextRecord]:
         """Filter out messages that are too old."""
         return [msg for msg in new_messages if msg.timestamp is not None and current_time - msg.timestamp < self.max_age]
 
-    def _add_new_messages(self, context_queue: deque, new_messages: List[Message]) -> None:
-        """Add new messages to the context queue."""
-        context_queue.extend(new_messages)
-        logging.debug("New context queue state:")
-        for msg in context_queue:
-            logging.debug(f"Updated message: {msg.content}, timestamp: {msg.timestamp}")
+    def _build_entries(self, new_messages: List[ContextRecord]) -> List[ContextEntry]:
+        """Wrap new messages with their starting relevance and expiry time."""
+        entries = []
+        for msg in new_messages:
+            base_relevance = msg.relevance if msg.relevance is not None else 1.0
+            entries.append(ContextEntry(msg, base_relevance, self._expires_at(msg.timestamp, base_relevance)))
+            logging.debug(f"Added message: {msg.content}, timestamp: {msg.timestamp}")
+        return entries
 
-    def _update_conversation_history(self, user_id: str, new_messages: List[Message]) -> None:
+    def _update_conversation_history(self, user_id: str, new_messages: List[ContextRecord]) -> None:
         """Update the conversation history for a user."""
         if user_id not in self.conversation_history:
-            self.conversation_history[user_id] = []
+            self.conversation_history[user_id] = deque()
         timestamp = time.time()
         self.conversation_history[user_id].extend([(message, timestamp) for message in new_messages])
+        self.expiry.schedule("history", user_id, timestamp + self.history_max_age)
+
+    async def _expire_context(self, user_id: str, now: float) -> Optional[float]:
+        """Expiry handler: drop the user's context queue once it has been idle past its TTL, folding what it held into the summary."""
+        next_deadline = await self.store.expire(user_id, now)
+        dropped = self.store.take_evicted(user_id)
+        if dropped and self.summarizer is not None:
+            self.summarizer.fold(user_id, [entry.message for entry in dropped])
+        self._account(user_id)
+        return next_deadline
+
+    async def _expire_history(self, user_id: str, now: float) -> Optional[float]:
+        """Expiry handler: pop the user's history messages older than `history_max_age`."""
+        history = self.conversation_history.get(user_id)
+        if history is None:
+            return None
+        while history and now - history[0][1] > self.history_max_age:
+            history.popleft()
+            self.expired_history_messages += 1
+        if not history:
+            del self.conversation_history[user_id]
+        self._account(user_id)
+        return history[0][1] + self.history_max_age if history else None
+
+    async def _expire_spill(self, user_id: str, now: float) -> Optional[float]:
+        """Expiry handler: delete a spilled user's file once everything in it has expired."""
+        return self.spill.expire(user_id, now) if self.spill is not None else None
+
+    async def _expire_memory(self, user_id: str, now: float) -> Optional[float]:
+        """Expiry handler: unload the user's long-term memory index once it has been idle past its TTL."""
+        return self.memory.expire(user_id, now)
+
+    def _account(self, user_id: str) -> None:
+        """Report how many messages a user now holds in memory to the budget; long-term memory has a budget of its own."""
+        history = self.conversation_history.get(user_id)
+        self.budget.resize(user_id, self.store.resident_size(user_id) + (len(history) if history else 0))
+
+    def _enforce_budget(self, current_user_id: str) -> None:
+        """Evict least recently used users, never the one being served, until memory fits the budget."""
+        if not self.budget.over_budget:
+            return
+        for user_id in self.budget.victims(exclude=current_user_id):
+            self._evict(user_id)
+
+    def _evict(self, user_id: str) -> None:
+        """Take a user's context queue, history and long-term memory index out of memory, spilling the first two to disk if configured."""
+        detached = self.store.detach(user_id)
+        history = self.conversation_history.pop(user_id, None)
+        if self.memory is not None:
+            # Written out in the background and reopened from disk on the user's next message
+            self.memory.unload(user_id)
+        self.budget.record_eviction(user_id)
+        if self.spill is not None:
+            state = UserState(history=list(history) if history else [], saved_at=time.time())
+            if detached is not None:
+                state.context, state.idle_until = detached
+            expires_at = self._state_expires_at(state)
+            if self.spill.write(user_id, state, expires_at):
+                self.expiry.schedule("spill", user_id, expires_at)
+                return
+        if detached is not None and self.summarizer is not None:
+            # Without a spill tier the context is gone, but it can still live on in the summary
+            self.summarizer.fold(user_id, [entry.message for entry in detached[0]])
+
+    def _state_expires_at(self, state: UserState) -> float:
+        """When everything in a user's saved state will have expired."""
+        history_expires_at = state.history[-1][1] + self.history_max_age if state.history else 0.0
+        return max(state.idle_until, state.summary_expires_at, history_expires_at)
+
+    def _fault_in(self, user_id: str) -> None:
+        """Bring a user's state back from the restart snapshot or the spill store, if either holds it."""
+        states = []
+        for tier in (self.snapshot, self.spill):
+            if tier is None or user_id not in tier:
+                continue
+            state = tier.take(user_id)
+            if state is not None:
+                states.append(state)
+        if not states:
+            return
+        # A user spilled after the snapshot was written is in both after a crash. The spilled
+        # state was taken from memory that already held everything in the snapshot, so only
+        # the newer copy is restored
+        self._restore(user_id, max(states, key=lambda state: state.saved_at))
+        self._account(user_id)
+        self._enforce_budget(user_id)
+
+    def _restore(self, user_id: str, state: UserState) -> None:
+        """Put saved state back in front of whatever the user has accumulated since, dropping what has expired."""
+        now = time.time()
+        if state.context and state.idle_until > now and self.store.needs_expiry:
+            self.store.attach(user_id, state.context, state.idle_until)
+            self.expiry.schedule("context", user_id, state.idle_until)
+        if state.summary is not None and state.summary_expires_at > now:
+            self.store.attach_summary(user_id, state.summary, state.summary_expires_at)
+            if self.store.needs_expiry:
+                self.expiry.schedule("context", user_id, state.summary_expires_at)
+        history = deque((message, timestamp) for message, timestamp in state.history if now - timestamp <= self.history_max_age)
+        if history:
+            history.extend(self.conversation_history.get(user_id, ()))
+            self.conversation_history[user_id] = history
+            self.expiry.schedule("history", user_id, history[0][1] + self.history_max_age)
+
+    def _open_snapshot(self) -> Optional[SnapshotReader]:
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return None
+        try:
+            snapshot = SnapshotReader(self.snapshot_path)
+        except (OSError, ValueError) as e:
+            logging.error(f"Ignoring unreadable context snapshot {self.snapshot_path}: {e}")
+            return None
+        logging.info(f"Context snapshot from {time.ctime(snapshot.written_at)} has {len(snapshot)} users to restore on demand")
+        return snapshot
+
+    async def _capture(self, chunk_size: int = 1000) -> Dict[str, Tuple[UserState, float]]:
+        """
+        Copy every live user's state for a snapshot.
+
+        Only the containers are copied, `chunk_size` users at a time with a yield to the
+        event loop in between; each user's copy is consistent, and encoding happens later
+        in a worker thread. Users evicted or expired between chunks are left out.
+        """
+        user_ids = list(self.store.resident_users() | self.conversation_history.keys())
+        states: Dict[str, Tuple[UserState, float]] = {}
+        for start in range(0, len(user_ids), chunk_size):
+            saved_at = time.time()
+            for user_id in user_ids[start:start + chunk_size]:
+                state = UserState(saved_at=saved_at)
+                queue = self.store.export_queue(user_id)
+                if queue is not None:
+                    state.context, state.idle_until = queue
+                summary = self.store.export_summary(user_id)
+                if summary is not None:
+                    state.summary_expires_at, state.summary = summary
+                history = self.conversation_history.get(user_id)
+                if history:
+                    state.history = list(history)
+                if queue is None and summary is None and not history:
+                    continue
+                states[user_id] = (state, self._state_expires_at(state))
+            await asyncio.sleep(0)
+        return states
+
+    async def save_snapshot(self) -> None:
+        """Write every live user's state, plus users not yet restored from the last snapshot, to `snapshot_path`."""
+        if not self.snapshot_path:
+            return
+        async with self._snapshot_lock:
+            started = time.perf_counter()
+            now = time.time()
+            states = await self._capture()
+            if self.snapshot is None:
+                users, size = await asyncio.to_thread(write_snapshot, self.snapshot_path, states, (), now)
+            else:
+                carried = self.snapshot.remaining(now)
+                temp_path, users, size = await asyncio.to_thread(prepare_snapshot, self.snapshot_path, states, carried, now)
+                # The carried blobs are views into the mapped file, which has to be closed before it is replaced
+                for _, blob, _ in carried:
+                    blob.release()
+                self.snapshot.replace_with(temp_path)
+                if not len(self.snapshot):
+                    self.snapshot.close()
+                    self.snapshot = None
+            self.snapshots_written += 1
+            self.last_snapshot_users = users
+            self.last_snapshot_bytes = size
+            self.last_snapshot_seconds = time.perf_counter() - started
+            logging.debug(f"Wrote context snapshot of {users} users ({size} bytes) in {self.last_snapshot_seconds:.2f}s")
+
+    async def _run_snapshots(self) -> None:
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            try:
+                await self.save_snapshot()
+            except Exception as e:
+                logging.error(f"Failed to write context snapshot: {e}", exc_info=True)
 
-    def _trim_context_queue(self, context_queue: deque) -> None:
-        """Trim the context queue to the maximum allowed length."""
-        while len(context_queue) > self.max_length:
-            removed_msg = context_queue.popleft()
-            logging.debug(f"Removing message due to max length: {removed_msg.content}")
+    def _live_messages(self, entries: List[ContextEntry], current_time: float, max_length: Optional[int]) -> List[ContextRecord]:
+        """Drop expired entries and copy each remaining message with its relevance as of `current_time`."""
+        live = [entry for entry in entries if entry.expires_at > current_time]
+        if max_length:
+            live = live[-max_length:]
+        return [entry.message.with_relevance(self._relevance(entry, current_time)) for entry in live]
 
-    def _log_final_context_state(self, context_queue: deque) -> None:
-        """Log the final state of the context queue."""
-        logging.debug("Final context state:")
-        for msg in context_queue:
-            logging.debug(f"Message: {msg.content}, Relevance: {msg.relevance}, Timestamp: {msg.timestamp}")
-            
-    def get_context(self, user_id: str, max_length: Optional[int] = None) -> List[Message]:
+    async def get_context(self, user_id: str, max_length: Optional[int] = None) -> List[ContextRecord]:
         """
         Get the current context for a user.
 
+        Each returned message is a copy whose `relevance` is the decayed value at the time of the call.
+
         Args:
             user_id (str): The ID of the user.
             max_length (Optional[int]): Maximum number of messages to return.
 
         Returns:
-            List[Message]: List of context messages.
+            List[ContextRecord]: List of context messages.
         """
-        if user_id not in self.contexts:
-            return []
-        context = list(self.contexts[user_id])
-        if max_length:
-            context = context[-max_length:]
-        return context
+        self._fault_in(user_id)
+        self.budget.touch(user_id)
+        entries = await self.store.read(user_id)
+        return self._live_messages(entries, time.time(), max_length)
+
+    async def get_summary(self, user_id: str) -> Optional[str]:
+        """
+        Get the running summary of a user's messages that have left the context window.
+
+        Args:
+            user_id (str): The ID of the user.
+
+        Returns:
+            Optional[str]: The summary, or None if nothing has been summarized yet.
+        """
+        if self.summarizer is None:
+            return None
+        self._fault_in(user_id)
+        return await self.store.read_summary(user_id)
 
-    def get_conversation_history(self, user_id: str, timestamp: Optional[float] = None) -> List[Tuple[Message, float]]:
+    async def get_contexts(self, user_ids: List[str], max_length: Optional[int] = None) -> Dict[str, List[ContextRecord]]:
+        """
+        Get the current context for several users in one store round trip.
+
+        Args:
+            user_ids (List[str]): The IDs of the users.
+            max_length (Optional[int]): Maximum number of messages to return per user.
+
+        Returns:
+            Dict[str, List[ContextRecord]]: Context messages keyed by user ID.
+        """
+        for user_id in user_ids:
+            self._fault_in(user_id)
+            self.budget.touch(user_id)
+        entries_by_user = await self.store.read_many(user_ids)
+        current_time = time.time()
+        return {
+            user_id: self._live_messages(entries, current_time, max_length)
+            for user_id, entries in entries_by_user.items()
+        }
+
+    def get_conversation_history(self, user_id: str, timestamp: Optional[float] = None) -> List[Tuple[ContextRecord, float]]:
         """
         Get the conversation history for a user.
 
@@ -131,14 +395,15 @@ class ChatContextManager:
             timestamp (Optional[float]): Optional timestamp to filter history from.
 
         Returns:
-            List[Tuple[Message, float]]: List of tuples containing messages and their timestamps.
+            List[Tuple[ContextRecord, float]]: List of tuples containing messages and their timestamps.
         """
+        self._fault_in(user_id)
         if user_id not in self.conversation_history:
             return []
         history = self.conversation_history[user_id]
         if timestamp:
-            history = [(msg, ts) for msg, ts in history if ts >= timestamp]
-        return history
+            return [(msg, ts) for msg, ts in history if ts >= timestamp]
+        return list(history)
 
     def clear_conversation_history(self, user_id: str) -> None:
         """
@@ -147,8 +412,10 @@ class ChatContextManager:
         Args:
             user_id (str): The ID of the user.
         """
+        self._fault_in(user_id)
         if user_id in self.conversation_history:
-            self.conversation_history[user_id] = []
+            self.conversation_history[user_id] = deque()
+            self._account(user_id)
 
     def generate_response(self, user_id: str, message: Message, triggered_context: List[Message]) -> Message:
         """
@@ -175,6 +442,56 @@ class ChatContextManager:
         processed_response = post_process_response(cleaned_response)
         return Message(role="assistant", content=processed_response)
     
+    def start(self) -> None:
+        """Start background work (summarization and snapshots, if enabled)."""
+        if self.summarizer is not None:
+            self.summarizer.start()
+        if self.snapshot_path and (self._snapshot_task is None or self._snapshot_task.done()):
+            self._snapshot_task = asyncio.create_task(self._run_snapshots())
+
     async def shutdown(self):
-        # Implement any cleanup logic here
-        pass
\ No newline at end of file
+        await self.expiry.stop()
+        if self.memory is not None:
+            await self.memory.flush()
+        if self.summarizer is not None:
+            await self.summarizer.stop()
+        if self._snapshot_task is not None:
+            self._snapshot_task.cancel()
+            try:
+                await self._snapshot_task
+            except asyncio.CancelledError:
+                pass
+            self._snapshot_task = None
+        if self.snapshot_path:
+            try:
+                await self.save_snapshot()
+            except Exception as e:
+                logging.error(f"Failed to write context snapshot on shutdown: {e}", exc_info=True)
+
+    def expiry_stats(self) -> Dict[str, Any]:
+        """Expiry scheduler counters, plus how much history is currently retained."""
+        return {
+            **self.expiry.stats(),
+            "history_users": len(self.conversation_history),
+            "history_messages_retained": sum(len(history) for history in self.conversation_history.values()),
+            "history_messages_expired": self.expired_history_messages,
+        }
+
+    def memory_stats(self) -> Dict[str, Any]:
+        """Memory budget occupancy and evictions, plus spill tier counters if there is one."""
+        return {
+            **self.budget.stats(),
+            "spill": self.spill.stats() if self.spill is not None else None,
+        }
+
+    def snapshot_stats(self) -> Dict[str, Any]:
+        """Snapshot writes and lazy restore progress."""
+        return {
+            "path": self.snapshot_path,
+            "interval": self.snapshot_interval,
+            "snapshots_written": self.snapshots_written,
+            "last_snapshot_users": self.last_snapshot_users,
+            "last_snapshot_bytes": self.last_snapshot_bytes,
+            "last_snapshot_seconds": round(self.last_snapshot_seconds, 3),
+            "restore": self.snapshot.stats() if self.snapshot is not None else None,
+        }
\ No newline at end of file
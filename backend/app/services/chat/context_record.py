@@ -0,0 +1,55 @@
+# app/services/chat/context_record.py
+
+import sys
+from datetime import datetime
+from typing import Any, Optional
+
+class ContextRecord:
+    """
+    A chat message as the context manager keeps it in memory.
+
+    ORM `Message` instances carry SQLAlchemy instrumentation state and pydantic
+    `MessageRead` objects a per-instance `__dict__` plus validation metadata; with
+    millions of short lines held in context queues and history that overhead dominates.
+    A record has fixed slots only, and its `role` and `user_id` are interned so every
+    message of a user shares one string. It has the same attributes the prompt code
+    reads from a message, so it can be used in place of one; `from_message` converts
+    incoming messages.
+
+    Records are shared by the context queue, history and snapshots, so they are never
+    changed once built; readers that need a different relevance get a copy.
+    """
+
+    __slots__ = ("id", "role", "content", "user_id", "timestamp", "relevance")
+
+    def __init__(self, id: str, role: str, content: str, user_id: str, timestamp: float, relevance: Optional[float] = 1.0):
+        self.id = id
+        self.role = sys.intern(role)
+        self.content = content
+        self.user_id = sys.intern(user_id)
+        self.timestamp = timestamp
+        self.relevance = relevance
+
+    @classmethod
+    def from_message(cls, message: Any) -> "ContextRecord":
+        """Build a record from a `Message`, `MessageRead` or another record."""
+        if isinstance(message, cls):
+            return message
+        timestamp = message.timestamp
+        if isinstance(timestamp, datetime):
+            timestamp = timestamp.timestamp()
+        return cls(
+            str(message.id),
+            message.role,
+            message.content,
+            str(message.user_id),
+            timestamp,
+            message.relevance if message.relevance is not None else 1.0
+        )
+
+    def with_relevance(self, relevance: float) -> "ContextRecord":
+        """A copy of this record with a different relevance; the strings are shared, not copied."""
+        return ContextRecord(self.id, self.role, self.content, self.user_id, self.timestamp, relevance)
+
+    def __repr__(self) -> str:
+        return f"ContextRecord(role={self.role!r}, user_id={self.user_id!r}, timestamp={self.timestamp}, content={self.content!r})"
\ No newline at end of file
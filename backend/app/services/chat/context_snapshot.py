@@ -0,0 +1,256 @@
+# app/services/chat/context_snapshot.py
+
+import json
+import logging
+import marshal
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from app.services.chat.context_record import ContextRecord
+from app.services.chat.context_store import ContextEntry
+
+# Magic, Python major and minor version, index offset, index length, time written
+_HEADER = struct.Struct("<8sHHQQd")
+_MAGIC = b"AFCTXSN2"
+_RAW = b"m"
+_COMPRESSED = b"z"
+_COMPRESS_MIN_BYTES = 4096
+
+@dataclass
+class UserState:
+    """A user's in-memory chat state: context queue, conversation history and running summary."""
+    context: List[ContextEntry] = field(default_factory=list)
+    idle_until: float = 0.0
+    history: List[Tuple[ContextRecord, float]] = field(default_factory=list)
+    summary: Optional[str] = None
+    summary_expires_at: float = 0.0
+    # When the state was captured; if a user turns up in more than one tier, the newest copy wins
+    saved_at: float = 0.0
+
+def encode_state(state: UserState) -> bytes:
+    """
+    Serialize a user's state with `marshal`, compressing it only when it is large.
+
+    Messages are flattened into positional rows. Most of a user's context messages are
+    also in their history; marshal writes an object it has already written as a back
+    reference, so their strings are stored once. The marshal format only promises
+    compatibility within a Python version, which is all a restart or spill needs;
+    snapshot files record the version they were written by.
+    """
+    payload = (
+        [
+            (entry.message.id, entry.message.role, entry.message.content, entry.message.user_id,
+             entry.message.timestamp, entry.message.relevance, entry.base_relevance, entry.expires_at)
+            for entry in state.context
+        ],
+        state.idle_until,
+        [
+            (message.id, message.role, message.content, message.user_id, message.timestamp, message.relevance, timestamp)
+            for message, timestamp in state.history
+        ],
+        state.summary,
+        state.summary_expires_at,
+        state.saved_at,
+    )
+    data = marshal.dumps(payload)
+    # Compressing costs a fixed ~50us per call, which only pays off for bigger states
+    if len(data) >= _COMPRESS_MIN_BYTES:
+        return _COMPRESSED + zlib.compress(data, 1)
+    return _RAW + data
+
+def decode_state(data: bytes) -> UserState:
+    data = bytes(data)
+    payload = marshal.loads(zlib.decompress(data[1:]) if data[:1] == _COMPRESSED else data[1:])
+    context_rows, idle_until, history_rows, summary, summary_expires_at, *rest = payload
+    saved_at = rest[0] if rest else 0.0
+    # Share one record between a message's context entry and its history entry, as in memory
+    # (keyed by the whole row, since messages that never reached the database have no ID)
+    records: Dict[Tuple[Any, ...], ContextRecord] = {}
+    context = []
+    for *fields, base_relevance, expires_at in context_rows:
+        record = records[tuple(fields)] = ContextRecord(*fields)
+        context.append(ContextEntry(record, base_relevance, expires_at))
+    history = []
+    for *fields, timestamp in history_rows:
+        record = records.get(tuple(fields)) or ContextRecord(*fields)
+        history.append((record, timestamp))
+    return UserState(context, idle_until, history, summary, summary_expires_at, saved_at)
+
+def prepare_snapshot(path: str, states: Dict[str, Tuple[UserState, float]], carried: Iterable[Tuple[str, Any, float]] = (), written_at: float = 0.0) -> Tuple[str, int, int]:
+    """
+    Write a snapshot next to `path` under a temporary name. Blocking; run it off the event loop.
+
+    The file is a fixed header, then one `encode_state` blob per user, then a compressed
+    JSON index of user ID -> (offset, length, expires_at) that readers load up front.
+    The caller moves it into place, see `write_snapshot` and `SnapshotReader.replace_with`.
+
+    Args:
+        path (str): Where the snapshot will live.
+        states (Dict[str, Tuple[UserState, float]]): Live users' state and when it all expires.
+        carried (Iterable[Tuple[str, Any, float]]): Already-encoded users copied from a previous snapshot.
+        written_at (float): Timestamp recorded in the header.
+
+    Returns:
+        Tuple[str, int, int]: The temporary file, and the number of users and bytes written.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".snapshot-")
+    index: Dict[str, Tuple[int, int, float]] = {}
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, *sys.version_info[:2], 0, 0, written_at))
+            offset = _HEADER.size
+
+            def add(user_id: str, blob: Any, expires_at: float) -> None:
+                nonlocal offset
+                f.write(blob)
+                index[user_id] = (offset, len(blob), expires_at)
+                offset += len(blob)
+
+            for user_id, (state, expires_at) in states.items():
+                add(user_id, encode_state(state), expires_at)
+            for user_id, blob, expires_at in carried:
+                if user_id not in index:
+                    add(user_id, blob, expires_at)
+            raw_index = zlib.compress(json.dumps(index, separators=(",", ":")).encode("utf-8"))
+            f.write(raw_index)
+            f.seek(0)
+            f.write(_HEADER.pack(_MAGIC, *sys.version_info[:2], offset, len(raw_index), written_at))
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        _remove_quietly(temp_path)
+        raise
+    return temp_path, len(index), offset + len(raw_index)
+
+def write_snapshot(path: str, states: Dict[str, Tuple[UserState, float]], carried: Iterable[Tuple[str, Any, float]] = (), written_at: float = 0.0) -> Tuple[int, int]:
+    """
+    Write a snapshot file atomically. Blocking; run it off the event loop.
+
+    `path` is replaced only once the new file is complete, so it must not be open in a
+    SnapshotReader (Windows refuses to replace a mapped file); use `replace_with` for that.
+
+    Returns:
+        Tuple[int, int]: The number of users and bytes written.
+    """
+    temp_path, users, size = prepare_snapshot(path, states, carried, written_at)
+    try:
+        os.replace(temp_path, path)
+    except BaseException:
+        _remove_quietly(temp_path)
+        raise
+    return users, size
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+class SnapshotReader:
+    """
+    Lazily restores users from a snapshot file.
+
+    Opening maps the file and loads only the index; a user's blob is decoded the first
+    time `take` is called for them, so startup time does not grow with conversation
+    volume. Each user can be taken once. Users never taken are handed to the next
+    snapshot by `remaining`, still encoded.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._open()
+        self.loaded_users = len(self._index)
+        self.restored = 0
+        self.errors = 0
+
+    def _open(self) -> None:
+        self._file = open(self.path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, major, minor, index_offset, index_length, self.written_at = _HEADER.unpack_from(self._map, 0)
+            if magic != _MAGIC:
+                raise ValueError(f"{self.path} is not a context snapshot")
+            if (major, minor) != sys.version_info[:2]:
+                raise ValueError(f"{self.path} was written by Python {major}.{minor}")
+            raw_index = self._map[index_offset:index_offset + index_length]
+            self._index: Dict[str, List[Any]] = json.loads(zlib.decompress(raw_index))
+        except BaseException:
+            if getattr(self, "_map", None) is not None and not self._map.closed:
+                self._map.close()
+            self._file.close()
+            raise
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def take(self, user_id: str, now: Optional[float] = None) -> Optional[UserState]:
+        """Decode and remove a user from the snapshot, or return None if they are not in it or expired."""
+        entry = self._index.pop(user_id, None)
+        if entry is None:
+            return None
+        offset, length, expires_at = entry
+        if now is not None and expires_at <= now:
+            return None
+        try:
+            state = decode_state(self._map[offset:offset + length])
+        except (ValueError, EOFError, TypeError, zlib.error) as e:
+            self.errors += 1
+            logging.error(f"Failed to restore context snapshot for user {user_id}: {e}")
+            return None
+        self.restored += 1
+        return state
+
+    def remaining(self, now: float) -> List[Tuple[str, memoryview, float]]:
+        """Users not taken yet whose state has not expired, as zero-copy views of their blobs."""
+        view = memoryview(self._map)
+        return [
+            (user_id, view[offset:offset + length], expires_at)
+            for user_id, (offset, length, expires_at) in self._index.items()
+            if expires_at > now
+        ]
+
+    def replace_with(self, temp_path: str) -> None:
+        """
+        Move a newly written snapshot over this reader's file and carry on reading from it.
+
+        Windows refuses to replace a file that is still mapped, so the map is closed first
+        and the new file mapped in its place. Views from `remaining` must have been released.
+        Users already taken stay taken, even though the new file holds them again.
+
+        Args:
+            temp_path (str): The file returned by `prepare_snapshot`.
+        """
+        pending = set(self._index)
+        self.close()
+        try:
+            os.replace(temp_path, self.path)
+        except BaseException:
+            _remove_quietly(temp_path)
+            raise
+        finally:
+            # If the replace failed, this reopens the old file
+            self._open()
+        self._index = {user_id: entry for user_id, entry in self._index.items() if user_id in pending}
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "loaded_users": self.loaded_users,
+            "restored_users": self.restored,
+            "pending_users": len(self._index),
+            "errors": self.errors,
+        }
\ No newline at end of file
@@ -0,0 +1,403 @@
+# app/services/chat/context_store.py
+
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from app.core.config import settings
+from app.services.chat.context_record import ContextRecord
+
+class ContextEntry(NamedTuple):
+    """A message in a context queue, with what is needed to work out its relevance on read."""
+    message: ContextRecord
+    base_relevance: float
+    expires_at: float
+
+def message_to_dict(message: ContextRecord) -> Dict[str, Any]:
+    """Serialize the fields of a message that context storage keeps."""
+    return {
+        "id": str(message.id),
+        "role": message.role,
+        "content": message.content,
+        "user_id": message.user_id,
+        "timestamp": message.timestamp,
+        "relevance": message.relevance if message.relevance is not None else 1.0,
+    }
+
+def message_from_dict(data: Dict[str, Any]) -> ContextRecord:
+    return ContextRecord(**data)
+
+def entry_to_dict(entry: ContextEntry) -> Dict[str, Any]:
+    return {**message_to_dict(entry.message), "base_relevance": entry.base_relevance, "expires_at": entry.expires_at}
+
+def entry_from_dict(data: Dict[str, Any]) -> ContextEntry:
+    data = dict(data)
+    base_relevance = data.pop("base_relevance")
+    expires_at = data.pop("expires_at")
+    # The relevance stored with the message may already be decayed; reads recompute it from the base
+    data["relevance"] = base_relevance
+    return ContextEntry(message_from_dict(data), base_relevance, expires_at)
+
+class ContextStore(ABC):
+    """
+    Where chat context queues live.
+
+    A queue is a user's recent messages in arrival order, capped at a maximum length.
+    Appending and trimming happen as one atomic step, and a queue that is not written
+    to for `ttl` seconds is dropped as a whole. Alongside each queue the store keeps a
+    running summary of the messages that have left it.
+    """
+
+    name = "base"
+    # Whether idle queues must be expired by the caller (through `expire`) rather than by the store itself
+    needs_expiry = False
+
+    @abstractmethod
+    async def append(self, user_id: str, entries: List[ContextEntry], max_length: int, ttl: float) -> List[ContextEntry]:
+        """
+        Append entries to a user's queue, trim it to `max_length` and refresh its TTL.
+
+        Args:
+            user_id (str): The ID of the user.
+            entries (List[ContextEntry]): Entries to add, oldest first.
+            max_length (int): The most entries to keep; the oldest are dropped first.
+            ttl (float): Seconds of inactivity after which the whole queue is dropped.
+
+        Returns:
+            List[ContextEntry]: Entries that left the queue since the last append, oldest first.
+        """
+
+    @abstractmethod
+    async def read(self, user_id: str) -> List[ContextEntry]:
+        """Return a user's queue, oldest first. Entries past their `expires_at` may still be included."""
+
+    async def read_many(self, user_ids: Iterable[str]) -> Dict[str, List[ContextEntry]]:
+        """Return several users' queues at once."""
+        return {user_id: await self.read(user_id) for user_id in user_ids}
+
+    @abstractmethod
+    async def clear(self, user_id: str) -> None:
+        """Drop a user's queue."""
+
+    @abstractmethod
+    async def read_summary(self, user_id: str) -> Optional[str]:
+        """Return the running summary of a user's older messages, if there is one."""
+
+    @abstractmethod
+    async def write_summary(self, user_id: str, summary: str, ttl: float) -> None:
+        """Replace a user's running summary, keeping it for `ttl` seconds."""
+
+    async def expire(self, user_id: str, now: float) -> Optional[float]:
+        """
+        Drop whatever a user has that is past its TTL, for stores that do not expire data by themselves.
+
+        Args:
+            user_id (str): The ID of the user.
+            now (float): The current time.
+
+        Returns:
+            Optional[float]: When something of the user's expires next, or None if nothing is left.
+        """
+        return None
+
+    def resident_size(self, user_id: str) -> int:
+        """How many of a user's entries this process holds in memory."""
+        return 0
+
+    def take_evicted(self, user_id: str) -> List[ContextEntry]:
+        """
+        Hand over entries that expired out of a user's queue, for stores that expire data in this process.
+
+        These are the entries the next `append` would otherwise return, including the
+        contents of a queue dropped for being idle, so they can still be summarized.
+        """
+        return []
+
+    def detach(self, user_id: str) -> Optional[Tuple[List[ContextEntry], float]]:
+        """
+        Remove a user's queue from memory and hand it over, for stores that hold queues in this process.
+
+        Returns:
+            Optional[Tuple[List[ContextEntry], float]]: The entries and the time the queue goes idle, or None.
+        """
+        return None
+
+    def attach(self, user_id: str, entries: List[ContextEntry], idle_until: float) -> None:
+        """Put back a queue taken out by `detach`."""
+
+    def attach_summary(self, user_id: str, summary: str, expires_at: float) -> None:
+        """Restore a saved summary unless the user already has a newer one."""
+
+    def resident_users(self) -> Set[str]:
+        """IDs of the users with a queue or summary held in this process."""
+        return set()
+
+    def export_queue(self, user_id: str) -> Optional[Tuple[List[ContextEntry], float]]:
+        """Copy of a user's queue held in this process, with the time it goes idle, or None."""
+        return None
+
+    def export_summary(self, user_id: str) -> Optional[Tuple[float, str]]:
+        """A user's summary held in this process, with its expiry time, or None."""
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+class InMemoryContextStore(ContextStore):
+    """
+    Queues held in this process.
+
+    Everything runs on the event loop without awaiting, so append and trim are atomic.
+    Entries whose `expires_at` has passed are popped from the head as queues are touched
+    and handed back by the next append, and idle queues are dropped lazily on access or
+    by `expire`, which the context manager's expiry scheduler calls when they fall due.
+    A dropped queue's entries are kept with the popped ones until an append or
+    `take_evicted` hands them back.
+    """
+
+    name = "memory"
+    needs_expiry = True
+
+    def __init__(self):
+        self._queues: Dict[str, deque] = {}
+        self._idle_until: Dict[str, float] = {}
+        self._evicted: Dict[str, List[ContextEntry]] = {}
+        self._summaries: Dict[str, Tuple[float, str]] = {}
+        self.appends = 0
+        self.reads = 0
+        self.expired_entries = 0
+        self.expired_queues = 0
+
+    def _live_queue(self, user_id: str, now: float) -> Optional[deque]:
+        queue = self._queues.get(user_id)
+        if queue is None:
+            return None
+        if self._idle_until[user_id] <= now:
+            self._retire(user_id)
+            return None
+        # Queues are in arrival order, so expired entries collect at the head
+        while queue and queue[0].expires_at <= now:
+            self._evicted.setdefault(user_id, []).append(queue.popleft())
+            self.expired_entries += 1
+        return queue
+
+    def _drop(self, user_id: str) -> None:
+        self._queues.pop(user_id, None)
+        self._idle_until.pop(user_id, None)
+        self._evicted.pop(user_id, None)
+
+    def _retire(self, user_id: str) -> None:
+        """Drop an idle queue, keeping its entries to be handed back."""
+        queue = self._queues.pop(user_id)
+        del self._idle_until[user_id]
+        if queue:
+            self._evicted.setdefault(user_id, []).extend(queue)
+        self.expired_queues += 1
+
+    async def append(self, user_id: str, entries: List[ContextEntry], max_length: int, ttl: float) -> List[ContextEntry]:
+        now = time.time()
+        queue = self._live_queue(user_id, now)
+        if queue is None:
+            queue = self._queues[user_id] = deque()
+        evicted = self._evicted.pop(user_id, [])
+        queue.extend(entries)
+        while len(queue) > max_length:
+            evicted.append(queue.popleft())
+        self._idle_until[user_id] = now + ttl
+        self.appends += 1
+        return evicted
+
+    async def read(self, user_id: str) -> List[ContextEntry]:
+        self.reads += 1
+        queue = self._live_queue(user_id, time.time())
+        return list(queue) if queue else []
+
+    async def clear(self, user_id: str) -> None:
+        self._drop(user_id)
+        self._summaries.pop(user_id, None)
+
+    async def read_summary(self, user_id: str) -> Optional[str]:
+        entry = self._summaries.get(user_id)
+        if entry is None:
+            return None
+        expires_at, summary = entry
+        if expires_at <= time.time():
+            del self._summaries[user_id]
+            return None
+        return summary
+
+    async def write_summary(self, user_id: str, summary: str, ttl: float) -> None:
+        self._summaries[user_id] = (time.time() + ttl, summary)
+
+    def resident_size(self, user_id: str) -> int:
+        queue = self._queues.get(user_id)
+        return len(queue) if queue is not None else 0
+
+    def take_evicted(self, user_id: str) -> List[ContextEntry]:
+        return self._evicted.pop(user_id, [])
+
+    def detach(self, user_id: str) -> Optional[Tuple[List[ContextEntry], float]]:
+        queue = self._queues.get(user_id)
+        if queue is None:
+            return None
+        # Entries already evicted but not yet handed back stay with the queue
+        entries = self._evicted.get(user_id, []) + list(queue)
+        idle_until = self._idle_until[user_id]
+        self._drop(user_id)
+        return entries, idle_until
+
+    def attach(self, user_id: str, entries: List[ContextEntry], idle_until: float) -> None:
+        queue = self._queues.setdefault(user_id, deque())
+        queue.extendleft(reversed(entries))
+        self._idle_until[user_id] = max(idle_until, self._idle_until.get(user_id, 0.0))
+
+    def attach_summary(self, user_id: str, summary: str, expires_at: float) -> None:
+        self._summaries.setdefault(user_id, (expires_at, summary))
+
+    def resident_users(self) -> Set[str]:
+        return self._queues.keys() | self._summaries.keys()
+
+    def export_queue(self, user_id: str) -> Optional[Tuple[List[ContextEntry], float]]:
+        queue = self._queues.get(user_id)
+        if queue is None:
+            return None
+        return self._evicted.get(user_id, []) + list(queue), self._idle_until[user_id]
+
+    def export_summary(self, user_id: str) -> Optional[Tuple[float, str]]:
+        return self._summaries.get(user_id)
+
+    async def expire(self, user_id: str, now: float) -> Optional[float]:
+        deadlines = []
+        idle_until = self._idle_until.get(user_id)
+        if idle_until is not None:
+            if idle_until <= now:
+                self._retire(user_id)
+            else:
+                deadlines.append(idle_until)
+        summary = self._summaries.get(user_id)
+        if summary is not None:
+            if summary[0] <= now:
+                del self._summaries[user_id]
+            else:
+                deadlines.append(summary[0])
+        return min(deadlines) if deadlines else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "users": len(self._queues),
+            "entries": sum(len(queue) for queue in self._queues.values()),
+            "appends": self.appends,
+            "reads": self.reads,
+            "expired_entries": self.expired_entries,
+            "expired_queues": self.expired_queues,
+            "summaries": len(self._summaries),
+        }
+
+class RedisContextStore(ContextStore):
+    """
+    Queues kept in Redis (or anything speaking its protocol), shared by every worker.
+
+    Each user has a list of JSON entries. Appends run RPUSH, LRANGE (of the overflow),
+    LTRIM and EXPIRE in one MULTI/EXEC pipeline so concurrent writers never see an
+    untrimmed queue and each trimmed entry is handed back exactly once. `read_many`
+    fetches several lists in a single round trip. Redis drops idle queues itself
+    through the key TTL; decayed entries are filtered out by the reader and handed
+    back once they are trimmed.
+    """
+
+    name = "redis"
+
+    def __init__(self, redis: Any, key_prefix: str = "ctx:", summary_prefix: str = "ctxsum:"):
+        self.redis = redis
+        self.key_prefix = key_prefix
+        self.summary_prefix = summary_prefix
+        self.appends = 0
+        self.reads = 0
+        self.errors = 0
+
+    def _key(self, user_id: str) -> str:
+        return f"{self.key_prefix}{user_id}"
+
+    @staticmethod
+    def _encode(entry: ContextEntry) -> str:
+        return json.dumps(entry_to_dict(entry))
+
+    @staticmethod
+    def _decode(raw: Any) -> ContextEntry:
+        return entry_from_dict(json.loads(raw))
+
+    async def append(self, user_id: str, entries: List[ContextEntry], max_length: int, ttl: float) -> List[ContextEntry]:
+        if not entries:
+            return []
+        key = self._key(user_id)
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.rpush(key, *[self._encode(entry) for entry in entries])
+                pipe.lrange(key, 0, -(max_length + 1))
+                pipe.ltrim(key, -max_length, -1)
+                pipe.expire(key, max(1, int(ttl)))
+                _, overflow, _, _ = await pipe.execute()
+        except Exception:
+            self.errors += 1
+            raise
+        self.appends += 1
+        return [self._decode(raw) for raw in overflow]
+
+    async def read(self, user_id: str) -> List[ContextEntry]:
+        return (await self.read_many([user_id]))[user_id]
+
+    async def read_many(self, user_ids: Iterable[str]) -> Dict[str, List[ContextEntry]]:
+        user_ids = list(user_ids)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for user_id in user_ids:
+                    pipe.lrange(self._key(user_id), 0, -1)
+                results = await pipe.execute()
+        except Exception:
+            self.errors += 1
+            raise
+        self.reads += len(user_ids)
+        return {user_id: [self._decode(raw) for raw in raws] for user_id, raws in zip(user_ids, results)}
+
+    async def clear(self, user_id: str) -> None:
+        await self.redis.delete(self._key(user_id), f"{self.summary_prefix}{user_id}")
+
+    async def read_summary(self, user_id: str) -> Optional[str]:
+        raw = await self.redis.get(f"{self.summary_prefix}{user_id}")
+        if raw is None:
+            return None
+        return raw.decode("utf-8") if isinstance(raw, bytes) else raw
+
+    async def write_summary(self, user_id: str, summary: str, ttl: float) -> None:
+        await self.redis.set(f"{self.summary_prefix}{user_id}", summary, ex=max(1, int(ttl)))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "appends": self.appends,
+            "reads": self.reads,
+            "errors": self.errors,
+        }
+
+def create_context_store(name: str = settings.CONTEXT_STORE) -> ContextStore:
+    """
+    Build a context store by name.
+
+    Args:
+        name (str): "memory" or "redis".
+
+    Returns:
+        ContextStore: The requested store.
+
+    Raises:
+        ValueError: If the name is unknown.
+        RuntimeError: If "redis" is requested but Redis is not configured.
+    """
+    if name == InMemoryContextStore.name:
+        return InMemoryContextStore()
+    if name == RedisContextStore.name:
+        from app.services.redis_client import get_redis
+        return RedisContextStore(get_redis())
+    raise ValueError(f"Unknown context store '{name}'. Expected 'memory' or 'redis'.")
\ No newline at end of file
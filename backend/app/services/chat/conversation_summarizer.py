@@ -0,0 +1,200 @@
+# app/services/chat/conversation_summarizer.py
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+from app.core.config import settings
+from app.models.messages import Message
+from app.schemas.schemas import ChatInputMessage
+from app.services.ai.lm_client import LMStudioClient, pool_metrics
+from app.services.chat.context_store import ContextStore
+from app.utils.text_cleaning import clean_ai_response
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an assistant. "
+    "Merge the new messages into the existing summary. Keep names, facts about the user, "
+    "preferences, open questions and commitments; drop greetings and small talk. "
+    "Reply with the updated summary only, in plain prose, at most a few sentences."
+)
+
+class ConversationSummarizer:
+    """
+    Folds messages that leave a user's active context window into a running summary.
+
+    Evicted messages are buffered per user and summarized in the background, one user
+    at a time, once at least `min_batch` have piled up or the oldest has waited
+    `max_wait` seconds; a batch still unsummarized after `ttl` (because LM Studio
+    keeps failing) is dropped, as its summary would have expired. The work is low priority: each
+    job waits (up to `max_defer` seconds) for LM Studio to have no chat requests in
+    flight before it sends its own, so summaries never compete with replies.
+    """
+
+    def __init__(
+        self,
+        store: ContextStore,
+        lm_client: LMStudioClient,
+        model: str = settings.CONTEXT_SUMMARY_MODEL,
+        min_batch: int = settings.CONTEXT_SUMMARY_MIN_BATCH,
+        max_wait: float = settings.CONTEXT_SUMMARY_MAX_WAIT,
+        max_tokens: int = settings.CONTEXT_SUMMARY_MAX_TOKENS,
+        ttl: float = settings.CONTEXT_SUMMARY_TTL,
+        max_defer: float = 10.0,
+        max_pending: int = 200
+    ):
+        self.store = store
+        self.lm_client = lm_client
+        self.model = model
+        self.min_batch = min_batch
+        self.max_wait = max_wait
+        self.max_tokens = max_tokens
+        self.ttl = ttl
+        self.max_defer = max_defer
+        self.max_pending = max_pending
+        self._pending: Dict[str, List[Message]] = {}
+        # When each user's oldest pending message was buffered
+        self._pending_since: Dict[str, float] = {}
+        self._last_sweep = time.time()
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._queued: set = set()
+        self._task: Optional[asyncio.Task] = None
+        self.folded_messages = 0
+        self.summaries_written = 0
+        self.failures = 0
+        self.dropped_messages = 0
+        self.last_summary_seconds = 0.0
+
+    def fold(self, user_id: str, messages: List[Message]) -> None:
+        """
+        Buffer messages that left the active window and schedule a summary once enough have built up.
+
+        Args:
+            user_id (str): The ID of the user.
+            messages (List[Message]): The evicted messages, oldest first.
+        """
+        if not messages:
+            return
+        pending = self._pending.setdefault(user_id, [])
+        self._pending_since.setdefault(user_id, time.time())
+        pending.extend(messages)
+        if len(pending) > self.max_pending:
+            # LM Studio has been unreachable for a while; keep the most recent turns
+            overflow = len(pending) - self.max_pending
+            del pending[:overflow]
+            self.dropped_messages += overflow
+        if len(pending) >= self.min_batch:
+            self._enqueue(user_id)
+
+    def _enqueue(self, user_id: str) -> None:
+        if user_id not in self._queued:
+            self._queued.add(user_id)
+            self._queue.put_nowait(user_id)
+
+    def sweep(self, now: float) -> None:
+        """Queue users whose smaller batches have waited `max_wait`, and drop batches older than `ttl`."""
+        self._last_sweep = now
+        for user_id, since in list(self._pending_since.items()):
+            if now - since >= self.ttl:
+                self.dropped_messages += len(self._pending.pop(user_id, []))
+                del self._pending_since[user_id]
+            elif now - since >= self.max_wait:
+                self._enqueue(user_id)
+
+    async def summarize(self, user_id: str) -> Optional[str]:
+        """
+        Merge a user's buffered messages into their stored summary now.
+
+        Returns:
+            Optional[str]: The new summary, or None if there was nothing to do or the call failed.
+        """
+        messages = self._pending.pop(user_id, [])
+        since = self._pending_since.pop(user_id, None)
+        if not messages:
+            return None
+        started = time.perf_counter()
+        try:
+            previous = await self.store.read_summary(user_id)
+            response = await self.lm_client.create_chat_completion(
+                messages=self.build_messages(previous, messages),
+                model=self.model,
+                temperature=0.2,
+                max_tokens=self.max_tokens
+            )
+            summary = clean_ai_response(response.content).strip()
+            if not summary:
+                raise ValueError("empty summary")
+            await self.store.write_summary(user_id, summary, self.ttl)
+        except Exception as e:
+            # Put the messages back in front of anything evicted meanwhile and retry on the next batch
+            self._pending[user_id] = messages + self._pending.get(user_id, [])
+            self._pending_since[user_id] = since if since is not None else time.time()
+            self.failures += 1
+            logging.warning(f"Failed to summarize conversation for user {user_id}: {e}")
+            return None
+        self.folded_messages += len(messages)
+        self.summaries_written += 1
+        self.last_summary_seconds = time.perf_counter() - started
+        return summary
+
+    def build_messages(self, previous: Optional[str], messages: List[Message]) -> List[ChatInputMessage]:
+        transcript = "\n".join(f"{message.role}: {message.content}" for message in messages)
+        return [
+            ChatInputMessage(role="system", content=SUMMARY_SYSTEM_PROMPT, user_id="system"),
+            ChatInputMessage(
+                role="user",
+                content=f"Existing summary:\n{previous or '(none yet)'}\n\nNew messages:\n{transcript}",
+                user_id="system"
+            )
+        ]
+
+    async def _wait_for_idle_model(self) -> None:
+        waited = 0.0
+        while pool_metrics.in_flight > 0 and waited < self.max_defer:
+            await asyncio.sleep(0.25)
+            waited += 0.25
+
+    async def _run(self) -> None:
+        while True:
+            if time.time() - self._last_sweep >= self.max_wait:
+                self.sweep(time.time())
+            try:
+                user_id = await asyncio.wait_for(self._queue.get(), timeout=self.max_wait)
+            except asyncio.TimeoutError:
+                continue
+            try:
+                await self._wait_for_idle_model()
+                self._queued.discard(user_id)
+                await self.summarize(user_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Conversation summarizer error: {e}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    def start(self) -> None:
+        """Start the background summarization worker."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background worker; buffered messages that were not summarized yet are dropped."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending_users": len(self._pending),
+            "pending_messages": sum(len(messages) for messages in self._pending.values()),
+            "queued": self._queue.qsize(),
+            "folded_messages": self.folded_messages,
+            "summaries_written": self.summaries_written,
+            "failures": self.failures,
+            "dropped_messages": self.dropped_messages,
+            "last_summary_seconds": self.last_summary_seconds,
+        }
\ No newline at end of file
@@ -0,0 +1,149 @@
+# app/services/chat/expiry_scheduler.py
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+from app.core.config import settings
+
+# A handler gets the key and the current time, evicts whatever is due, and returns
+# when the key should be looked at again, or None once nothing is left for it
+ExpiryHandler = Callable[[Hashable, float], Awaitable[Optional[float]]]
+
+class ExpiryScheduler:
+    """
+    Min-heap of per-key deadlines that drives incremental expiry.
+
+    Each key is scheduled once, at the earliest time something under it can expire.
+    When the deadline passes its handler runs, evicts what is due and returns the
+    key's next deadline, so the key is re-armed rather than rescanned. Keys whose
+    deadline only moves later (an idle timeout pushed back by new activity) need no
+    heap update at all: the handler simply reports the later deadline when it fires.
+
+    Due keys are processed in batches of at most `batch_size` or `time_slice` seconds,
+    yielding to the event loop in between, so a burst of expiries never stalls requests.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = settings.EXPIRY_BATCH_SIZE,
+        time_slice: float = settings.EXPIRY_TIME_SLICE_MS / 1000,
+        max_sleep: float = 60.0
+    ):
+        self.batch_size = batch_size
+        self.time_slice = time_slice
+        self.max_sleep = max_sleep
+        self._heap: List[Tuple[float, int, str, Hashable]] = []
+        self._deadlines: Dict[Tuple[str, Hashable], float] = {}
+        self._handlers: Dict[str, ExpiryHandler] = {}
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.expired = 0
+        self.retained = 0
+        self.stale = 0
+        self.failures = 0
+        self.batches = 0
+
+    def register(self, kind: str, handler: ExpiryHandler) -> None:
+        """Register the handler for one kind of key, e.g. "history"."""
+        self._handlers[kind] = handler
+
+    def schedule(self, kind: str, key: Hashable, deadline: float) -> None:
+        """
+        Make sure `key` is looked at no later than `deadline`.
+
+        A key that is already scheduled at or before `deadline` is left alone, so this is
+        O(1) for the common case of repeated activity on the same key.
+        """
+        current = self._deadlines.get((kind, key))
+        if current is not None and current <= deadline:
+            return
+        self._deadlines[(kind, key)] = deadline
+        heapq.heappush(self._heap, (deadline, next(self._counter), kind, key))
+        if self._heap[0][0] == deadline:
+            self._wakeup.set()
+
+    def cancel(self, kind: str, key: Hashable) -> None:
+        """Forget a key; its heap entry is skipped when it comes up."""
+        self._deadlines.pop((kind, key), None)
+
+    async def run_due(self, now: Optional[float] = None) -> int:
+        """
+        Process every key whose deadline has passed, one time-sliced batch at a time.
+
+        Returns:
+            int: The number of keys processed.
+        """
+        processed = 0
+        while self._heap and self._heap[0][0] <= (now if now is not None else time.time()):
+            slice_started = time.perf_counter()
+            in_batch = 0
+            current_time = now if now is not None else time.time()
+            while self._heap and self._heap[0][0] <= current_time and in_batch < self.batch_size:
+                deadline, _, kind, key = heapq.heappop(self._heap)
+                if self._deadlines.get((kind, key)) != deadline:
+                    # Superseded by an earlier schedule() or cancelled
+                    self.stale += 1
+                    continue
+                del self._deadlines[(kind, key)]
+                try:
+                    next_deadline = await self._handlers[kind](key, current_time)
+                except Exception as e:
+                    self.failures += 1
+                    logging.error(f"Expiry handler for {kind} {key} failed: {e}")
+                    next_deadline = None
+                if next_deadline is None:
+                    self.expired += 1
+                else:
+                    self.retained += 1
+                    self.schedule(kind, key, max(next_deadline, current_time))
+                in_batch += 1
+                processed += 1
+                if time.perf_counter() - slice_started >= self.time_slice:
+                    break
+            self.batches += 1
+            # Let requests run between batches
+            await asyncio.sleep(0)
+        return processed
+
+    async def _run(self) -> None:
+        while True:
+            await self.run_due()
+            self._wakeup.clear()
+            timeout = self.max_sleep
+            if self._heap:
+                timeout = min(timeout, max(0.0, self._heap[0][0] - time.time()))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        """Start processing deadlines in the background."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "scheduled": len(self._deadlines),
+            "heap_size": len(self._heap),
+            "next_deadline_in": round(self._heap[0][0] - time.time(), 3) if self._heap else None,
+            "expired": self.expired,
+            "retained": self.retained,
+            "stale": self.stale,
+            "failures": self.failures,
+            "batches": self.batches,
+        }
\ No newline at end of file
@@ -0,0 +1,442 @@
+# app/services/chat/long_term_memory.py
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from app.core.config import settings
+from app.models.messages import Message
+from app.services.chat.memory_budget import MemoryBudget
+
+# Function words that would otherwise dominate hashed similarity
+STOP_WORDS = frozenset("""
+a about an and are as at be but by can do for from had has have he her him his how i if in is it its
+just me my not of on or our she so that the their them then there they this to too was we were what
+when where which who will with would you your
+""".split())
+
+_WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+# Columns an in-memory block starts with; it doubles as it fills, up to the block size
+INITIAL_BLOCK_COLUMNS = 16
+
+class HashingEmbedder:
+    """
+    Embeds text as an L2-normalized hashed bag of unigrams and bigrams.
+
+    Needs no model and no fitting, runs in microseconds, and hashes with CRC32 so the
+    same text maps to the same vector in every process. Vectors are returned sparse,
+    as (feature indices, values), since a message only touches a few dozen features.
+    """
+
+    def __init__(self, dim: int = settings.LONG_TERM_MEMORY_DIM):
+        self.dim = dim
+
+    def embed(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        words = [word for word in _WORD_PATTERN.findall(text.lower()) if word not in STOP_WORDS]
+        features = words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+        weights: Dict[int, float] = {}
+        for feature in features:
+            digest = zlib.crc32(feature.encode("utf-8"))
+            index = digest % self.dim
+            # The top bit picks a sign so colliding features tend to cancel out
+            weights[index] = weights.get(index, 0.0) + (1.0 if digest & 0x80000000 else -1.0)
+        indices = np.fromiter(weights.keys(), dtype=np.int64, count=len(weights))
+        values = np.fromiter(weights.values(), dtype=np.float32, count=len(weights))
+        norm = float(np.linalg.norm(values))
+        if norm == 0.0:
+            return indices[:0], values[:0]
+        return indices, values / norm
+
+@dataclass
+class MemoryRecord:
+    role: str
+    content: str
+    timestamp: float
+
+class UserMemoryIndex:
+    """
+    One user's message vectors, stored feature-major in NumPy blocks.
+
+    Block b holds messages [b * block_size, (b + 1) * block_size) as a (dim, block_size)
+    array, so scoring a sparse query reads only the rows of the query's features rather
+    than every vector. In memory, a block starts with a few columns and doubles as it
+    fills, so a user with a handful of messages costs kilobytes rather than a full
+    block. After `max_messages` the oldest slots are overwritten.
+
+    With a directory, blocks are memory-mapped files and the messages go to a JSONL
+    file, so an index can be reopened and paged in on demand. Each line records its
+    sequence number, which lets the file be compacted to the live messages once
+    overwritten slots make up half of it. `load`, `write_pending` and `close` do the
+    file work and run in a worker thread; `add` only queues lines for the next write.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        block_size: int,
+        max_messages: int,
+        directory: Optional[str] = None
+    ):
+        self.dim = dim
+        self.block_size = block_size
+        self.max_messages = max(block_size, max_messages - max_messages % block_size)
+        self.directory = directory
+        self.blocks: List[np.ndarray] = []
+        self.records: List[Optional[MemoryRecord]] = []
+        self.added = 0
+        self.record_lines = 0
+        self.last_used = time.time()
+        # Messages added but not yet in the records file, and the lock serializing writes to it
+        self._pending: List[Tuple[int, MemoryRecord]] = []
+        self._write_lock = asyncio.Lock()
+
+    @property
+    def size(self) -> int:
+        return min(self.added, self.max_messages)
+
+    def _block_path(self, block: int) -> str:
+        return os.path.join(self.directory, f"vectors-{block}.f32")
+
+    def _records_path(self) -> str:
+        return os.path.join(self.directory, "records.jsonl")
+
+    def _new_block(self) -> np.ndarray:
+        block = len(self.blocks)
+        if self.directory:
+            return np.memmap(self._block_path(block), dtype=np.float32, mode="w+", shape=(self.dim, self.block_size))
+        return np.zeros((self.dim, min(self.block_size, INITIAL_BLOCK_COLUMNS)), dtype=np.float32)
+
+    def _block_for(self, block: int, column: int) -> np.ndarray:
+        """Return the block holding `column`, allocating or growing it first if needed."""
+        if block == len(self.blocks):
+            self.blocks.append(self._new_block())
+        vectors = self.blocks[block]
+        if column >= vectors.shape[1]:
+            grown = np.zeros((self.dim, min(self.block_size, max(column + 1, vectors.shape[1] * 2))), dtype=np.float32)
+            grown[:, :vectors.shape[1]] = vectors
+            self.blocks[block] = vectors = grown
+        return vectors
+
+    def load(self) -> None:
+        """Read the index back from its directory. Blocking; call it before the index is shared."""
+        os.makedirs(self.directory, exist_ok=True)
+        records_path = self._records_path()
+        if not os.path.exists(records_path):
+            return
+        with open(records_path, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+        self.record_lines = len(lines)
+        entries = []
+        for line_number, line in enumerate(lines):
+            data = json.loads(line)
+            entries.append((data.pop("sequence", line_number), data))
+        self.added = entries[-1][0] + 1 if entries else 0
+        self.records = [None] * self.size
+        for sequence, data in entries:
+            if sequence >= self.added - self.max_messages:
+                self.records[sequence % self.max_messages] = MemoryRecord(**data)
+        for block in range((self.size + self.block_size - 1) // self.block_size):
+            self.blocks.append(np.memmap(self._block_path(block), dtype=np.float32, mode="r+", shape=(self.dim, self.block_size)))
+
+    def add(self, record: MemoryRecord, indices: np.ndarray, values: np.ndarray) -> None:
+        slot = self.added % self.max_messages
+        block, column = divmod(slot, self.block_size)
+        vectors = self._block_for(block, column)
+        vectors[:, column] = 0.0
+        vectors[indices, column] = values
+        if slot == len(self.records):
+            self.records.append(record)
+        else:
+            self.records[slot] = record
+        if self.directory:
+            self._pending.append((self.added, record))
+        self.added += 1
+        self.last_used = time.time()
+
+    async def write_pending(self) -> None:
+        """Append queued messages to the records file in a worker thread, compacting it when it has grown to twice the index."""
+        if not self.directory:
+            return
+        async with self._write_lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, []
+            if self.record_lines + len(pending) < 2 * self.max_messages:
+                await asyncio.to_thread(self._write_lines, pending, False)
+                self.record_lines += len(pending)
+                return
+            # The live messages already include the pending ones
+            live = [(sequence, self.records[sequence % self.max_messages]) for sequence in range(self.added - self.size, self.added)]
+            live = [(sequence, record) for sequence, record in live if record is not None]
+            await asyncio.to_thread(self._write_lines, live, True)
+            self.record_lines = len(live)
+
+    def _write_lines(self, entries: List[Tuple[int, MemoryRecord]], replace: bool) -> None:
+        path = self._records_path()
+        target = f"{path}.tmp" if replace else path
+        with open(target, "w" if replace else "a", encoding="utf-8") as f:
+            f.writelines(json.dumps({"sequence": sequence, **record.__dict__}) + "\n" for sequence, record in entries)
+        if replace:
+            os.replace(target, path)
+
+    async def close(self) -> None:
+        """Write out queued messages and memory-mapped vectors."""
+        await self.write_pending()
+        if self.directory:
+            await asyncio.to_thread(self.flush)
+
+    def scores(self, indices: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """Cosine similarity of a normalized sparse query against every stored message, by slot."""
+        size = self.size
+        if size == 0 or len(indices) == 0:
+            return np.zeros(size, dtype=np.float32)
+        parts = [values @ block[indices] for block in self.blocks]
+        return np.concatenate(parts)[:size]
+
+    def search(self, indices: np.ndarray, values: np.ndarray, k: int, min_score: float, exclude: Iterable[str] = ()) -> List[Tuple[float, MemoryRecord]]:
+        """
+        Find the `k` most similar stored messages.
+
+        Args:
+            indices (np.ndarray): Feature indices of the query vector.
+            values (np.ndarray): Values of the query vector.
+            k (int): How many messages to return.
+            min_score (float): Messages scoring below this are ignored.
+            exclude (Iterable[str]): Message contents to skip, e.g. those already in the context window.
+
+        Returns:
+            List[Tuple[float, MemoryRecord]]: Matches with their scores, best first.
+        """
+        self.last_used = time.time()
+        scores = self.scores(indices, values)
+        if len(scores) == 0:
+            return []
+        exclude = set(exclude)
+        candidates = min(len(scores), k + len(exclude))
+        top = np.argpartition(scores, -candidates)[-candidates:]
+        results = []
+        for slot in top[np.argsort(scores[top])[::-1]]:
+            score = float(scores[slot])
+            if score < min_score or len(results) == k:
+                break
+            record = self.records[slot]
+            if record is not None and record.content not in exclude:
+                results.append((score, record))
+        return results
+
+    def flush(self) -> None:
+        for block in self.blocks:
+            if isinstance(block, np.memmap):
+                block.flush()
+
+class LongTermMemory:
+    """
+    Per-user semantic memory over every message that passes through the chat context.
+
+    Messages are embedded and indexed as `ChatContextManager.update_context` adds them,
+    and `search` returns the past turns most similar to a query, however long ago they
+    were said. Indexes are kept under `directory` and opened on a user's first message
+    or search; without a directory they live only in this process.
+
+    Loaded indexes have a message budget of their own, `max_resident`, separate from
+    the context manager's: once it is exceeded, the least recently used indexes are
+    unloaded. Indexes are also unloaded once idle for `idle_ttl`, and with the rest of
+    a user's state when the context manager evicts them. An unloaded index is written
+    out in the background and reopened from disk when next needed; without a directory
+    it is gone.
+    """
+
+    def __init__(
+        self,
+        embedder: Optional[HashingEmbedder] = None,
+        block_size: int = settings.LONG_TERM_MEMORY_BLOCK_SIZE,
+        max_messages: int = settings.LONG_TERM_MEMORY_MAX_MESSAGES,
+        directory: Optional[str] = settings.LONG_TERM_MEMORY_DIR or None,
+        idle_ttl: float = settings.LONG_TERM_MEMORY_IDLE_TTL,
+        max_resident: int = settings.LONG_TERM_MEMORY_BUDGET
+    ):
+        self.embedder = embedder or HashingEmbedder()
+        self.block_size = block_size
+        self.max_messages = max_messages
+        self.directory = directory
+        self.idle_ttl = idle_ttl
+        self.budget = MemoryBudget(max_resident)
+        self._indexes: Dict[str, UserMemoryIndex] = {}
+        # Indexes being read from disk, and unloaded indexes still being written out
+        self._opening: Dict[str, "asyncio.Task[Optional[UserMemoryIndex]]"] = {}
+        self._closing: Dict[str, asyncio.Task] = {}
+        self.messages_indexed = 0
+        self.searches = 0
+        self.unloads = 0
+        self.expired = 0
+
+    def _directory(self, user_id: str) -> Optional[str]:
+        if not self.directory:
+            return None
+        return os.path.join(self.directory, hashlib.blake2b(user_id.encode("utf-8"), digest_size=16).hexdigest())
+
+    async def _index(self, user_id: str, create: bool) -> Optional[UserMemoryIndex]:
+        """Return a user's loaded index, reading it from disk in a worker thread if needed; with `create`, start one if they have none."""
+        index = self._indexes.get(user_id)
+        if index is None:
+            opening = self._opening.get(user_id)
+            if opening is None:
+                opening = self._opening[user_id] = asyncio.create_task(self._open(user_id))
+                opening.add_done_callback(lambda _: self._opening.pop(user_id, None))
+            index = await opening
+        if index is None and create:
+            directory = self._directory(user_id)
+            if directory:
+                await asyncio.to_thread(os.makedirs, directory, exist_ok=True)
+            # Another caller may have created it while this one waited
+            index = self._indexes.get(user_id)
+            if index is None:
+                index = self._indexes[user_id] = UserMemoryIndex(self.embedder.dim, self.block_size, self.max_messages, directory)
+        if index is not None:
+            self.budget.touch(user_id)
+        return index
+
+    async def _open(self, user_id: str) -> Optional[UserMemoryIndex]:
+        closing = self._closing.get(user_id)
+        if closing is not None:
+            # Reading back before an unloaded copy is fully written would lose its last messages
+            await closing
+        directory = self._directory(user_id)
+        if directory is None or not await asyncio.to_thread(os.path.exists, os.path.join(directory, "records.jsonl")):
+            return None
+        index = UserMemoryIndex(self.embedder.dim, self.block_size, self.max_messages, directory)
+        await asyncio.to_thread(index.load)
+        if user_id in self._indexes:
+            return self._indexes[user_id]
+        self._indexes[user_id] = index
+        self._account(user_id)
+        return index
+
+    def _account(self, user_id: str) -> None:
+        """Report a user's loaded index size, unloading least recently used indexes if that goes over budget."""
+        self.budget.resize(user_id, self.resident_size(user_id))
+        self.budget.touch(user_id)
+        if self.budget.over_budget:
+            for victim in self.budget.victims(exclude=user_id):
+                self.budget.record_eviction(victim)
+                self.unload(victim)
+
+    async def add(self, user_id: str, messages: List[Message]) -> None:
+        """Embed and index new messages for a user, appending them to the records file off the event loop."""
+        messages = [message for message in messages if message.content]
+        if not messages:
+            return
+        index = await self._index(user_id, create=True)
+        for message in messages:
+            indices, values = self.embedder.embed(message.content)
+            index.add(MemoryRecord(message.role, message.content, message.timestamp), indices, values)
+            self.messages_indexed += 1
+        self._account(user_id)
+        await index.write_pending()
+
+    async def search(self, user_id: str, query: str, k: int = settings.LONG_TERM_MEMORY_TOP_K, min_score: float = settings.LONG_TERM_MEMORY_MIN_SCORE, exclude: Iterable[str] = ()) -> List[MemoryRecord]:
+        """
+        Return up to `k` of the user's past messages most similar to `query`, best first.
+
+        Users with no saved memory get an empty result; nothing is created for them.
+
+        Args:
+            user_id (str): The ID of the user.
+            query (str): The text to match, usually the new user message.
+            k (int): How many messages to return.
+            min_score (float): Minimum cosine similarity for a message to count as relevant.
+            exclude (Iterable[str]): Message contents to skip, e.g. those already in the context window.
+
+        Returns:
+            List[MemoryRecord]: The matching messages.
+        """
+        index = await self._index(user_id, create=False)
+        if index is None:
+            return []
+        self.searches += 1
+        indices, values = self.embedder.embed(query)
+        return [record for _, record in index.search(indices, values, k, min_score, exclude)]
+
+    def resident_size(self, user_id: str) -> int:
+        """How many messages a user's loaded index holds, or 0 if it is not loaded."""
+        index = self._indexes.get(user_id)
+        return index.size if index is not None else 0
+
+    def unload(self, user_id: str) -> bool:
+        """Drop a user's index from memory; one with a directory is written out in the background first."""
+        index = self._indexes.pop(user_id, None)
+        if index is None:
+            return False
+        self.budget.discard(user_id)
+        self.unloads += 1
+        if index.directory:
+            previous = self._closing.get(user_id)
+            closing = self._closing[user_id] = asyncio.get_running_loop().create_task(self._close(user_id, index, previous))
+            closing.add_done_callback(lambda task: self._closing.pop(user_id, None) if self._closing.get(user_id) is task else None)
+        return True
+
+    async def _close(self, user_id: str, index: UserMemoryIndex, previous: Optional[asyncio.Task]) -> None:
+        if previous is not None:
+            await previous
+        try:
+            await index.close()
+        except Exception as e:
+            logging.error(f"Failed to write long-term memory for user {user_id}: {e}")
+
+    def expire(self, user_id: str, now: float) -> Optional[float]:
+        """Unload a user's index if it has been idle for `idle_ttl`; otherwise return when it will have been."""
+        index = self._indexes.get(user_id)
+        if index is None:
+            return None
+        expires_at = index.last_used + self.idle_ttl
+        if expires_at > now:
+            return expires_at
+        self.unload(user_id)
+        self.expired += 1
+        return None
+
+    async def flush(self) -> None:
+        """Write every loaded index, and any still being unloaded, out to disk."""
+        for index in list(self._indexes.values()):
+            await index.close()
+        if self._closing:
+            await asyncio.gather(*self._closing.values())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "users": len(self._indexes),
+            "messages": sum(index.size for index in self._indexes.values()),
+            "vector_bytes": sum(block.nbytes for index in self._indexes.values() for block in index.blocks if not isinstance(block, np.memmap)),
+            "budget": self.budget.stats(),
+            "messages_indexed": self.messages_indexed,
+            "searches": self.searches,
+            "unloads": self.unloads,
+            "expired": self.expired,
+            "closing": len(self._closing),
+            "dim": self.embedder.dim,
+            "directory": self.directory,
+        }
+
+_long_term_memory: Optional[LongTermMemory] = None
+_long_term_memory_lock = threading.Lock()
+
+def get_long_term_memory() -> Optional[LongTermMemory]:
+    """Return the process-wide long-term memory, or None if it is disabled."""
+    global _long_term_memory
+    if not settings.LONG_TERM_MEMORY_ENABLED:
+        return None
+    if _long_term_memory is None:
+        with _long_term_memory_lock:
+            if _long_term_memory is None:
+                _long_term_memory = LongTermMemory()
+                logging.info(f"Long-term memory enabled (dim={_long_term_memory.embedder.dim}, directory={_long_term_memory.directory})")
+    return _long_term_memory
\ No newline at end of file
@@ -0,0 +1,171 @@
+# app/services/chat/memory_budget.py
+
+import hashlib
+import logging
+import math
+import os
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from app.services.chat.context_snapshot import UserState, decode_state, encode_state
+
+class MemoryBudget:
+    """
+    Least-recently-used accounting of how many messages each user holds in memory.
+
+    The context manager reports a user's size whenever it changes (`resize`) and marks
+    the user as recently used on every access (`touch`). Once the total goes over
+    `max_messages`, `victims` names the idle users to evict, least recently used first,
+    until the total fits again. A budget of 0 only tracks occupancy.
+    """
+
+    def __init__(self, max_messages: int):
+        self.max_messages = max_messages
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()
+        self.resident = 0
+        self.evictions = 0
+        self.evicted_messages = 0
+
+    @property
+    def over_budget(self) -> bool:
+        return 0 < self.max_messages < self.resident
+
+    def touch(self, user_id: str) -> None:
+        """Mark a user as just used."""
+        if user_id in self._sizes:
+            self._sizes.move_to_end(user_id)
+
+    def resize(self, user_id: str, size: int) -> None:
+        """Record how many messages a user holds; users not tracked yet start as most recently used."""
+        if size <= 0:
+            self.discard(user_id)
+            return
+        self.resident += size - self._sizes.get(user_id, 0)
+        self._sizes[user_id] = size
+
+    def discard(self, user_id: str) -> int:
+        """Stop tracking a user. Returns the messages they held."""
+        size = self._sizes.pop(user_id, 0)
+        self.resident -= size
+        return size
+
+    def victims(self, exclude: Optional[str] = None) -> List[str]:
+        """The least recently used users whose eviction brings the total back under budget."""
+        victims = []
+        excess = self.resident - self.max_messages
+        for user_id, size in self._sizes.items():
+            if excess <= 0:
+                break
+            if user_id == exclude:
+                continue
+            victims.append(user_id)
+            excess -= size
+        return victims
+
+    def record_eviction(self, user_id: str) -> None:
+        self.evicted_messages += self.discard(user_id)
+        self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "budget_messages": self.max_messages,
+            "resident_users": len(self._sizes),
+            "resident_messages": self.resident,
+            "occupancy": round(self.resident / self.max_messages, 3) if self.max_messages else None,
+            "evictions": self.evictions,
+            "evicted_messages": self.evicted_messages,
+        }
+
+class SpillStore:
+    """
+    On-disk tier for users evicted from memory.
+
+    Each user is one file in the snapshot's per-user encoding, named by a hash of their ID. Records are
+    a few kilobytes, so they are written and read synchronously: that keeps eviction
+    and fault-in atomic with respect to other requests on the event loop.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        # File name -> when the spilled state is all expired. Users spilled by an earlier
+        # run can still be faulted in; their expiry is unknown, so they are kept until then
+        self._spilled: Dict[str, float] = {
+            name[:-len(".spill")]: math.inf for name in os.listdir(directory) if name.endswith(".spill")
+        }
+        self.spills = 0
+        self.fault_ins = 0
+        self.bytes_written = 0
+        self.expired = 0
+        self.errors = 0
+
+    @staticmethod
+    def _name(user_id: str) -> str:
+        return hashlib.blake2b(user_id.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.spill")
+
+    def __contains__(self, user_id: str) -> bool:
+        return self._name(user_id) in self._spilled
+
+    def write(self, user_id: str, state: UserState, expires_at: float) -> bool:
+        """Write a user's state to disk, to be deleted unread after `expires_at`. Returns False if it could not be written."""
+        data = encode_state(state)
+        name = self._name(user_id)
+        try:
+            with open(self._path(name), "wb") as f:
+                f.write(data)
+        except OSError as e:
+            self.errors += 1
+            logging.error(f"Failed to spill context for user {user_id}: {e}")
+            return False
+        self._spilled[name] = expires_at
+        self.spills += 1
+        self.bytes_written += len(data)
+        return True
+
+    def take(self, user_id: str) -> Optional[UserState]:
+        """Read a user's state back and delete it from disk."""
+        name = self._name(user_id)
+        if name not in self._spilled:
+            return None
+        del self._spilled[name]
+        path = self._path(name)
+        try:
+            with open(path, "rb") as f:
+                state = decode_state(f.read())
+            os.remove(path)
+        except (OSError, ValueError, EOFError, TypeError, zlib.error) as e:
+            self.errors += 1
+            logging.error(f"Failed to fault in context for user {user_id}: {e}")
+            return None
+        self.fault_ins += 1
+        return state
+
+    def expire(self, user_id: str, now: float) -> Optional[float]:
+        """Delete a user's spilled state if it has all expired; otherwise return when it will have."""
+        name = self._name(user_id)
+        expires_at = self._spilled.get(name)
+        if expires_at is None:
+            return None
+        if expires_at > now:
+            return expires_at
+        del self._spilled[name]
+        self.expired += 1
+        try:
+            os.remove(self._path(name))
+        except OSError:
+            pass
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "directory": self.directory,
+            "spilled_users": len(self._spilled),
+            "spills": self.spills,
+            "fault_ins": self.fault_ins,
+            "bytes_written": self.bytes_written,
+            "expired": self.expired,
+            "errors": self.errors,
+        }
\ No newline at end of file
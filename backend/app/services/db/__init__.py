@@ -9,6 +9,7 @@ from .feedback_manager import FeedbackManager
 from .entity_manager import EntityManager
 from .image_service import ImageService
 from .user_manager import UserManager
+from .adaptive_trait_manager import AdaptiveTraitManager
 
 __all__ = [
     "CharacterDatabase",
@@ -20,4 +21,5 @@ __all__ = [
     "EntityManager",
     "ImageService",
     "UserManager",
+    "AdaptiveTraitManager",
 ]
\ No newline at end of file
@@ -0,0 +1,59 @@
+# app/services/db/adaptive_trait_manager.py
+
+import logging
+from typing import Dict, Optional, Tuple
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
+from app.models.adaptive_trait import AdaptiveTrait
+
+TRAIT_COLUMNS = ("formality", "enthusiasm", "humor", "empathy")
+
+class AdaptiveTraitManager:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_traits(self, user_id: str, character_id: int) -> Optional[Dict[str, float]]:
+        row = self.db.query(AdaptiveTrait).filter(
+            AdaptiveTrait.user_id == user_id,
+            AdaptiveTrait.character_id == character_id
+        ).first()
+        if row is None:
+            return None
+        return {trait: getattr(row, trait) or 0.0 for trait in TRAIT_COLUMNS}
+
+    def save_traits(self, traits_by_key: Dict[Tuple[str, int], Dict[str, float]]) -> int:
+        """
+        Upsert traits for many (user_id, character_id) pairs in a single transaction.
+
+        Args:
+            traits_by_key (Dict[Tuple[str, int], Dict[str, float]]): Trait values keyed by (user_id, character_id).
+
+        Returns:
+            int: The number of rows written.
+
+        Raises:
+            SQLAlchemyError: If the transaction fails; it is rolled back first.
+        """
+        if not traits_by_key:
+            return 0
+        try:
+            existing = {
+                (row.user_id, row.character_id): row
+                for row in self.db.query(AdaptiveTrait).filter(
+                    tuple_(AdaptiveTrait.user_id, AdaptiveTrait.character_id).in_(list(traits_by_key))
+                )
+            }
+            for (user_id, character_id), traits in traits_by_key.items():
+                row = existing.get((user_id, character_id))
+                if row is None:
+                    row = AdaptiveTrait(user_id=user_id, character_id=character_id)
+                    self.db.add(row)
+                for trait in TRAIT_COLUMNS:
+                    setattr(row, trait, traits.get(trait, 0.0))
+            self.db.commit()
+            return len(traits_by_key)
+        except SQLAlchemyError as e:
+            logging.error(f"Error saving adaptive traits: {str(e)}")
+            self.db.rollback()
+            raise
\ No newline at end of file
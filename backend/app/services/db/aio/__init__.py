@@ -0,0 +1,17 @@
+# app/services/db/aio/__init__.py
+#
+# AsyncSession counterparts of the managers in app.services.db that run on the event
+# loop: the chat path, the trait store and the interaction benchmark. Sessions come
+# from get_async_session_factory() in database_setup.
+
+from .character_database import AsyncCharacterDatabase
+from .user_manager import AsyncUserManager
+from .adaptive_trait_manager import AsyncAdaptiveTraitManager
+from .interaction_manager import AsyncInteractionManager
+
+__all__ = [
+    "AsyncCharacterDatabase",
+    "AsyncUserManager",
+    "AsyncAdaptiveTraitManager",
+    "AsyncInteractionManager",
+]
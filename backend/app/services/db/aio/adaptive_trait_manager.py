@@ -0,0 +1,58 @@
+# app/services/db/aio/adaptive_trait_manager.py
+
+import logging
+from typing import Dict, Optional, Tuple
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
+from app.models.adaptive_trait import AdaptiveTrait
+from app.services.db.adaptive_trait_manager import TRAIT_COLUMNS
+
+class AsyncAdaptiveTraitManager:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_traits(self, user_id: str, character_id: int) -> Optional[Dict[str, float]]:
+        row = (await self.db.scalars(select(AdaptiveTrait).where(
+            AdaptiveTrait.user_id == user_id,
+            AdaptiveTrait.character_id == character_id
+        ))).first()
+        if row is None:
+            return None
+        return {trait: getattr(row, trait) or 0.0 for trait in TRAIT_COLUMNS}
+
+    async def save_traits(self, traits_by_key: Dict[Tuple[str, int], Dict[str, float]]) -> int:
+        """
+        Upsert traits for many (user_id, character_id) pairs in a single transaction.
+
+        Args:
+            traits_by_key (Dict[Tuple[str, int], Dict[str, float]]): Trait values keyed by (user_id, character_id).
+
+        Returns:
+            int: The number of rows written.
+
+        Raises:
+            SQLAlchemyError: If the transaction fails; it is rolled back first.
+        """
+        if not traits_by_key:
+            return 0
+        try:
+            existing = {
+                (row.user_id, row.character_id): row
+                for row in await self.db.scalars(select(AdaptiveTrait).where(
+                    tuple_(AdaptiveTrait.user_id, AdaptiveTrait.character_id).in_(list(traits_by_key))
+                ))
+            }
+            for (user_id, character_id), traits in traits_by_key.items():
+                row = existing.get((user_id, character_id))
+                if row is None:
+                    row = AdaptiveTrait(user_id=user_id, character_id=character_id)
+                    self.db.add(row)
+                for trait in TRAIT_COLUMNS:
+                    setattr(row, trait, traits.get(trait, 0.0))
+            await self.db.commit()
+            return len(traits_by_key)
+        except SQLAlchemyError as e:
+            logging.error(f"Error saving adaptive traits: {str(e)}")
+            await self.db.rollback()
+            raise
\ No newline at end of file
@@ -0,0 +1,132 @@
+# app/services/db/aio/character_database.py
+
+from typing import List, Optional
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.character import Character
+from app.services.characters.character_cache import CharacterCache, CharacterStamp, get_character_cache, stamp_columns
+from app.services.characters.character_details import CHARACTER_DETAILS
+from app.services.characters.character_profile import CharacterProfile
+
+class AsyncCharacterDatabase:
+    def __init__(self, db: AsyncSession, cache: Optional[CharacterCache] = None):
+        self.db = db
+        self.cache = cache or get_character_cache()
+
+    async def create_character(self, name: str, description: str, personality_traits: str, character_type: str = "default", available: bool = True) -> Character:
+        db_character = Character(
+            name=name,
+            description=description,
+            personality_traits=personality_traits,
+            character_type=character_type,
+            available=available
+        )
+        self.db.add(db_character)
+        await self.db.commit()
+        await self.db.refresh(db_character)
+        self.cache.invalidate()
+        return db_character
+
+    async def get_character_by_id(self, character_id: int) -> Optional[Character]:
+        return (await self.db.scalars(select(Character).where(Character.id == character_id))).first()
+
+    async def update_character(self, character_id: int, **kwargs) -> Optional[Character]:
+        db_character = await self.get_character_by_id(character_id)
+        if db_character:
+            for key, value in kwargs.items():
+                if hasattr(db_character, key):
+                    setattr(db_character, key, value)
+            await self.db.commit()
+            await self.db.refresh(db_character)
+            self.cache.invalidate()
+        return db_character
+
+    async def delete_character(self, character_id: int) -> bool:
+        db_character = await self.get_character_by_id(character_id)
+        if db_character:
+            await self.db.delete(db_character)
+            await self.db.commit()
+            self.cache.invalidate()
+            return True
+        return False
+
+    async def get_all_characters(self) -> List[Character]:
+        return list(await self.db.scalars(select(Character)))
+
+    async def get_default_character(self) -> Character:
+        default_character = (await self.db.scalars(select(Character).where(Character.character_type == "default"))).first()
+        if not default_character:
+            default_character = await self.create_character(
+                name="Default Character",
+                description="A friendly AI assistant",
+                personality_traits="Helpful, friendly, knowledgeable",
+                character_type="default",
+                available=True
+            )
+        return default_character
+
+    async def insert_or_update_character(self, character_type: str, details: dict) -> None:
+        existing_character = (await self.db.scalars(select(Character).where(Character.character_type == character_type))).first()
+        if existing_character:
+            await self.update_character(
+                existing_character.id,
+                name=details['name'],
+                description=details['backstory'],
+                personality_traits=', '.join(details['personality_traits']),
+                available=True
+            )
+        else:
+            await self.create_character(
+                name=details['name'],
+                description=details['backstory'],
+                personality_traits=', '.join(details['personality_traits']),
+                character_type=character_type,
+                available=True
+            )
+
+    async def populate_characters(self) -> None:
+        for character_type, details in CHARACTER_DETAILS.items():
+            await self.insert_or_update_character(character_type, details)
+        # Every character is in memory from here on
+        self.cache.preload(list(await self.db.scalars(select(Character))), await self._stamp())
+
+    async def _stamp(self) -> CharacterStamp:
+        return tuple((await self.db.execute(select(*stamp_columns()))).one())
+
+    async def refresh_cache(self) -> None:
+        """If a check is due, compare the cache with the table and drop it if another process changed a character."""
+        if self.cache.check_due():
+            self.cache.validate(await self._stamp())
+
+    async def get_profile(self, character_id: int) -> Optional[CharacterProfile]:
+        """Read-through cached lookup of a character's profile."""
+        await self.refresh_cache()
+        profile = self.cache.get(character_id)
+        if profile is None:
+            version = self.cache.version
+            character = await self.get_character_by_id(character_id)
+            if character is not None:
+                profile = self.cache.put(character, version)
+        return profile
+
+    async def get_or_create_default_character(self) -> int:
+        await self.refresh_cache()
+        if self.cache.default_id is not None:
+            return self.cache.default_id
+        version = self.cache.version
+        default_character = (await self.db.scalars(select(Character).where(
+            or_(Character.character_type == "adaptive", Character.character_type == "default")
+        ))).first()
+
+        if default_character:
+            self.cache.set_default_id(default_character.id, version)
+            return default_character.id
+
+        new_character = await self.create_character(
+            name="Adaptive AI Friend",
+            description="I'm an AI Friend that adapts my personality based on our conversation.",
+            personality_traits="Adaptive, Observant, Evolving",
+            character_type="adaptive",
+            available=True
+        )
+        return new_character.id
\ No newline at end of file
@@ -0,0 +1,101 @@
+# app/services/db/aio/interaction_manager.py
+
+import logging
+from typing import Optional, List
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
+from app.models.interaction import Interaction
+from app.models.user import User
+from app.services.db.aio.character_database import AsyncCharacterDatabase
+
+class AsyncInteractionManager:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.character_database = AsyncCharacterDatabase(db)
+
+    async def create_interaction(self, user_id: str, character_id: Optional[int], interaction_type: str) -> Optional[Interaction]:
+        try:
+            # Check if the user exists
+            user = (await self.db.scalars(select(User).where(User.user_id == user_id))).first()
+            if not user:
+                logging.error(f"User with id {user_id} does not exist")
+                return None
+
+            # If character_id is not provided, use the default (adaptive) one
+            if character_id is None:
+                character_id = await self.character_database.get_or_create_default_character()
+
+            # Create the interaction
+            new_interaction = Interaction(
+                user_id=user_id,
+                character_id=character_id,
+                interaction_type=interaction_type
+            )
+            self.db.add(new_interaction)
+            await self.db.commit()
+            await self.db.refresh(new_interaction)
+            return new_interaction
+        except SQLAlchemyError as e:
+            logging.error(f"Error creating Interaction: {str(e)}")
+            await self.db.rollback()
+            return None
+
+    async def get_interaction_by_id(self, interaction_id: int) -> Optional[Interaction]:
+        return (await self.db.scalars(select(Interaction).where(Interaction.id == interaction_id))).first()
+
+    async def get_interactions_by_user_id(self, user_id: str) -> List[Interaction]:
+        return list(await self.db.scalars(select(Interaction).where(Interaction.user_id == user_id)))
+
+    async def update_interaction(self, interaction_id: int, **kwargs) -> Optional[Interaction]:
+        interaction = await self.get_interaction_by_id(interaction_id)
+        if interaction:
+            for key, value in kwargs.items():
+                if hasattr(interaction, key):
+                    setattr(interaction, key, value)
+            try:
+                await self.db.commit()
+                await self.db.refresh(interaction)
+                return interaction
+            except SQLAlchemyError as e:
+                logging.error(f"Error updating Interaction: {str(e)}")
+                await self.db.rollback()
+                return None
+        return None
+
+    async def delete_interaction(self, interaction_id: int) -> bool:
+        interaction = await self.get_interaction_by_id(interaction_id)
+        if interaction:
+            try:
+                await self.db.delete(interaction)
+                await self.db.commit()
+                return True
+            except SQLAlchemyError as e:
+                logging.error(f"Error deleting Interaction: {str(e)}")
+                await self.db.rollback()
+                return False
+        return False
+
+    async def get_or_create_test_user(self) -> str:
+        test_user = (await self.db.scalars(select(User).where(User.username == 'test_user'))).first()
+        if test_user:
+            return test_user.user_id
+        else:
+            # Create test user
+            new_user = User(
+                username='test_user',
+                email='test@example.com',
+                hashed_password='hashed_test_password',
+                is_active=True
+            )
+            self.db.add(new_user)
+            await self.db.commit()
+            await self.db.refresh(new_user)
+            return new_user.user_id
+
+    async def get_user_id_by_username(self, username: str) -> Optional[str]:
+        user = (await self.db.scalars(select(User).where(User.username == username))).first()
+        if user:
+            return user.user_id
+        else:
+            return None
\ No newline at end of file
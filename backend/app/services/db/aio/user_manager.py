@@ -0,0 +1,106 @@
+# app/services/db/aio/user_manager.py
+
+import logging
+from typing import Optional, List
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.user import User
+from app.schemas.schemas import UserCreate
+from app.core.security import get_password_hash, verify_password
+from app.services.db.user_cache import UserCache, UserIdentity, get_user_cache
+
+class AsyncUserManager:
+    def __init__(self, db: AsyncSession, user_cache: Optional[UserCache] = None):
+        self.db = db
+        self.user_cache = user_cache or get_user_cache()
+
+    async def create_user(self, user: UserCreate) -> User:
+        hashed_password = get_password_hash(user.password)
+        db_user = User(username=user.username, email=user.email, hashed_password=hashed_password)
+        self.db.add(db_user)
+        await self.db.flush()
+        await self.db.commit()
+        await self.db.refresh(db_user)
+        return db_user
+
+    async def get_or_create_test_user(self, user_id: str, username: str, email: str, password: str) -> Optional[UserIdentity]:
+        """Get the test user, creating them on first use. Served from the user cache once resolved."""
+        cached = self.user_cache.get_by_email(email) or self.user_cache.get(user_id)
+        if cached:
+            return cached
+        user = await self.get_user_by_id(user_id)
+        if not user:
+            try:
+                user_create = UserCreate(username=username, email=email, password=password)
+                user = await self.create_user(user_create)
+                logging.info(f"Created test user with id: {user_id}")
+            except IntegrityError:
+                await self.db.rollback()
+                user = await self.get_user_by_username(username)
+                if not user:
+                    user = await self.get_user_by_email(email)
+                logging.info(f"Retrieved existing test user with id: {user.user_id if user else 'Unknown'}")
+        return self.user_cache.put(user) if user else None
+
+    async def get_user_by_id(self, user_id: str) -> Optional[User]:
+        return (await self.db.scalars(select(User).where(User.user_id == user_id))).first()
+
+    async def get_user_by_username(self, username: str) -> Optional[User]:
+        return (await self.db.scalars(select(User).where(User.username == username))).first()
+
+    async def get_user_by_email(self, email: str) -> Optional[User]:
+        return (await self.db.scalars(select(User).where(User.email == email))).first()
+
+    async def get_identity(self, user_id: str) -> Optional[UserIdentity]:
+        """Read-through cached lookup by user ID, for callers that only need to know who the user is."""
+        cached = self.user_cache.get(user_id)
+        if cached:
+            return cached
+        user = await self.get_user_by_id(user_id)
+        return self.user_cache.put(user) if user else None
+
+    async def get_identity_by_token_subject(self, subject: str) -> Optional[UserIdentity]:
+        """Read-through cached lookup of the user an access token's `sub` claim (their email) names."""
+        cached = self.user_cache.get_by_subject(subject)
+        if cached:
+            return cached
+        user = await self.get_user_by_email(subject)
+        return self.user_cache.put(user, subject=subject) if user else None
+
+    async def authenticate_user(self, username: str, password: str) -> Optional[User]:
+        user = await self.get_user_by_username(username)
+        if not user or not verify_password(password, user.hashed_password):
+            return None
+        return user
+
+    async def update_user(self, user_id: str, **kwargs) -> Optional[User]:
+        user = await self.get_user_by_id(user_id)
+        if user:
+            for key, value in kwargs.items():
+                if key == 'password':
+                    user.hashed_password = get_password_hash(value)
+                elif hasattr(user, key):
+                    setattr(user, key, value)
+            await self.db.commit()
+            await self.db.refresh(user)
+            self.user_cache.invalidate(user_id)
+        return user
+
+    async def delete_user(self, user_id: str) -> bool:
+        user = await self.get_user_by_id(user_id)
+        if user:
+            await self.db.delete(user)
+            await self.db.commit()
+            self.user_cache.invalidate(user_id)
+            return True
+        return False
+
+    async def get_all_users(self) -> List[User]:
+        return list(await self.db.scalars(select(User)))
+
+    async def is_username_taken(self, username: str) -> bool:
+        return await self.get_user_by_username(username) is not None
+
+    async def is_email_taken(self, email: str) -> bool:
+        return await self.get_user_by_email(email) is not None
\ No newline at end of file
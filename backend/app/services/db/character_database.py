@@ -4,11 +4,14 @@ from typing import List, Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 from app.models.character import Character
+from app.services.characters.character_cache import CharacterCache, CharacterStamp, get_character_cache, stamp_columns
 from app.services.characters.character_details import CHARACTER_DETAILS
+from app.services.characters.character_profile import CharacterProfile
 
 class CharacterDatabase:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, cache: Optional[CharacterCache] = None):
         self.db = db
+        self.cache = cache or get_character_cache()
 
     def create_character(self, name: str, description: str, personality_traits: str, character_type: str = "default", available: bool = True) -> Character:
         db_character = Character(
@@ -21,6 +24,7 @@ class CharacterDatabase:
         self.db.add(db_character)
         self.db.commit()
         self.db.refresh(db_character)
+        self.cache.invalidate()
         return db_character
     
     def get_character_by_id(self, character_id: int) -> Optional[Character]:
@@ -34,6 +38,7 @@ class CharacterDatabase:
                     setattr(db_character, key, value)
             self.db.commit()
             self.db.refresh(db_character)
+            self.cache.invalidate()
         return db_character
 
     def delete_character(self, character_id: int) -> bool:
@@ -41,6 +46,7 @@ class CharacterDatabase:
         if db_character:
             self.db.delete(db_character)
             self.db.commit()
+            self.cache.invalidate()
             return True
         return False
 
@@ -81,13 +87,39 @@ class CharacterDatabase:
     def populate_characters(self) -> None:
         for character_type, details in CHARACTER_DETAILS.items():
             self.insert_or_update_character(character_type, details)
+        # Every character is in memory from here on
+        self.cache.preload(self.db.query(Character).all(), self._stamp())
+
+    def _stamp(self) -> CharacterStamp:
+        return tuple(self.db.query(*stamp_columns()).one())
+
+    def refresh_cache(self) -> None:
+        """If a check is due, compare the cache with the table and drop it if another process changed a character."""
+        if self.cache.check_due():
+            self.cache.validate(self._stamp())
+
+    def get_profile(self, character_id: int) -> Optional[CharacterProfile]:
+        """Read-through cached lookup of a character's profile."""
+        self.refresh_cache()
+        profile = self.cache.get(character_id)
+        if profile is None:
+            version = self.cache.version
+            character = self.get_character_by_id(character_id)
+            if character is not None:
+                profile = self.cache.put(character, version)
+        return profile
 
     def get_or_create_default_character(self) -> int:
+        self.refresh_cache()
+        if self.cache.default_id is not None:
+            return self.cache.default_id
+        version = self.cache.version
         default_character = self.db.query(Character).filter(
             or_(Character.character_type == "adaptive", Character.character_type == "default")
         ).first()
         
         if default_character:
+            self.cache.set_default_id(default_character.id, version)
             return default_character.id
         
         new_character = self.create_character(
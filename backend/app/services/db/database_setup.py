@@ -1,7 +1,9 @@
 # app/db/database_setup.py
 
 import logging
+from typing import Optional
 from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from app.core.config import settings
@@ -23,6 +25,45 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# Engine on the async driver, created on first use so scripts that only need the sync engine never load it
+_async_engine: Optional[AsyncEngine] = None
+_async_session_factory: Optional[async_sessionmaker] = None
+
+def get_async_engine() -> AsyncEngine:
+    global _async_engine
+    if _async_engine is None:
+        url = settings.ASYNC_DATABASE_URL
+        if url.startswith("mysql"):
+            url = f"{url}?charset=utf8mb4"
+        _async_engine = create_async_engine(
+            url,
+            pool_pre_ping=True,
+            pool_recycle=3600,
+            pool_size=settings.ASYNC_DB_POOL_SIZE,
+            max_overflow=settings.ASYNC_DB_MAX_OVERFLOW,
+            echo=False
+        )
+    return _async_engine
+
+def get_async_session_factory() -> async_sessionmaker:
+    """
+    Session factory for `AsyncSession`s.
+
+    Objects are not expired on commit: with an async session, touching an expired
+    attribute would need an implicit load, which raises outside an awaited call.
+    """
+    global _async_session_factory
+    if _async_session_factory is None:
+        _async_session_factory = async_sessionmaker(get_async_engine(), autoflush=False, expire_on_commit=False)
+    return _async_session_factory
+
+async def dispose_async_engine() -> None:
+    global _async_engine, _async_session_factory
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _async_session_factory = None
+
 def get_db():
     db = SessionLocal()
     try:
@@ -43,6 +84,7 @@ def create_tables() -> None:
         from app.models.feedback import Feedback
         from app.models.session import Session
         from app.models.user_preference import UserPreference
+        from app.models.adaptive_trait import AdaptiveTrait
         
         # This will create all tables
         Base.metadata.create_all(bind=engine)
@@ -0,0 +1,151 @@
+# app/services/db/user_cache.py
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Set
+from app.core.config import settings
+
+@dataclass(frozen=True)
+class UserIdentity:
+    """
+    The columns of a `User` that identify and describe them, detached from any session.
+
+    Cached identities are shared between requests and threads, so they are immutable
+    and leave out the password hash.
+    """
+    id: int
+    user_id: str
+    username: str
+    email: str
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user: Any) -> "UserIdentity":
+        if isinstance(user, cls):
+            return user
+        return cls(user.id, user.user_id, user.username, user.email, user.is_active)
+
+@dataclass
+class _Entry:
+    expires_at: float
+    identity: UserIdentity
+    subjects: Set[str]
+
+class UserCache:
+    """
+    TTL cache of user identities, reachable by user ID, email or access-token subject.
+
+    Entries are stored once under the user ID; the email and subject keys are indexes
+    onto it, so `invalidate` drops every way of reaching a user at once. The managers
+    invalidate a user whenever they update or delete them; the TTL bounds how long
+    another worker process can serve a stale identity. Least recently used entries are
+    evicted beyond `max_entries`.
+    """
+
+    def __init__(self, ttl: float = settings.USER_CACHE_TTL, max_entries: int = settings.USER_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._by_email: Dict[str, str] = {}
+        self._by_subject: Dict[str, str] = {}
+        # Sync routes run the managers in the threadpool, async ones on the event loop
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def _lookup(self, user_id: Optional[str]) -> Optional[UserIdentity]:
+        with self._lock:
+            entry = self._entries.get(user_id) if user_id is not None else None
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._remove(user_id)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry.identity
+
+    def get(self, user_id: str) -> Optional[UserIdentity]:
+        return self._lookup(user_id)
+
+    def get_by_email(self, email: str) -> Optional[UserIdentity]:
+        return self._lookup(self._by_email.get(email))
+
+    def get_by_subject(self, subject: str) -> Optional[UserIdentity]:
+        return self._lookup(self._by_subject.get(subject))
+
+    def put(self, user: Any, subject: Optional[str] = None) -> UserIdentity:
+        """
+        Cache a user, optionally also under the subject of the token that named them.
+
+        Returns:
+            UserIdentity: The cached identity.
+        """
+        identity = UserIdentity.from_user(user)
+        with self._lock:
+            previous = self._entries.get(identity.user_id)
+            subjects = previous.subjects if previous is not None and previous.identity == identity else set()
+            self._remove(identity.user_id)
+            if subject is not None:
+                subjects.add(subject)
+            self._entries[identity.user_id] = _Entry(time.monotonic() + self.ttl, identity, subjects)
+            self._by_email[identity.email] = identity.user_id
+            for known_subject in subjects:
+                self._by_subject[known_subject] = identity.user_id
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return identity
+
+    def invalidate(self, user_id: str) -> None:
+        """Forget a user under every key."""
+        with self._lock:
+            if self._remove(user_id):
+                self.invalidations += 1
+
+    def _remove(self, user_id: str) -> bool:
+        entry = self._entries.pop(user_id, None)
+        if entry is None:
+            return False
+        if self._by_email.get(entry.identity.email) == user_id:
+            del self._by_email[entry.identity.email]
+        for subject in entry.subjects:
+            if self._by_subject.get(subject) == user_id:
+                del self._by_subject[subject]
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_email.clear()
+            self._by_subject.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+        }
+
+_user_cache: Optional[UserCache] = None
+
+def get_user_cache() -> UserCache:
+    """Return the process-wide user cache, creating it on first use."""
+    global _user_cache
+    if _user_cache is None:
+        _user_cache = UserCache()
+    return _user_cache
\ No newline at end of file
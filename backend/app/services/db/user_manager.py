@@ -4,11 +4,13 @@ from sqlalchemy.exc import IntegrityError
 from app.models.user import User
 from app.schemas.schemas import UserCreate
 from app.core.security import get_password_hash, verify_password
+from app.services.db.user_cache import UserCache, UserIdentity, get_user_cache
 import logging
 
 class UserManager:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, user_cache: Optional[UserCache] = None):
         self.db = db
+        self.user_cache = user_cache or get_user_cache()
 
     def create_user(self, user: UserCreate) -> User:
         hashed_password = get_password_hash(user.password)
@@ -19,7 +21,11 @@ class UserManager:
         self.db.refresh(db_user)
         return db_user
 
-    def get_or_create_test_user(self, user_id: str, username: str, email: str, password: str) -> Optional[User]:
+    def get_or_create_test_user(self, user_id: str, username: str, email: str, password: str) -> Optional[UserIdentity]:
+        """Get the test user, creating them on first use. Served from the user cache once resolved."""
+        cached = self.user_cache.get_by_email(email) or self.user_cache.get(user_id)
+        if cached:
+            return cached
         user = self.get_user_by_id(user_id)
         if not user:
             try:
@@ -32,7 +38,7 @@ class UserManager:
                 if not user:
                     user = self.get_user_by_email(email)
                 logging.info(f"Retrieved existing test user with id: {user.user_id if user else 'Unknown'}")
-        return user
+        return self.user_cache.put(user) if user else None
 
     def get_user_by_id(self, user_id: str) -> Optional[User]:
         return self.db.query(User).filter(User.user_id == user_id).first()
@@ -43,6 +49,22 @@ class UserManager:
     def get_user_by_email(self, email: str) -> Optional[User]:
         return self.db.query(User).filter(User.email == email).first()
 
+    def get_identity(self, user_id: str) -> Optional[UserIdentity]:
+        """Read-through cached lookup by user ID, for callers that only need to know who the user is."""
+        cached = self.user_cache.get(user_id)
+        if cached:
+            return cached
+        user = self.get_user_by_id(user_id)
+        return self.user_cache.put(user) if user else None
+
+    def get_identity_by_token_subject(self, subject: str) -> Optional[UserIdentity]:
+        """Read-through cached lookup of the user an access token's `sub` claim (their email) names."""
+        cached = self.user_cache.get_by_subject(subject)
+        if cached:
+            return cached
+        user = self.get_user_by_email(subject)
+        return self.user_cache.put(user, subject=subject) if user else None
+
     def authenticate_user(self, username: str, password: str) -> Optional[User]:
         user = self.get_user_by_username(username)
         if not user or not verify_password(password, user.hashed_password):
@@ -59,6 +81,7 @@ class UserManager:
                     setattr(user, key, value)
             self.db.commit()
             self.db.refresh(user)
+            self.user_cache.invalidate(user_id)
         return user
 
     def delete_user(self, user_id: str) -> bool:
@@ -66,6 +89,7 @@ class UserManager:
         if user:
             self.db.delete(user)
             self.db.commit()
+            self.user_cache.invalidate(user_id)
             return True
         return False
 
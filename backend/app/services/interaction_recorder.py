@@ -0,0 +1,235 @@
+# app/services/interaction_recorder.py
+
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.character import Character
+from app.models.interaction import Interaction
+from app.models.user import User
+from app.services.db.aio.character_database import AsyncCharacterDatabase
+from app.services.db.database_setup import get_async_session_factory
+
+class InteractionRecorder:
+    """
+    Write-behind log of chat interactions.
+
+    `record` only appends the event to an in-memory buffer. The buffer is written with
+    a single multi-row INSERT once it holds `flush_size` events, or `flush_interval`
+    seconds after the last flush, whichever comes first. Users and characters are
+    checked against sets of IDs already seen to exist, so a warm flush is one statement;
+    only IDs not seen before cost a lookup. Events for unknown users are dropped, and
+    events naming a character that no longer exists go to the default character, as
+    the interactions endpoint does. Events keep the time they were recorded, not flushed.
+
+    If the database still rejects a batch after the caches are refreshed, its rows are
+    written one at a time and the rejected ones dropped, so one bad row cannot hold up
+    the rest of the buffer.
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], AsyncSession]] = None,
+        flush_size: int = settings.INTERACTION_FLUSH_SIZE,
+        flush_interval: float = settings.INTERACTION_FLUSH_INTERVAL_MS / 1000,
+        max_buffer: int = settings.INTERACTION_BUFFER_MAX
+    ):
+        self.session_factory = session_factory
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._buffer: Deque[Dict[str, Any]] = deque()
+        self._known_users: Set[str] = set()
+        self._known_characters: Set[int] = set()
+        self._default_character_id: Optional[int] = None
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._flush_task: Optional[asyncio.Task] = None
+        self.recorded = 0
+        self.max_buffered = 0
+        self.flushes = 0
+        self.flush_failures = 0
+        self.rows_written = 0
+        self.dropped_unknown_user = 0
+        self.remapped_unknown_character = 0
+        self.dropped_rejected = 0
+        self.dropped_overflow = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+
+    def record(self, user_id: str, character_id: Optional[int], interaction_type: str) -> None:
+        """Buffer an interaction; a None character_id means the default character."""
+        if len(self._buffer) >= self.max_buffer:
+            # The database has been unreachable for a while; keep the newest events
+            self._buffer.popleft()
+            self.dropped_overflow += 1
+        self._buffer.append({
+            "user_id": user_id,
+            "character_id": character_id,
+            "interaction_type": interaction_type,
+            "timestamp": datetime.utcnow(),
+        })
+        self.recorded += 1
+        self.max_buffered = max(self.max_buffered, len(self._buffer))
+        if len(self._buffer) >= self.flush_size:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        """
+        Write every buffered interaction.
+
+        Returns:
+            int: The number of rows written.
+        """
+        async with self._flush_lock:
+            if not self._buffer:
+                return 0
+            batch = list(self._buffer)
+            self._buffer.clear()
+            started = time.perf_counter()
+            try:
+                written = await self._write(batch)
+            except Exception as e:
+                # Put the events back ahead of anything recorded meanwhile so the next flush retries them
+                self._buffer.extendleft(reversed(batch))
+                while len(self._buffer) > self.max_buffer:
+                    self._buffer.popleft()
+                    self.dropped_overflow += 1
+                self.flush_failures += 1
+                logging.error(f"Failed to flush {len(batch)} interactions: {e}")
+                return 0
+            elapsed = time.perf_counter() - started
+            self.flushes += 1
+            self.rows_written += written
+            self.last_flush_seconds = elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+            self.total_flush_seconds += elapsed
+            return written
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> int:
+        async with (self.session_factory or get_async_session_factory())() as db:
+            rows, remapped = await self._validate(db, batch)
+            if not rows:
+                return 0
+            try:
+                written = await self._insert(db, rows)
+                self.remapped_unknown_character += remapped
+                return written
+            except IntegrityError:
+                await db.rollback()
+            # A cached user or character was deleted; look them up again and retry once
+            self._known_users.difference_update(row["user_id"] for row in rows)
+            self._known_characters.difference_update(row["character_id"] for row in rows)
+            self._default_character_id = None
+            # The default character may be stale in the character cache as well
+            AsyncCharacterDatabase(db).cache.invalidate()
+            rows, remapped = await self._validate(db, batch)
+            if not rows:
+                return 0
+            self.remapped_unknown_character += remapped
+            try:
+                return await self._insert(db, rows)
+            except IntegrityError:
+                await db.rollback()
+            return await self._insert_each(db, rows)
+
+    async def _insert(self, db: AsyncSession, rows: List[Dict[str, Any]]) -> int:
+        await db.execute(insert(Interaction).values(rows))
+        await db.commit()
+        return len(rows)
+
+    async def _insert_each(self, db: AsyncSession, rows: List[Dict[str, Any]]) -> int:
+        """Write rows one by one, dropping those the database rejects."""
+        written = 0
+        for row in rows:
+            try:
+                written += await self._insert(db, [row])
+            except IntegrityError as e:
+                await db.rollback()
+                self.dropped_rejected += 1
+                logging.error(f"Dropped interaction rejected by the database: {row}: {e.orig}")
+        return written
+
+    async def _validate(self, db: AsyncSession, batch: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Resolve default and deleted characters, and drop events for users that do not exist.
+
+        Returns:
+            Tuple[List[Dict[str, Any]], int]: The rows to insert, and how many were moved to the default character.
+        """
+        unknown = {event["user_id"] for event in batch} - self._known_users
+        if unknown:
+            self._known_users.update(await db.scalars(select(User.user_id).where(User.user_id.in_(unknown))))
+        unknown_characters = {event["character_id"] for event in batch if event["character_id"] is not None} - self._known_characters
+        if unknown_characters:
+            self._known_characters.update(await db.scalars(select(Character.id).where(Character.id.in_(unknown_characters))))
+        if self._default_character_id is None and any(event["character_id"] not in self._known_characters for event in batch):
+            self._default_character_id = await AsyncCharacterDatabase(db).get_or_create_default_character()
+
+        rows = []
+        remapped = 0
+        missing: Set[str] = set()
+        for event in batch:
+            if event["user_id"] not in self._known_users:
+                missing.add(event["user_id"])
+                continue
+            if event["character_id"] not in self._known_characters:
+                if event["character_id"] is not None:
+                    remapped += 1
+                event = {**event, "character_id": self._default_character_id}
+            rows.append(event)
+        if missing:
+            self.dropped_unknown_user += len(batch) - len(rows)
+            logging.error(f"Dropped {len(batch) - len(rows)} interactions for unknown users: {sorted(missing)}")
+        return rows, remapped
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self) -> None:
+        """Start flushing in the background."""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self) -> None:
+        """Stop the background task and write out anything still buffered."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": len(self._buffer),
+            "max_buffered": self.max_buffered,
+            "known_users": len(self._known_users),
+            "known_characters": len(self._known_characters),
+            "recorded": self.recorded,
+            "rows_written": self.rows_written,
+            "flushes": self.flushes,
+            "flush_failures": self.flush_failures,
+            "dropped_unknown_user": self.dropped_unknown_user,
+            "remapped_unknown_character": self.remapped_unknown_character,
+            "dropped_rejected": self.dropped_rejected,
+            "dropped_overflow": self.dropped_overflow,
+            "last_flush_ms": round(self.last_flush_seconds * 1000, 2),
+            "avg_flush_ms": round(self.total_flush_seconds / self.flushes * 1000, 2) if self.flushes else None,
+            "max_flush_ms": round(self.max_flush_seconds * 1000, 2),
+        }
\ No newline at end of file
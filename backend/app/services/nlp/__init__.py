@@ -3,6 +3,7 @@
 from .user_input_analyzer import UserInputAnalyzer
 from .casual_conversation_handler import CasualConversation
 from ..db.interaction_manager import InteractionManager
-from .nlp_service import NLPService
+from .nlp_service import NLPService, NLPEngine, get_nlp_engine
+from .sentiment import SentimentBackend, create_sentiment_backend
 
-__all__ = ["UserInputAnalyzer", "CasualConversation", "InteractionManager","NLPService"]
\ No newline at end of file
+__all__ = ["UserInputAnalyzer", "CasualConversation", "InteractionManager", "NLPService", "NLPEngine", "get_nlp_engine", "SentimentBackend", "create_sentiment_backend"]
\ No newline at end of file
@@ -0,0 +1,143 @@
+# app/services/nlp/analysis_cache.py
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from app.core.config import settings
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text for cache lookups.
+
+    Only surrounding and repeated whitespace is folded. Case and punctuation are kept
+    because both VADER and the entity recognizer treat them as signal.
+    """
+    return " ".join(text.split())
+
+class AnalysisCache:
+    """
+    Bounded LRU cache with a TTL for NLP results, keyed on a hash of the normalized text.
+
+    Entries live in a process-local tier. When a shared Redis client is supplied, async
+    lookups that miss locally fall through to it, so several uvicorn workers can reuse
+    each other's results. Cached values are shared between callers and must not be mutated.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.NLP_CACHE_MAX_ENTRIES,
+        ttl: float = settings.NLP_CACHE_TTL,
+        shared: Optional[Any] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared = shared
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        # Worker threads and the event loop both touch the local tier
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(namespace: str, text: str) -> str:
+        digest = hashlib.blake2b(normalize_text(text).encode("utf-8"), digest_size=16).hexdigest()
+        return f"nlp:{namespace}:{digest}"
+
+    def get_local(self, key: str) -> Optional[Any]:
+        """Look a key up in the process-local tier only."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set_local(self, key: str, value: Any) -> None:
+        """Store a value in the process-local tier, evicting the least recently used entry if full."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def lookup(self, key: str) -> Optional[Any]:
+        """Synchronous lookup against the local tier, with hit/miss accounting."""
+        value = self.get_local(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Look a key up locally, then in the shared tier if one is configured."""
+        value = self.get_local(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        if self.shared is not None:
+            try:
+                raw = await self.shared.get(key)
+            except Exception as e:
+                logging.warning(f"Shared NLP cache lookup failed: {e}")
+                raw = None
+            if raw is not None:
+                value = json.loads(raw)
+                self.set_local(key, value)
+                self.shared_hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Any) -> None:
+        """Store a value locally and, if configured, in the shared tier."""
+        self.set_local(key, value)
+        if self.shared is not None:
+            try:
+                await self.shared.set(key, json.dumps(value), ex=max(1, int(self.ttl)))
+            except Exception as e:
+                logging.warning(f"Shared NLP cache write failed: {e}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "shared": self.shared is not None,
+        }
+
+_analysis_cache: Optional[AnalysisCache] = None
+
+def get_analysis_cache() -> AnalysisCache:
+    """Return the process-wide analysis cache, creating it on first use."""
+    global _analysis_cache
+    if _analysis_cache is None:
+        shared = None
+        if settings.NLP_CACHE_SHARED:
+            from app.services.redis_client import get_redis
+            shared = get_redis()
+        _analysis_cache = AnalysisCache(shared=shared)
+    return _analysis_cache
\ No newline at end of file
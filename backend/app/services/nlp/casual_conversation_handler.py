@@ -2,24 +2,38 @@
 
 import logging
 import datetime
-from typing import List
+from typing import AsyncGenerator, List, Optional
 from app.schemas import ChatInputMessage
 from app.models.messages import Message
 from app.services.ai.lm_client import LMStudioClient
-from app.utils.text_cleaning import clean_ai_response
+from app.services.ai.prompt_assembler import PromptAssembly, TokenUsage, get_prompt_assembler
+from app.utils.text_cleaning import clean_ai_response, StreamingResponseCleaner
 from app.utils.text_processing import post_process_response
 
+CASUAL_MODEL = "mlabonne/AlphaMonarch-7B-GGUF/alphamonarch-7b.Q2_K.gguf"
+CASUAL_SYSTEM_PROMPT = "You are a friendly conversational partner. Engage in natural dialogue without mentioning that you're an AI or a language model. Focus on the topic at hand and respond as a knowledgeable human would."
+MAX_RESPONSE_TOKENS = 100
+
 class CasualConversation:
     def __init__(self):
         self.lm_client = LMStudioClient()
-
-    async def generate_casual_conversation_response(self, user_input: str, context: List[Message]) -> Message:
+        self.prompt_assembler = get_prompt_assembler()
+
+    async def generate_casual_conversation_response(
+        self,
+        user_input: str,
+        context: List[Message],
+        usage: Optional[TokenUsage] = None,
+        summary: Optional[str] = None
+    ) -> Message:
         """
         Generate a casual conversation response based on user input and context.
 
         Args:
             user_input (str): The user's input message.
             context (List[Message]): The conversation context.
+            usage (Optional[TokenUsage]): Filled in with the request's token counts if given.
+            summary (Optional[str]): Summary of the earlier conversation, if any.
 
         Returns:
             Message: The generated response message.
@@ -27,19 +41,17 @@ class CasualConversation:
         logging.debug(f"Generating small talk response for user input: {user_input}")
         
         try:
-            input_text = self.prepare_input(user_input, context)
-            messages = [
-                ChatInputMessage(role="system", content="You are a friendly conversational partner. Engage in natural dialogue without mentioning that you're an AI or a language model. Focus on the topic at hand and respond as a knowledgeable human would.", user_id="system"),
-                ChatInputMessage(role="user", content=input_text, user_id="user")
-            ]
-
+            prompt = self.build_prompt(user_input, context, summary)
             response = await self.lm_client.create_chat_completion(
-                messages=messages,
+                messages=prompt.messages,
                 # use .env to import lm model for cleaner code
-                model="mlabonne/AlphaMonarch-7B-GGUF/alphamonarch-7b.Q2_K.gguf",
+                model=CASUAL_MODEL,
                 temperature=0.7,
-                max_tokens=100
+                max_tokens=MAX_RESPONSE_TOKENS,
+                usage=usage
             )
+            if usage is not None:
+                usage.estimate(prompt.prompt_tokens, self.prompt_assembler.counter.count(response.content))
 
             cleaned_content = clean_ai_response(response.content)
             processed_content = post_process_response(cleaned_content)
@@ -62,6 +74,95 @@ class CasualConversation:
                 relevance=1.0
             )
 
+    async def stream_casual_conversation_response(
+        self,
+        user_input: str,
+        context: List[Message],
+        usage: Optional[TokenUsage] = None,
+        summary: Optional[str] = None
+    ) -> AsyncGenerator[str, None]:
+        """
+        Stream a casual conversation response, cleaned incrementally as it is generated.
+
+        Args:
+            user_input (str): The user's input message.
+            context (List[Message]): The conversation context.
+            usage (Optional[TokenUsage]): Filled in with the request's token counts if given.
+            summary (Optional[str]): Summary of the earlier conversation, if any.
+
+        Yields:
+            str: Cleaned pieces of the response text.
+
+        Raises:
+            Exception: If generation fails after part of the response was yielded.
+        """
+        logging.debug(f"Streaming small talk response for user input: {user_input}")
+
+        cleaner = StreamingResponseCleaner()
+        raw_parts = []
+        try:
+            prompt = self.build_prompt(user_input, context, summary)
+            if usage is not None:
+                usage.estimate(prompt_tokens=prompt.prompt_tokens)
+            async for delta in self.lm_client.stream_chat_completion(
+                messages=prompt.messages,
+                model=CASUAL_MODEL,
+                temperature=0.7,
+                max_tokens=MAX_RESPONSE_TOKENS,
+                usage=usage
+            ):
+                raw_parts.append(delta)
+                cleaned = cleaner.feed(delta)
+                if cleaned:
+                    yield cleaned
+            remaining = cleaner.flush()
+            if remaining:
+                yield remaining
+        except Exception as e:
+            logging.error(f"Error streaming casual response: {str(e)}")
+            if cleaner.has_emitted:
+                # Part of the reply is already out; the caller has to end the stream as failed
+                raise
+            yield "I apologize, but I am unable to generate a response at the moment."
+        finally:
+            if usage is not None:
+                usage.estimate(completion_tokens=self.prompt_assembler.counter.count("".join(raw_parts)))
+
+    def build_prompt(self, user_input: str, context: List[Message], summary: Optional[str] = None) -> PromptAssembly:
+        """
+        Build the message list sent to the language model, within the prompt token budget.
+
+        The context is folded into the user turn, so history is chosen against whatever
+        budget the system prompt, the summary and the bare user turn leave over. If those
+        alone are over budget, the summary is dropped and then the user's input truncated.
+
+        Args:
+            user_input (str): The user's input message.
+            context (List[Message]): The conversation context.
+            summary (Optional[str]): Summary of the earlier conversation, if any.
+
+        Returns:
+            PromptAssembly: The system prompt followed by the prepared user turn, with its token count.
+        """
+        assembler = self.prompt_assembler
+        counter = assembler.counter
+        available = assembler.available_tokens(MAX_RESPONSE_TOKENS)
+        # The instructions wrapped around the input are part of the user turn's cost
+        template_tokens = counter.count(self.prepare_input("", []))
+        system_prompt, user_input = assembler.fit(CASUAL_SYSTEM_PROMPT, user_input, available - template_tokens, summary)
+
+        system_tokens = counter.count_message(system_prompt)
+        budget = available - system_tokens - counter.count_message(self.prepare_input(user_input, []))
+        selected = assembler.select_context(context, budget)
+
+        input_text = self.prepare_input(user_input, selected)
+        messages = [
+            ChatInputMessage(role="system", content=system_prompt, user_id="system"),
+            ChatInputMessage(role="user", content=input_text, user_id="user")
+        ]
+        prompt_tokens = system_tokens + counter.count_message(input_text)
+        return assembler.record(PromptAssembly(messages, selected, prompt_tokens, len(context) - len(selected)))
+
     def prepare_input(self, user_input: str, context: List[Message]) -> str:
         """
         Prepare the input for the language model.
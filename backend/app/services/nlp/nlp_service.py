@@ -1,57 +1,438 @@
 # app/services/nlp/nlp_service.py
 
+import asyncio
 import logging
-from typing import List, Tuple, Dict, Any
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, List, Tuple, Dict, Optional, Set, TypeVar
 import spacy
-from nltk.sentiment import SentimentIntensityAnalyzer as NLTKAnalyzer
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer as VaderAnalyzer
+from app.core.config import settings
 from app.models.messages import Message
+from app.services.nlp.analysis_cache import AnalysisCache, get_analysis_cache
+from app.services.nlp.sentiment import SentimentBackend, create_sentiment_backend
+
+T = TypeVar("T")
+
+def _current_rss_bytes() -> int:
+    """
+    Resident set size of this process, or 0 where it cannot be measured.
+
+    Without /proc this falls back to the peak RSS, which tracks the current size
+    while memory is only growing, as it does during a model load.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux and the BSDs kilobytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+class NLPEngine:
+    """
+    The spaCy pipeline and sentiment backend, loaded once per process.
+
+    Loading en_core_web_sm takes hundreds of milliseconds and tens of MB, so every
+    NLPService shares the instance returned by get_nlp_engine().
+    """
+
+    def __init__(self, model_name: str = settings.SPACY_MODEL, exclude: Optional[List[str]] = None):
+        if exclude is None:
+            exclude = [name.strip() for name in settings.SPACY_EXCLUDE.split(",") if name.strip()]
+        rss_before = _current_rss_bytes()
+        started = time.perf_counter()
+
+        self.model_name = model_name
+        # Excluded components are never loaded; analysis only needs POS tags and entities
+        self.nlp = spacy.load(model_name, exclude=exclude)
+        self.sentiment_backend: SentimentBackend = create_sentiment_backend(settings.SENTIMENT_BACKEND)
+
+        self.load_seconds = time.perf_counter() - started
+        self.memory_bytes = max(0, _current_rss_bytes() - rss_before)
+        logging.info(
+            f"Loaded NLP engine '{model_name}' with components {self.nlp.pipe_names} "
+            f"in {self.load_seconds:.2f}s (~{self.memory_bytes / (1024 * 1024):.1f} MB)"
+        )
+
+    def analyze(self, text: str) -> Dict[str, Any]:
+        """Run the full analysis synchronously. This is CPU-bound; call it from a worker."""
+        doc = self.nlp(text)
+        return self._build_analysis(doc, self.sentiment_backend.polarity_scores(text))
+
+    def entities(self, text: str) -> List[Tuple[str, str]]:
+        """Run the pipeline for named entities only. This is CPU-bound; call it from a worker."""
+        return [(ent.text, ent.label_) for ent in self.nlp(text).ents]
+
+    def analyze_batch(
+        self,
+        texts: List[str],
+        batch_size: int = settings.NLP_BATCH_SIZE,
+        n_process: int = settings.NLP_PIPE_N_PROCESS
+    ) -> List[Dict[str, Any]]:
+        """
+        Analyze many texts in one pass. This is CPU-bound; call it from a worker.
+
+        spaCy processes the texts with nlp.pipe, and each distinct text is scored for
+        sentiment only once, however often it appears in the batch.
+
+        Args:
+            texts (List[str]): The texts to analyze.
+            batch_size (int): Number of texts spaCy processes per internal batch.
+            n_process (int): Number of processes nlp.pipe may use.
+
+        Returns:
+            List[Dict[str, Any]]: One analysis per input text, in input order.
+        """
+        unique_texts = list(dict.fromkeys(texts))
+        scores = dict(zip(unique_texts, self.sentiment_backend.polarity_scores_batch(unique_texts)))
+        docs = self.nlp.pipe(texts, batch_size=batch_size, n_process=n_process)
+        return [self._build_analysis(doc, scores[text]) for text, doc in zip(texts, docs)]
+
+    def _build_analysis(self, doc: spacy.tokens.Doc, sentiment: Dict[str, float]) -> Dict[str, Any]:
+        tokens: List[Tuple[str, str]] = [(token.text, token.pos_) for token in doc]
+        entities: List[Tuple[str, str]] = [(ent.text, ent.label_) for ent in doc.ents]
+        
+        # Determine overall sentiment
+        compound_score = sentiment['compound']
+        if compound_score >= 0.05:
+            overall_sentiment = "positive"
+        elif compound_score <= -0.05:
+            overall_sentiment = "negative"
+        else:
+            overall_sentiment = "neutral"
+
+        return {
+            "tokens": tokens,
+            "sentiment": sentiment,
+            "sentiment_backend": self.sentiment_backend.name,
+            "overall_sentiment": overall_sentiment,
+            "entities": entities,
+            "primary_conversation_intent": self.extract_primary_intent(doc),
+            "action_items": self.extract_action_items(doc)
+        }
+
+    def extract_primary_intent(self, doc: spacy.tokens.Doc) -> str:
+        # Implement intent extraction logic
+        # This is a placeholder implementation
+        return "general_inquiry"
+
+    def extract_action_items(self, doc: spacy.tokens.Doc) -> List[str]:
+        # Implement action item extraction logic
+        # This is a placeholder implementation
+        return []
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "components": list(self.nlp.pipe_names),
+            "sentiment_backend": self.sentiment_backend.name,
+            "load_seconds": round(self.load_seconds, 3),
+            "memory_bytes": self.memory_bytes,
+        }
+
+_engine: Optional[NLPEngine] = None
+_engine_lock = threading.Lock()
+
+def get_nlp_engine() -> NLPEngine:
+    """Return the shared NLP engine, loading it on first use."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = NLPEngine()
+    return _engine
+
+def get_nlp_engine_stats() -> Optional[Dict[str, Any]]:
+    """Return load statistics for the shared engine, or None if it has not been loaded."""
+    return _engine.stats() if _engine is not None else None
+
+def analyze_text_sync(text: str) -> Dict[str, Any]:
+    """Analyze text with this process's shared engine. Picklable, so it can run in a process pool."""
+    return get_nlp_engine().analyze(text)
+
+def analyze_batch_sync(texts: List[str]) -> List[Dict[str, Any]]:
+    """Batch counterpart of analyze_text_sync."""
+    return get_nlp_engine().analyze_batch(texts)
+
+def entities_sync(text: str) -> List[Tuple[str, str]]:
+    """Recognize named entities with this process's shared engine."""
+    return get_nlp_engine().entities(text)
+
+def sentiment_sync(text: str) -> Dict[str, float]:
+    """Score text with this process's sentiment backend."""
+    return get_nlp_engine().sentiment_backend.polarity_scores(text)
+
+class NLPWorkerPool:
+    """
+    Runs CPU-bound NLP work off the event loop.
+
+    At most `max_pending` calls may be queued or running at once; further callers wait
+    for a slot, and each call (including that wait) is bounded by `timeout` seconds.
+    """
+
+    def __init__(
+        self,
+        kind: str = settings.NLP_EXECUTOR,
+        max_workers: int = settings.NLP_MAX_WORKERS,
+        max_pending: int = settings.NLP_MAX_PENDING,
+        timeout: float = settings.NLP_TIMEOUT
+    ):
+        self.uses_processes = kind == "process"
+        if self.uses_processes:
+            # Each worker process loads its own engine up front rather than on its first task
+            self.executor: Executor = ProcessPoolExecutor(max_workers=max_workers, initializer=get_nlp_engine)
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="nlp")
+        self.kind = "process" if self.uses_processes else "thread"
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(max_pending)
+        self.pending = 0
+        self.completed = 0
+        self.timeouts = 0
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        """
+        Run func(*args) in the pool and await its result.
+
+        Raises:
+            asyncio.TimeoutError: If no slot frees up, or the work doesn't finish, within the timeout.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+
+        self.pending += 1
+        future = loop.run_in_executor(self.executor, func, *args)
+        # Free the slot only when the work really finishes, not when the caller gives up on it
+        future.add_done_callback(self._release_slot)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), max(0.0, deadline - loop.time()))
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+
+    def _release_slot(self, _future: asyncio.Future) -> None:
+        self.pending -= 1
+        self.completed += 1
+        self._slots.release()
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+        }
+
+_worker_pool: Optional[NLPWorkerPool] = None
+
+def get_nlp_worker_pool() -> NLPWorkerPool:
+    """Return the shared NLP worker pool, creating it on first use."""
+    global _worker_pool
+    if _worker_pool is None:
+        _worker_pool = NLPWorkerPool()
+    return _worker_pool
+
+def shutdown_nlp_worker_pool() -> None:
+    global _worker_pool, _micro_batcher
+    if _worker_pool is not None:
+        _worker_pool.shutdown()
+        _worker_pool = None
+    # The micro-batcher submits to the pool, so it goes with it
+    _micro_batcher = None
+
+class NLPMicroBatcher:
+    """
+    Coalesces concurrent single-text analyses into batches.
+
+    The first text to arrive opens a window of `window` seconds. Everything submitted
+    before it closes, up to `max_size` texts, is analyzed in one analyze_batch call.
+    """
+
+    def __init__(
+        self,
+        worker_pool: NLPWorkerPool,
+        analyze_batch: Callable[[List[str]], List[Dict[str, Any]]],
+        window: float = settings.NLP_MICROBATCH_WINDOW_MS / 1000,
+        max_size: int = settings.NLP_MICROBATCH_MAX_SIZE
+    ):
+        self.worker_pool = worker_pool
+        self.analyze_batch = analyze_batch
+        self.window = window
+        self.max_size = max_size
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.items = 0
+
+    async def analyze(self, text: str) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.create_task(self._run_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            results = await self.worker_pool.run(self.analyze_batch, [text for text, _ in batch])
+        except BaseException as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return
+        for (_, future), result in zip(batch, results):
+            # A caller that has given up leaves a cancelled future behind
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_ms": self.window * 1000,
+            "max_size": self.max_size,
+            "batches": self.batches,
+            "items": self.items,
+            "average_batch_size": round(self.items / self.batches, 2) if self.batches else 0,
+        }
+
+_micro_batcher: Optional[NLPMicroBatcher] = None
+
+def get_nlp_micro_batcher() -> Optional[NLPMicroBatcher]:
+    """Return the shared micro-batcher, or None when NLP_MICROBATCH_WINDOW_MS is 0."""
+    global _micro_batcher
+    if settings.NLP_MICROBATCH_WINDOW_MS <= 0:
+        return None
+    if _micro_batcher is None:
+        worker_pool = get_nlp_worker_pool()
+        analyze_batch = analyze_batch_sync if worker_pool.uses_processes else get_nlp_engine().analyze_batch
+        _micro_batcher = NLPMicroBatcher(worker_pool, analyze_batch)
+    return _micro_batcher
 
 class NLPService:
-    def __init__(self):
-        self.nlp = spacy.load("en_core_web_sm")
-        self.nltk_analyzer = NLTKAnalyzer()
-        self.vader_analyzer = VaderAnalyzer()
+    def __init__(
+        self,
+        engine: Optional[NLPEngine] = None,
+        worker_pool: Optional["NLPWorkerPool"] = None,
+        cache: Optional[AnalysisCache] = None
+    ):
+        self.engine = engine or get_nlp_engine()
+        self.nlp = self.engine.nlp
+        self.sentiment_backend = self.engine.sentiment_backend
+        self.worker_pool = worker_pool or get_nlp_worker_pool()
+        self.cache = cache or get_analysis_cache()
+        # Worker processes can't share this engine, so they analyze with their own copy
+        if self.worker_pool.uses_processes:
+            self._analyze, self._analyze_batch, self._sentiment = analyze_text_sync, analyze_batch_sync, sentiment_sync
+            self._entities = entities_sync
+        else:
+            self._analyze, self._analyze_batch = self.engine.analyze, self.engine.analyze_batch
+            self._entities = self.engine.entities
+            self._sentiment = self.sentiment_backend.polarity_scores
+        # The shared micro-batcher is bound to the default engine and pool
+        self.batcher = get_nlp_micro_batcher() if engine is None and worker_pool is None else None
+
+    def _cache_key(self, kind: str, text: str) -> str:
+        # Results depend on the model and sentiment backend, so both are part of the key
+        return AnalysisCache.make_key(f"{kind}:{self.engine.model_name}:{self.sentiment_backend.name}", text)
+
+    async def _store_analysis(self, text: str, analysis: Dict[str, Any]) -> None:
+        await self.cache.set(self._cache_key("analysis", text), analysis)
+        # Sub-results are derived from the full analysis, so they only go to the local tier
+        self.cache.set_local(self._cache_key("entities", text), analysis["entities"])
+        self.cache.set_local(self._cache_key("sentiment", text), analysis["sentiment"])
 
     async def analyze_text(self, text: str) -> Dict[str, Any]:
+        cached = await self.cache.get(self._cache_key("analysis", text))
+        if cached is not None:
+            return cached
         try:
-            doc = self.nlp(text)
-            tokens: List[Tuple[str, str]] = [(token.text, token.pos_) for token in doc]
-            nltk_sentiment: dict = self.nltk_analyzer.polarity_scores(text)
-            vader_sentiment: dict = self.vader_analyzer.polarity_scores(text)
-            entities: List[Tuple[str, str]] = [(ent.text, ent.label_) for ent in doc.ents]
-            
-            # Determine overall sentiment
-            compound_score = vader_sentiment['compound']
-            if compound_score >= 0.05:
-                overall_sentiment = "positive"
-            elif compound_score <= -0.05:
-                overall_sentiment = "negative"
+            if self.batcher is not None:
+                analysis = await self.batcher.analyze(text)
             else:
-                overall_sentiment = "neutral"
-
-            return {
-                "tokens": tokens,
-                "nltk_sentiment": nltk_sentiment,
-                "vader_sentiment": vader_sentiment,
-                "overall_sentiment": overall_sentiment,
-                "entities": entities,
-                "primary_conversation_intent": self.extract_primary_intent(doc),
-                "action_items": self.extract_action_items(doc)
-            }
+                analysis = await self.worker_pool.run(self._analyze, text)
+            await self._store_analysis(text, analysis)
+            return analysis
+        except asyncio.TimeoutError:
+            logging.warning(f"Text analysis timed out after {self.worker_pool.timeout}s")
+            raise
         except Exception as e:
             logging.exception(f"Error during text analysis: {str(e)}")
             raise
 
+    async def analyze_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """
+        Analyze a list of texts in a single worker call.
+
+        Args:
+            texts (List[str]): The texts to analyze, e.g. a page of stored messages.
+
+        Returns:
+            List[Dict[str, Any]]: One analysis per text, in the same order as analyze_text returns them.
+        """
+        if not texts:
+            return []
+        results: List[Optional[Dict[str, Any]]] = [
+            await self.cache.get(self._cache_key("analysis", text)) for text in texts
+        ]
+        missing = [index for index, result in enumerate(results) if result is None]
+        if not missing:
+            return results
+        try:
+            analyses = await self.worker_pool.run(self._analyze_batch, [texts[index] for index in missing])
+            for index, analysis in zip(missing, analyses):
+                results[index] = analysis
+                await self._store_analysis(texts[index], analysis)
+            return results
+        except asyncio.TimeoutError:
+            logging.warning(f"Batch analysis of {len(texts)} texts timed out after {self.worker_pool.timeout}s")
+            raise
+        except Exception as e:
+            logging.exception(f"Error during batch text analysis: {str(e)}")
+            raise
+
     def extract_primary_intent(self, doc: spacy.tokens.Doc) -> str:
-        # Implement intent extraction logic
-        # This is a placeholder implementation
-        return "general_inquiry"
+        return self.engine.extract_primary_intent(doc)
 
     def extract_action_items(self, doc: spacy.tokens.Doc) -> List[str]:
-        # Implement action item extraction logic
-        # This is a placeholder implementation
-        return []
+        return self.engine.extract_action_items(doc)
 
     async def analyze_user_input(self, messages: List[Message]) -> Dict[str, Any]:
         try:
@@ -66,21 +447,48 @@ class NLPService:
         # This is a placeholder implementation
         return ["machine learning", "natural language processing"]
 
-    def recognize_entities(self, text: str) -> List[Tuple[str, str]]:
+    async def recognize_entities(self, text: str) -> List[Tuple[str, str]]:
+        key = self._cache_key("entities", text)
+        cached = self.cache.lookup(key)
+        if cached is not None:
+            return cached
         try:
-            doc = self.nlp(text)
-            entities: List[Tuple[str, str]] = [(ent.text, ent.label_) for ent in doc.ents]
+            entities: List[Tuple[str, str]] = await self.worker_pool.run(self._entities, text)
+            self.cache.set_local(key, entities)
             return entities
+        except asyncio.TimeoutError:
+            logging.warning(f"Named entity recognition timed out after {self.worker_pool.timeout}s")
+            raise
         except Exception as e:
             logging.exception(f"Error during named entity recognition: {str(e)}")
             raise
+
+    async def analyze_sentiment(self, text: str) -> Dict[str, float]:
+        """
+        Score the sentiment of text without running the spaCy pipeline.
+
+        Args:
+            text (str): The text to score.
+
+        Returns:
+            Dict[str, float]: neg/neu/pos/compound scores from the configured backend.
+        """
+        key = self._cache_key("sentiment", text)
+        cached = await self.cache.get(key)
+        if cached is not None:
+            return cached
+        try:
+            sentiment = await self.worker_pool.run(self._sentiment, text)
+            await self.cache.set(key, sentiment)
+            return sentiment
+        except Exception as e:
+            logging.exception(f"Error during sentiment analysis: {str(e)}")
+            raise
         
     def adjust_response_based_on_sentiment(self, sentiment_results: Dict[str, Any], temperature: float) -> float:
         logging.info(f"Sentiment analysis results: {sentiment_results}")
-        compound_score = sentiment_results['vader_sentiment']['compound']
-        nltk_compound_score = sentiment_results['nltk_sentiment']['compound']
-        
-        combined_score = (compound_score + nltk_compound_score) / 2
+        # In ensemble mode the backend has already averaged its members
+        combined_score = sentiment_results['sentiment']['compound']
 
         if combined_score <= -0.5:
             return 0.3  # Set to exactly 0.3 for highly negative sentiment
@@ -0,0 +1,89 @@
+# app/services/nlp/sentiment.py
+
+from abc import ABC, abstractmethod
+from typing import Dict, List
+
+SCORE_KEYS = ("neg", "neu", "pos", "compound")
+
+class SentimentBackend(ABC):
+    """A sentiment scorer returning VADER-style neg/neu/pos/compound scores."""
+
+    name: str = "base"
+
+    @abstractmethod
+    def polarity_scores(self, text: str) -> Dict[str, float]:
+        """
+        Score a single text.
+
+        Args:
+            text (str): The text to score.
+
+        Returns:
+            Dict[str, float]: Scores keyed by "neg", "neu", "pos" and "compound".
+        """
+
+    def polarity_scores_batch(self, texts: List[str]) -> List[Dict[str, float]]:
+        """Score several texts. Backends with a faster bulk path can override this."""
+        return [self.polarity_scores(text) for text in texts]
+
+class VaderSentimentBackend(SentimentBackend):
+    """The standalone vaderSentiment package, which bundles its own lexicon."""
+
+    name = "vader"
+
+    def __init__(self):
+        from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+        self.analyzer = SentimentIntensityAnalyzer()
+
+    def polarity_scores(self, text: str) -> Dict[str, float]:
+        return self.analyzer.polarity_scores(text)
+
+class NLTKVaderBackend(SentimentBackend):
+    """NLTK's port of VADER. Needs the vader_lexicon NLTK data package."""
+
+    name = "nltk"
+
+    def __init__(self):
+        from nltk.sentiment import SentimentIntensityAnalyzer
+        self.analyzer = SentimentIntensityAnalyzer()
+
+    def polarity_scores(self, text: str) -> Dict[str, float]:
+        return self.analyzer.polarity_scores(text)
+
+class EnsembleSentimentBackend(SentimentBackend):
+    """Averages the scores of several backends."""
+
+    name = "ensemble"
+
+    def __init__(self, backends: List[SentimentBackend]):
+        if not backends:
+            raise ValueError("An ensemble needs at least one sentiment backend")
+        self.backends = backends
+
+    def polarity_scores(self, text: str) -> Dict[str, float]:
+        results = [backend.polarity_scores(text) for backend in self.backends]
+        return {key: sum(result[key] for result in results) / len(results) for key in SCORE_KEYS}
+
+SENTIMENT_BACKENDS = {
+    VaderSentimentBackend.name: VaderSentimentBackend,
+    NLTKVaderBackend.name: NLTKVaderBackend,
+}
+
+def create_sentiment_backend(name: str) -> SentimentBackend:
+    """
+    Build a sentiment backend by name.
+
+    Args:
+        name (str): "vader", "nltk", or "ensemble" for the average of both.
+
+    Returns:
+        SentimentBackend: The requested backend.
+
+    Raises:
+        ValueError: If the name is unknown.
+    """
+    if name == EnsembleSentimentBackend.name:
+        return EnsembleSentimentBackend([backend() for backend in SENTIMENT_BACKENDS.values()])
+    if name not in SENTIMENT_BACKENDS:
+        raise ValueError(f"Unknown sentiment backend '{name}'. Expected one of: {', '.join([*SENTIMENT_BACKENDS, EnsembleSentimentBackend.name])}")
+    return SENTIMENT_BACKENDS[name]()
\ No newline at end of file
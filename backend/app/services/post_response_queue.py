@@ -0,0 +1,273 @@
+# app/services/post_response_queue.py
+
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+from app.core.config import settings
+
+# Handles every payload of one kind in a batch. Returns None if all were applied, or one
+# entry per payload: the exception it failed with, or None if it was applied. Raising
+# fails every payload in the call, so a handler that raises must have applied none.
+BatchHandler = Callable[[List[Any]], Awaitable[Optional[List[Optional[Exception]]]]]
+
+@dataclass
+class PostResponseJob:
+    kind: str
+    payload: Any
+    # Jobs with the same kind and key are applied in submission order, e.g. one user's turns
+    key: Optional[Hashable] = None
+    attempts: int = 0
+    enqueued_at: float = field(default_factory=time.time)
+
+class PostResponseQueue:
+    """
+    Bounded in-process queue for side effects that do not need to finish before a reply is sent.
+
+    Request handlers `submit` a job and return. A single worker takes jobs in arrival
+    order, waits up to `batch_window` seconds for more to arrive, groups them by kind
+    and hands each group to that kind's handler in one call. When the queue is full,
+    `submit` waits for room instead of dropping the job, so a lane is never overtaken
+    and the job still gets its retries; with no worker running it applies what is
+    queued, then the job, itself.
+
+    Handlers report failures per payload, and only the jobs that failed are retried,
+    with exponential backoff; jobs that fail `max_attempts` times go to the dead-letter
+    log. Jobs sharing a key form a lane: a handler call never sees two jobs from the
+    same lane, and while a lane's job waits for its retry, later jobs in that lane are
+    held behind it, so a lane is always applied in order.
+    """
+
+    def __init__(
+        self,
+        max_size: int = settings.POST_RESPONSE_QUEUE_SIZE,
+        batch_size: int = settings.POST_RESPONSE_BATCH_SIZE,
+        batch_window: float = settings.POST_RESPONSE_BATCH_WINDOW_MS / 1000,
+        max_attempts: int = settings.POST_RESPONSE_MAX_ATTEMPTS,
+        retry_delay: float = settings.POST_RESPONSE_RETRY_DELAY,
+        dead_letter_path: Optional[str] = settings.POST_RESPONSE_DEAD_LETTER_PATH or None
+    ):
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.dead_letter_path = dead_letter_path
+        self._queue: "asyncio.Queue[PostResponseJob]" = asyncio.Queue(maxsize=max_size)
+        self._handlers: Dict[str, BatchHandler] = {}
+        # Lane -> a failed job followed by the lane's jobs that arrived after it, and when to retry them
+        self._held: Dict[Hashable, List[PostResponseJob]] = {}
+        self._retry_at: Dict[Hashable, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.submitted = 0
+        self.processed = 0
+        self.batches = 0
+        self.inline = 0
+        self.blocked = 0
+        self.retries = 0
+        self.failures = 0
+        self.dead_lettered = 0
+
+    def register(self, kind: str, handler: BatchHandler) -> None:
+        self._handlers[kind] = handler
+
+    async def submit(self, kind: str, payload: Any, key: Optional[Hashable] = None) -> None:
+        """Queue a side effect; if the queue is full, wait for room rather than lose it."""
+        if kind not in self._handlers:
+            raise ValueError(f"No post-response handler registered for '{kind}'")
+        job = PostResponseJob(kind, payload, key)
+        self.submitted += 1
+        try:
+            self._queue.put_nowait(job)
+            return
+        except asyncio.QueueFull:
+            pass
+        if self._task is not None and not self._task.done():
+            # Running the job here could overtake its lane's queued or held jobs
+            self.blocked += 1
+            await self._queue.put(job)
+        else:
+            # Nothing would ever make room; apply the queue in order, then this job
+            self.inline += 1
+            await self._process(self._drain(self._queue.qsize()) + [job], retry=False)
+
+    @staticmethod
+    def _lane(job: PostResponseJob) -> Hashable:
+        # Unkeyed jobs are each their own lane
+        return (job.kind, job.key if job.key is not None else id(job))
+
+    async def _process(self, jobs: List[PostResponseJob], retry: bool = True) -> None:
+        """Run jobs in rounds holding at most one job per lane, holding back lanes that have failed."""
+        pending = jobs
+        while pending:
+            batch: List[PostResponseJob] = []
+            later: List[PostResponseJob] = []
+            lanes = set()
+            for job in pending:
+                lane = self._lane(job)
+                if lane in self._held:
+                    self._held[lane].append(job)
+                elif lane in lanes:
+                    later.append(job)
+                else:
+                    lanes.add(lane)
+                    batch.append(job)
+            by_kind: Dict[str, List[PostResponseJob]] = {}
+            for job in batch:
+                by_kind.setdefault(job.kind, []).append(job)
+            for kind, group in by_kind.items():
+                await self._run_handler(kind, group, retry)
+            pending = later
+
+    async def _run_handler(self, kind: str, group: List[PostResponseJob], retry: bool) -> None:
+        self.batches += 1
+        try:
+            errors = await self._handlers[kind]([job.payload for job in group])
+        except Exception as e:
+            errors = [e] * len(group)
+        for job, error in zip(group, errors or [None] * len(group)):
+            if error is None:
+                self.processed += 1
+                continue
+            self.failures += 1
+            job.attempts += 1
+            logging.warning(f"Post-response '{kind}' job failed (attempt {job.attempts}): {error}")
+            if retry and job.attempts < self.max_attempts:
+                self._hold(job)
+            else:
+                self._dead_letter(job, error)
+
+    def _hold(self, job: PostResponseJob) -> None:
+        """Park a failed job, and every later job in its lane, until its retry is due."""
+        self.retries += 1
+        lane = self._lane(job)
+        self._held[lane] = [job]
+        self._retry_at[lane] = time.monotonic() + self.retry_delay * 2 ** (job.attempts - 1)
+
+    def _due_retries(self, now: float) -> List[PostResponseJob]:
+        """Release every lane whose retry is due, each still in order."""
+        jobs = []
+        for lane, retry_at in list(self._retry_at.items()):
+            if retry_at <= now:
+                del self._retry_at[lane]
+                jobs.extend(self._held.pop(lane))
+        return jobs
+
+    def _dead_letter(self, job: PostResponseJob, error: Exception) -> None:
+        self.dead_lettered += 1
+        logging.error(f"Giving up on '{job.kind}' job after {job.attempts} attempts: {error}")
+        if not self.dead_letter_path:
+            return
+        record = {
+            "kind": job.kind,
+            "key": job.key,
+            "payload": job.payload,
+            "attempts": job.attempts,
+            "error": str(error),
+            "enqueued_at": job.enqueued_at,
+            "failed_at": time.time(),
+        }
+        try:
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, default=repr) + "\n")
+        except OSError as e:
+            logging.error(f"Failed to write post-response dead letter: {e}")
+
+    def _drain(self, limit: int) -> List[PostResponseJob]:
+        jobs = []
+        while len(jobs) < limit:
+            try:
+                jobs.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return jobs
+
+    async def _next_job(self) -> Optional[PostResponseJob]:
+        """Wait for a job, or until the next retry is due."""
+        if not self._retry_at:
+            return await self._queue.get()
+        timeout = min(self._retry_at.values()) - time.monotonic()
+        if timeout <= 0:
+            return self._drain(1)[0] if not self._queue.empty() else None
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def _run(self) -> None:
+        while True:
+            job = await self._next_job()
+            jobs = [job] if job is not None else []
+            if jobs and self.batch_window > 0 and self._queue.qsize() < self.batch_size - 1:
+                # Give concurrent requests a moment to add to the batch
+                await asyncio.sleep(self.batch_window)
+            jobs.extend(self._drain(self.batch_size - len(jobs)))
+            # Retried jobs go first; they are older than anything else in their lane
+            jobs = self._due_retries(time.monotonic()) + jobs
+            try:
+                await self._process(jobs)
+            except Exception as e:
+                logging.error(f"Post-response worker error: {e}", exc_info=True)
+
+    def start(self) -> None:
+        """Start the background worker."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the worker, then run whatever is still queued or waiting to be retried once."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        held = [job for jobs in self._held.values() for job in jobs]
+        self._held.clear()
+        self._retry_at.clear()
+        await self._process(held, retry=False)
+        while not self._queue.empty():
+            await self._process(self._drain(self.batch_size), retry=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize(),
+            "max_size": self._queue.maxsize,
+            "retrying_lanes": len(self._held),
+            "held": sum(len(jobs) for jobs in self._held.values()),
+            "submitted": self.submitted,
+            "processed": self.processed,
+            "batches": self.batches,
+            "inline": self.inline,
+            "blocked": self.blocked,
+            "retries": self.retries,
+            "failures": self.failures,
+            "dead_lettered": self.dead_lettered,
+        }
+
+def create_post_response_queue(context_manager: Any) -> PostResponseQueue:
+    """
+    Build the queue for the chat endpoints' bookkeeping.
+
+    "context" jobs are `(user_id, messages)` pairs keyed by user ID, applied to the
+    context manager in order per user. Each update is tried on its own, so one failing
+    does not re-apply the others on retry. Retrying a failed update is safe: appending
+    to the context store is its only I/O and happens, atomically, before anything else
+    changes. Interactions are not queued here; the InteractionRecorder buffers them.
+    """
+    queue = PostResponseQueue()
+
+    async def update_contexts(updates: List[Tuple[str, List[Any]]]) -> List[Optional[Exception]]:
+        errors: List[Optional[Exception]] = []
+        for user_id, messages in updates:
+            try:
+                await context_manager.update_context(user_id, messages)
+                errors.append(None)
+            except Exception as e:
+                errors.append(e)
+        return errors
+
+    queue.register("context", update_contexts)
+    return queue
@@ -0,0 +1,36 @@
+# app/services/redis_client.py
+
+import logging
+from typing import Any, Optional
+from app.core.config import settings
+
+_redis: Optional[Any] = None
+
+def get_redis() -> Any:
+    """
+    Return the process-wide asyncio Redis client for settings.REDIS_URL.
+
+    The redis package is only needed when a Redis-backed feature is enabled, so it is
+    imported here rather than at module level.
+
+    Raises:
+        RuntimeError: If REDIS_URL is not set or the redis package is not installed.
+    """
+    global _redis
+    if _redis is None:
+        if not settings.REDIS_URL:
+            raise RuntimeError("REDIS_URL must be set to use a Redis-backed store")
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("The 'redis' package is required for Redis-backed stores") from e
+        _redis = redis.from_url(settings.REDIS_URL)
+        logging.info("Created shared Redis client")
+    return _redis
+
+async def close_redis() -> None:
+    """Close the shared Redis client if one was created."""
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
\ No newline at end of file
@@ -0,0 +1,76 @@
+# app/utils/stage_timings.py
+
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Dict, Iterator, TypeVar
+
+T = TypeVar("T")
+
+class StageTimings:
+    """
+    Wall-clock duration of each stage of one request.
+
+    Stages that run concurrently overlap in time, so their durations add up to more
+    than the request took; comparing each stage with the total shows which ones are
+    on the critical path.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - started
+
+    async def timed(self, name: str, awaitable: Awaitable[T]) -> T:
+        """Await `awaitable` as the stage `name`; handy inside `asyncio.gather`."""
+        with self.stage(name):
+            return await awaitable
+
+    @property
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """The stages as a Server-Timing header value, in milliseconds."""
+        metrics = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages.items()]
+        metrics.append(f"total;dur={self.total * 1000:.1f}")
+        return ", ".join(metrics)
+
+class StageStats:
+    """Per-stage totals across requests."""
+
+    def __init__(self):
+        self.requests = 0
+        self.total_seconds = 0.0
+        self._stages: Dict[str, Dict[str, float]] = {}
+
+    def record(self, timings: StageTimings) -> None:
+        self.requests += 1
+        self.total_seconds += timings.total
+        for name, seconds in timings.stages.items():
+            stage = self._stages.setdefault(name, {"count": 0, "seconds": 0.0, "max_seconds": 0.0})
+            stage["count"] += 1
+            stage["seconds"] += seconds
+            stage["max_seconds"] = max(stage["max_seconds"], seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "avg_total_ms": round(self.total_seconds / self.requests * 1000, 2) if self.requests else None,
+            "stages": {
+                name: {
+                    "count": int(stage["count"]),
+                    "avg_ms": round(stage["seconds"] / stage["count"] * 1000, 2),
+                    "max_ms": round(stage["max_seconds"] * 1000, 2),
+                }
+                for name, stage in self._stages.items()
+            },
+        }
+
+chat_stage_stats = StageStats()
\ No newline at end of file
@@ -1,4 +1,7 @@
 import re
+from app.utils.text_processing import PHRASES_TO_REMOVE, post_process_response
+
+ANSWERING_MARKER = "(Answering the user with"
 
 def clean_ai_response(response: str) -> str:
     # Remove the "(Answering the user with" part and anything after it
@@ -21,4 +24,85 @@ def clean_ai_response(response: str) -> str:
     # Remove extra whitespace
     response = ' '.join(response.split())
     
-    return response.strip()
\ No newline at end of file
+    return response.strip()
+
+class StreamingResponseCleaner:
+    """
+    Apply clean_ai_response and post_process_response to a response that arrives in pieces.
+
+    Incoming deltas are kept in a rolling buffer. Whenever the buffer contains a word
+    boundary that none of the cleaning rules can straddle, the text before it is cleaned
+    and released; the rest stays buffered. Call flush() when the stream ends.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.has_emitted = False
+        self.stopped = False
+
+    def feed(self, delta: str) -> str:
+        """
+        Add a streamed delta and return the cleaned text that is safe to send.
+
+        Args:
+            delta (str): The next piece of raw model output.
+
+        Returns:
+            str: Cleaned text to forward to the client, possibly empty.
+        """
+        if self.stopped:
+            return ""
+        self.buffer += delta
+
+        marker_index = self.buffer.find(ANSWERING_MARKER)
+        if marker_index != -1:
+            # Everything from the marker on is discarded, so the stream is effectively over
+            self.buffer = self.buffer[:marker_index]
+            self.stopped = True
+            return self.flush()
+
+        boundary = self._safe_boundary()
+        if boundary <= 0:
+            return ""
+        segment, self.buffer = self.buffer[:boundary], self.buffer[boundary:]
+        return self._clean_segment(segment)
+
+    def flush(self) -> str:
+        """Clean and return whatever is still buffered."""
+        segment, self.buffer = self.buffer, ""
+        return self._clean_segment(segment)
+
+    def _safe_boundary(self) -> int:
+        buffer = self.buffer
+        boundary = max(buffer.rfind(" "), buffer.rfind("\n"), buffer.rfind("\t"))
+
+        moved = True
+        while boundary > 0 and moved:
+            moved = False
+            # Never cut inside a parenthetical, even one closed after the boundary; it is removed as a whole
+            open_paren = buffer.rfind("(", 0, boundary)
+            if open_paren != -1 and buffer.find(")", open_paren, boundary) == -1:
+                boundary = open_paren
+            # Hold back a phrase post_process_response strips if it crosses the boundary
+            for phrase in PHRASES_TO_REMOVE:
+                for start in range(max(0, boundary - len(phrase) + 1), boundary):
+                    tail = buffer[start:start + len(phrase)]
+                    if phrase.startswith(tail) or tail == phrase:
+                        boundary = start
+                        moved = True
+                        break
+            # Hold back a lone symbol that could still turn out to sit between two words
+            lone_symbol = re.search(r'\s[^a-zA-Z\s]$', buffer[:boundary])
+            if lone_symbol:
+                boundary = lone_symbol.start()
+                moved = True
+        return boundary
+
+    def _clean_segment(self, segment: str) -> str:
+        cleaned = post_process_response(clean_ai_response(segment))
+        if not cleaned:
+            return ""
+        if self.has_emitted:
+            cleaned = f" {cleaned}"
+        self.has_emitted = True
+        return cleaned
\ No newline at end of file
@@ -1,11 +1,12 @@
+PHRASES_TO_REMOVE = [
+    "As an AI language model,",
+    "As an AI assistant,",
+    "I'm an AI, so",
+    "I don't have personal experiences,",
+    "I don't have feelings,"
+]
+
 def post_process_response(response: str) -> str:
-    phrases_to_remove = [
-        "As an AI language model,",
-        "As an AI assistant,",
-        "I'm an AI, so",
-        "I don't have personal experiences,",
-        "I don't have feelings,"
-    ]
-    for phrase in phrases_to_remove:
+    for phrase in PHRASES_TO_REMOVE:
         response = response.replace(phrase, "")
     return response.strip()
\ No newline at end of file
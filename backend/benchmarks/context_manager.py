@@ -0,0 +1,98 @@
+# benchmarks/context_manager.py
+"""
+Cost of ChatContextManager updates and reads across many active users.
+
+Every user is filled to a full context window first, then each round adds one
+message per user and reads every context back. The eager decay loop the manager
+used to run (copy the queue, decay every message, deque.remove the stale ones)
+is timed on the same workload for comparison.
+
+Pass --store redis to run against the shared store configured by REDIS_URL.
+
+Run from backend/: python -m benchmarks.context_manager [--users N] [--rounds N] [--window N] [--store memory|redis]
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from collections import deque
+from typing import Dict, List
+from app.schemas.schemas import MessageRead
+from app.services.chat.context_manager import ChatContextManager
+from app.services.chat.context_store import create_context_store
+
+def make_message(user_id: str, timestamp: float) -> MessageRead:
+    return MessageRead(
+        id=str(uuid.uuid4()),
+        role="user",
+        content="How was your day?",
+        user_id=user_id,
+        timestamp=timestamp,
+        relevance=1.0
+    )
+
+def eager_update(contexts: Dict[str, deque], user_id: str, new_messages: List[MessageRead], window: int) -> None:
+    """The previous update path: decay and sweep the whole queue on every call."""
+    context_queue = contexts.setdefault(user_id, deque())
+    current_time = time.time()
+    for msg in list(context_queue):
+        age_seconds = current_time - msg.timestamp
+        if age_seconds >= 900:
+            context_queue.remove(msg)
+            continue
+        msg.relevance -= 0.05 * (age_seconds / 60)
+        if msg.relevance <= 0.1:
+            context_queue.remove(msg)
+    context_queue.extend(new_messages)
+    while len(context_queue) > window:
+        context_queue.popleft()
+
+async def run(users: int, rounds: int, window: int, store: str) -> None:
+    user_ids = [f"user-{i}" for i in range(users)]
+    now = time.time()
+    # Spread the prefill over the last few seconds so nothing has decayed away yet
+    prefill = {user_id: [make_message(user_id, now - (window - i) * 0.01) for i in range(window)] for user_id in user_ids}
+
+    manager = ChatContextManager(create_context_store(store), max_length=window)
+    for user_id in user_ids:
+        await manager.store.clear(user_id)
+        await manager.update_context(user_id, prefill[user_id])
+    eager_contexts: Dict[str, deque] = {}
+    for user_id in user_ids:
+        eager_update(eager_contexts, user_id, [m.model_copy() for m in prefill[user_id]], window)
+
+    fresh = [[make_message(user_id, now) for user_id in user_ids] for _ in range(rounds)]
+    operations = users * rounds
+
+    started = time.perf_counter()
+    for batch in fresh:
+        for user_id, message in zip(user_ids, batch):
+            await manager.update_context(user_id, [message])
+    update_us = (time.perf_counter() - started) / operations * 1_000_000
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for user_id in user_ids:
+            await manager.get_context(user_id)
+    read_us = (time.perf_counter() - started) / operations * 1_000_000
+
+    started = time.perf_counter()
+    for batch in fresh:
+        for user_id, message in zip(user_ids, batch):
+            eager_update(eager_contexts, user_id, [message.model_copy()], window)
+    eager_us = (time.perf_counter() - started) / operations * 1_000_000
+
+    print(f"{users} users x {rounds} rounds, {window}-message window, {store} store")
+    print(f"{'update (lazy decay)':<24} {update_us:>10.1f} us/op")
+    print(f"{'update (eager decay)':<24} {eager_us:>10.1f} us/op")
+    print(f"{'get_context':<24} {read_us:>10.1f} us/op")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cost of ChatContextManager updates and reads across many active users.")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--window", type=int, default=100)
+    parser.add_argument("--store", choices=["memory", "redis"], default="memory")
+    args = parser.parse_args()
+    asyncio.run(run(args.users, args.rounds, args.window, args.store))
\ No newline at end of file
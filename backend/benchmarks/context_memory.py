@@ -0,0 +1,69 @@
+# benchmarks/context_memory.py
+"""
+Per-message memory footprint of the objects chat context can be held as.
+
+Builds the same N short chat lines as SQLAlchemy `Message` instances, pydantic
+`MessageRead` objects and slotted `ContextRecord`s, and measures with tracemalloc
+what each representation allocates per message. Message text is allocated
+separately beforehand, so only the per-object overhead and ids are counted.
+
+Run from backend/: python -m benchmarks.context_memory [--messages N] [--users N]
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+import uuid
+from typing import Callable, List
+from app.models.messages import Message
+from app.schemas.schemas import MessageRead
+from app.services.chat.context_record import ContextRecord
+
+def measure(build: Callable[[], List[object]]) -> float:
+    """Bytes allocated per object by `build`, which must keep everything it creates reachable."""
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    objects = build()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (after - before) / len(objects)
+
+def run(messages: int, users: int) -> None:
+    now = time.time()
+    contents = [f"How was your day? ({i})" for i in range(messages)]
+    user_ids = [str(uuid.uuid4()) for _ in range(users)]
+    rows = [
+        (str(uuid.uuid4()), "user" if i % 2 == 0 else "assistant", contents[i], user_ids[i % users], now + i)
+        for i in range(messages)
+    ]
+    # Role and user ID strings usually arrive freshly decoded from JSON or the database, one copy per message
+    fresh = [(id, "".join(role), content, "".join(user_id), timestamp) for id, role, content, user_id, timestamp in rows]
+
+    results = {
+        "Message (ORM)": measure(lambda: [
+            Message(id=id, role=role, content=content, user_id=user_id, timestamp=timestamp, relevance=1.0)
+            for id, role, content, user_id, timestamp in fresh
+        ]),
+        "MessageRead": measure(lambda: [
+            MessageRead(id=id, role=role, content=content, user_id=user_id, timestamp=timestamp, relevance=1.0)
+            for id, role, content, user_id, timestamp in fresh
+        ]),
+        "ContextRecord": measure(lambda: [
+            ContextRecord(id, role, content, user_id, timestamp, 1.0)
+            for id, role, content, user_id, timestamp in fresh
+        ]),
+    }
+
+    print(f"{messages} messages across {users} users (message text excluded)")
+    baseline = results["MessageRead"]
+    for name, per_message in results.items():
+        print(f"{name:<16} {per_message:>8.0f} bytes/message  {per_message / baseline:>5.2f}x MessageRead")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-message memory footprint of chat context representations.")
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=100)
+    args = parser.parse_args()
+    run(args.messages, args.users)
\ No newline at end of file
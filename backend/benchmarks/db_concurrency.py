@@ -0,0 +1,127 @@
+# benchmarks/db_concurrency.py
+"""
+Throughput and event-loop stalls of the chat path's database work under concurrency.
+
+Each simulated request does what chat_endpoint does against the database: look up
+the user, look up the character and record an interaction, on a session of its own.
+The same workload runs three ways:
+
+  sync         the Session-based managers called straight from coroutines, as the
+               endpoint used to, so every query blocks the event loop
+  sync+thread  the Session-based managers in asyncio.to_thread
+  async        the AsyncSession-based managers on the async driver
+
+A ticker coroutine sleeps 1 ms in a loop alongside the requests; how late it wakes
+up is how long other requests on the same loop would have been stalled.
+
+Point it at a local database (the schema is created if missing). Interactions it
+writes are tagged "benchmark" and deleted afterwards.
+
+Run from backend/: python -m benchmarks.db_concurrency [--requests N] [--concurrency N] [--url URL] [--async-url URL]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Awaitable, Callable, List, Tuple
+from sqlalchemy import create_engine, delete
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.config import settings
+from app.models.interaction import Interaction
+from app.services.db.aio import AsyncCharacterDatabase, AsyncInteractionManager, AsyncUserManager
+from app.services.db.character_database import CharacterDatabase
+from app.services.db.database_setup import Base
+from app.services.db.interaction_manager import InteractionManager
+from app.services.db.user_manager import UserManager
+
+TICK = 0.001
+
+async def measure(name: str, requests: int, concurrency: int, handle: Callable[[], Awaitable[None]]) -> None:
+    latencies: List[float] = []
+    stalls: List[float] = []
+    done = asyncio.Event()
+
+    async def ticker() -> None:
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(TICK)
+            stalls.append(time.perf_counter() - started - TICK)
+
+    async def worker(count: int) -> None:
+        for _ in range(count):
+            started = time.perf_counter()
+            await handle()
+            latencies.append(time.perf_counter() - started)
+
+    ticking = asyncio.create_task(ticker())
+    per_worker = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(count) for count in per_worker))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await ticking
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{name:<12} {requests / elapsed:>9.0f} req/s  "
+        f"p50 {statistics.median(latencies) * 1000:>7.2f} ms  p95 {p95 * 1000:>7.2f} ms  "
+        f"loop stall max {max(stalls, default=0.0) * 1000:>7.2f} ms"
+    )
+
+async def run(requests: int, concurrency: int, url: str, async_url: str) -> None:
+    # One pooled connection per concurrent request (SQLite, handy for a quick check, has no pool to size)
+    pool = {} if url.startswith("sqlite") else {"pool_size": concurrency, "max_overflow": 0}
+    engine = create_engine(url, **pool)
+    async_engine = create_async_engine(async_url, **pool)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+    async_session_factory = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    with session_factory() as db:
+        user = UserManager(db).get_or_create_test_user("benchmark", "benchmark", "benchmark@example.com", "benchmark")
+        user_id = user.user_id
+        character_id = CharacterDatabase(db).get_or_create_default_character()
+
+    def sync_request() -> Tuple[object, object, object]:
+        with session_factory() as db:
+            return (
+                UserManager(db).get_user_by_id(user_id),
+                CharacterDatabase(db).get_character_by_id(character_id),
+                InteractionManager(db).create_interaction(user_id, character_id, "benchmark"),
+            )
+
+    async def sync_on_loop() -> None:
+        sync_request()
+
+    async def sync_in_thread() -> None:
+        await asyncio.to_thread(sync_request)
+
+    async def async_request() -> None:
+        async with async_session_factory() as db:
+            await AsyncUserManager(db).get_user_by_id(user_id)
+            await AsyncCharacterDatabase(db).get_character_by_id(character_id)
+            await AsyncInteractionManager(db).create_interaction(user_id, character_id, "benchmark")
+
+    print(f"{requests} requests, {concurrency} concurrent")
+    try:
+        await measure("sync", requests, concurrency, sync_on_loop)
+        await measure("sync+thread", requests, concurrency, sync_in_thread)
+        await measure("async", requests, concurrency, async_request)
+    finally:
+        with session_factory() as db:
+            db.execute(delete(Interaction).where(Interaction.interaction_type == "benchmark"))
+            db.commit()
+        await async_engine.dispose()
+        engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput and event-loop stalls of the chat path's database work under concurrency.")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--url", default=settings.DATABASE_URL, help="Database URL for the sync managers")
+    parser.add_argument("--async-url", default=settings.ASYNC_DATABASE_URL, help="Database URL for the async managers")
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.concurrency, args.url, args.async_url))
\ No newline at end of file
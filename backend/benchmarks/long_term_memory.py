@@ -0,0 +1,67 @@
+# benchmarks/long_term_memory.py
+"""
+Indexing and top-k retrieval cost of LongTermMemory for one heavy user.
+
+Fills a single user's index with synthetic chat messages, then times searches
+against it. Pass --directory to benchmark the memory-mapped variant.
+
+Run from backend/: python -m benchmarks.long_term_memory [--messages N] [--queries N] [--directory PATH]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+from app.services.chat.long_term_memory import LongTermMemory
+
+TOPICS = ["japan", "guitar", "marathon", "sourdough", "python", "garden", "chess", "wedding", "job interview", "puppy"]
+TEMPLATES = [
+    "I have been thinking a lot about {topic} lately.",
+    "Do you remember what I said about {topic} last week?",
+    "My sister keeps asking me about {topic} and I never know what to say.",
+    "Honestly {topic} is the best part of my weekend.",
+    "Can you give me some tips on {topic}?",
+]
+
+def make_messages(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    return [
+        SimpleNamespace(
+            role=rng.choice(["user", "assistant"]),
+            content=f"{rng.choice(TEMPLATES).format(topic=rng.choice(TOPICS))} #{i}",
+            timestamp=float(i)
+        )
+        for i in range(count)
+    ]
+
+async def run(messages: int, queries: int, directory: str) -> None:
+    memory = LongTermMemory(directory=directory or None)
+    corpus = make_messages(messages)
+
+    started = time.perf_counter()
+    for start in range(0, messages, 1000):
+        await memory.add("benchmark-user", corpus[start:start + 1000])
+    index_us = (time.perf_counter() - started) / messages * 1_000_000
+
+    probes = [f"what did I tell you about {TOPICS[i % len(TOPICS)]}?" for i in range(queries)]
+    await memory.search("benchmark-user", probes[0])
+    timings = []
+    for probe in probes:
+        started = time.perf_counter()
+        await memory.search("benchmark-user", probe, k=3, min_score=0.0)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+
+    print(f"{messages} messages, {queries} queries, {'memory-mapped' if directory else 'in-memory'}")
+    print(f"{'index':<10} {index_us:>8.1f} us/message")
+    print(f"{'search p50':<10} {timings[len(timings) // 2]:>8.2f} ms")
+    print(f"{'search p99':<10} {timings[int(len(timings) * 0.99)]:>8.2f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Indexing and top-k retrieval cost of LongTermMemory for one heavy user.")
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--directory", default="")
+    args = parser.parse_args()
+    asyncio.run(run(args.messages, args.queries, args.directory))
\ No newline at end of file
@@ -0,0 +1,44 @@
+# benchmarks/sentiment_backends.py
+"""
+Per-message cost of each sentiment backend.
+
+Run from backend/: python -m benchmarks.sentiment_backends [--messages N]
+"""
+
+import argparse
+import time
+from app.services.nlp.sentiment import SENTIMENT_BACKENDS, EnsembleSentimentBackend, create_sentiment_backend
+
+SAMPLE_MESSAGES = [
+    "hi",
+    "thanks!",
+    "how are you?",
+    "I had a really rough day at work and my boss yelled at me.",
+    "That's hilarious, you always know how to cheer me up :)",
+    "Can you help me plan a trip to Japan next spring?",
+    "I'm not sure this is a good idea, honestly it feels kind of risky.",
+    "WOW this is AMAZING, best news ever!!!",
+]
+
+def run(messages: int) -> None:
+    texts = [SAMPLE_MESSAGES[i % len(SAMPLE_MESSAGES)] for i in range(messages)]
+    print(f"{'backend':<10} {'load ms':>10} {'us/message':>12}")
+    for name in [*SENTIMENT_BACKENDS, EnsembleSentimentBackend.name]:
+        started = time.perf_counter()
+        try:
+            backend = create_sentiment_backend(name)
+        except LookupError:
+            print(f"{name:<10} skipped: NLTK vader_lexicon is not installed")
+            continue
+        load_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        for text in texts:
+            backend.polarity_scores(text)
+        per_message_us = (time.perf_counter() - started) / len(texts) * 1_000_000
+        print(f"{name:<10} {load_ms:>10.1f} {per_message_us:>12.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-message cost of each sentiment backend.")
+    parser.add_argument("--messages", type=int, default=20000)
+    run(parser.parse_args().messages)
\ No newline at end of file
@@ -0,0 +1,26 @@
+# tests/conftest.py
+
+import os
+
+# Settings are read at import time; give the app what it needs without a .env or a downloaded model
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("SPACY_MODEL", "blank:en")
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+import app.models  # noqa: F401  (registers every table on Base.metadata)
+from app.services.db.database_setup import Base
+
+def _enable_foreign_keys(dbapi_connection, _):
+    dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+@pytest.fixture
+async def session_factory(tmp_path):
+    """An AsyncSession factory over a fresh SQLite file that enforces foreign keys like MySQL does."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    event.listen(engine.sync_engine, "connect", _enable_foreign_keys)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
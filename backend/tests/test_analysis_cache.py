@@ -0,0 +1,53 @@
+# tests/test_analysis_cache.py
+
+import json
+from fakeredis import aioredis
+from app.services.nlp.analysis_cache import AnalysisCache
+
+def test_keys_fold_whitespace_but_keep_case():
+    key = AnalysisCache.make_key("analysis", "  Hello   there ")
+    assert key == AnalysisCache.make_key("analysis", "Hello there")
+    assert key != AnalysisCache.make_key("analysis", "hello there")
+    assert key != AnalysisCache.make_key("sentiment", "Hello there")
+
+def test_least_recently_used_entry_is_evicted():
+    cache = AnalysisCache(max_entries=2, ttl=60)
+    cache.set_local("a", 1)
+    cache.set_local("b", 2)
+    assert cache.lookup("a") == 1
+    cache.set_local("c", 3)
+    assert cache.lookup("b") is None and cache.lookup("a") == 1 and cache.lookup("c") == 3
+    stats = cache.stats()
+    assert (stats["evictions"], stats["hits"], stats["misses"]) == (1, 3, 1)
+
+def test_entries_expire_after_the_ttl():
+    cache = AnalysisCache(max_entries=10, ttl=-1)
+    cache.set_local("a", 1)
+    assert cache.get_local("a") is None
+    assert cache.stats()["expirations"] == 1 and cache.stats()["entries"] == 0
+
+async def test_shared_tier_is_read_through_and_written_with_the_ttl():
+    redis = aioredis.FakeRedis()
+    writer = AnalysisCache(max_entries=10, ttl=60, shared=redis)
+    await writer.set("nlp:analysis:k", {"tokens": [["hi", "INTJ"]]})
+    assert 0 < await redis.ttl("nlp:analysis:k") <= 60
+    assert json.loads(await redis.get("nlp:analysis:k")) == {"tokens": [["hi", "INTJ"]]}
+
+    # Another worker finds it in Redis, then serves it locally
+    reader = AnalysisCache(max_entries=10, ttl=60, shared=redis)
+    assert await reader.get("nlp:analysis:k") == {"tokens": [["hi", "INTJ"]]}
+    assert await reader.get("nlp:analysis:k") is not None
+    assert (reader.shared_hits, reader.hits, reader.misses) == (1, 1, 0)
+
+async def test_shared_tier_failures_fall_back_to_a_miss():
+    class BrokenRedis:
+        async def get(self, key):
+            raise ConnectionError("redis is down")
+
+        async def set(self, key, value, ex=None):
+            raise ConnectionError("redis is down")
+
+    cache = AnalysisCache(max_entries=10, ttl=60, shared=BrokenRedis())
+    assert await cache.get("k") is None and cache.misses == 1
+    await cache.set("k", 1)
+    assert await cache.get("k") == 1
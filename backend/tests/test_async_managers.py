@@ -0,0 +1,93 @@
+# tests/test_async_managers.py
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+from app.models.character import Character
+from app.schemas.schemas import UserCreate
+from app.services.characters.character_cache import CharacterCache
+from app.services.db.aio import AsyncAdaptiveTraitManager, AsyncInteractionManager, AsyncUserManager
+from app.services.db.user_cache import UserCache
+
+def _user_manager(db):
+    return AsyncUserManager(db, user_cache=UserCache())
+
+async def test_user_round_trip(session_factory):
+    async with session_factory() as db:
+        manager = _user_manager(db)
+        user = await manager.create_user(UserCreate(username="ana", email="ana@example.com", password="secret123"))
+        assert user.user_id and user.hashed_password != "secret123"
+        assert (await manager.get_user_by_username("ana")).id == user.id
+        assert (await manager.get_user_by_email("ana@example.com")).id == user.id
+        assert await manager.is_username_taken("ana") and not await manager.is_email_taken("bob@example.com")
+
+        assert (await manager.authenticate_user("ana", "secret123")).id == user.id
+        assert await manager.authenticate_user("ana", "wrong") is None
+        await manager.update_user(user.user_id, password="changed1", username="ana2")
+        assert await manager.authenticate_user("ana2", "changed1") is not None
+
+        assert await manager.delete_user(user.user_id)
+        assert not await manager.delete_user(user.user_id)
+        assert await manager.get_all_users() == []
+
+async def test_duplicate_username_is_rejected(session_factory):
+    async with session_factory() as db:
+        manager = _user_manager(db)
+        await manager.create_user(UserCreate(username="ana", email="ana@example.com", password="secret123"))
+        with pytest.raises(IntegrityError):
+            await manager.create_user(UserCreate(username="ana", email="other@example.com", password="secret123"))
+
+async def test_get_or_create_test_user_reuses_the_existing_row(session_factory):
+    async with session_factory() as db:
+        first = await _user_manager(db).get_or_create_test_user("ignored", "tester", "tester@example.com", "password")
+    # A fresh cache has to go to the database, where the username is already taken
+    async with session_factory() as db:
+        second = await _user_manager(db).get_or_create_test_user("ignored", "tester", "tester@example.com", "password")
+        assert second == first
+        assert len(await _user_manager(db).get_all_users()) == 1
+
+async def test_traits_are_upserted_in_one_transaction(session_factory):
+    async with session_factory() as db:
+        user = await _user_manager(db).create_user(UserCreate(username="ana", email="ana@example.com", password="password"))
+        character = Character(name="Friend")
+        db.add(character)
+        await db.commit()
+
+        manager = AsyncAdaptiveTraitManager(db)
+        key = (user.user_id, character.id)
+        assert await manager.get_traits(*key) is None
+        assert await manager.save_traits({}) == 0
+        assert await manager.save_traits({key: {"humor": 0.5}}) == 1
+        assert await manager.save_traits({key: {"humor": 0.25, "empathy": 1.0}}) == 1
+        assert await manager.get_traits(*key) == {"formality": 0.0, "enthusiasm": 0.0, "humor": 0.25, "empathy": 1.0}
+
+async def test_failed_trait_save_is_rolled_back(session_factory):
+    async with session_factory() as db:
+        manager = AsyncAdaptiveTraitManager(db)
+        # Foreign keys are enforced, so a missing user and character fail the insert
+        with pytest.raises(IntegrityError):
+            await manager.save_traits({("nobody", 999): {"humor": 1.0}})
+        assert await manager.get_traits("nobody", 999) is None
+
+async def test_interactions(session_factory):
+    async with session_factory() as db:
+        manager = AsyncInteractionManager(db)
+        manager.character_database.cache = CharacterCache()
+        assert await manager.create_interaction("nobody", None, "chat") is None
+
+        user_id = await manager.get_or_create_test_user()
+        assert await manager.get_or_create_test_user() == user_id
+        assert await manager.get_user_id_by_username("test_user") == user_id
+        assert await manager.get_user_id_by_username("nobody") is None
+
+        # Without a character the default adaptive one is created and reused
+        interaction = await manager.create_interaction(user_id, None, "chat")
+        assert interaction.character_id is not None
+        assert (await manager.create_interaction(user_id, None, "chat")).character_id == interaction.character_id
+
+        updated = await manager.update_interaction(interaction.id, interaction_type="voice")
+        assert updated.interaction_type == "voice"
+        assert await manager.update_interaction(12345, interaction_type="voice") is None
+        assert len(await manager.get_interactions_by_user_id(user_id)) == 2
+        assert await manager.delete_interaction(interaction.id)
+        assert not await manager.delete_interaction(interaction.id)
+        assert await manager.get_interaction_by_id(interaction.id) is None
@@ -0,0 +1,76 @@
+# tests/test_character_cache.py
+
+import pytest
+from sqlalchemy import select, update
+from app.models.character import Character
+from app.services.characters.character_cache import CharacterCache
+from app.services.db.aio.character_database import AsyncCharacterDatabase
+
+@pytest.fixture
+async def make_database(session_factory):
+    sessions = []
+
+    async def make(**kwargs):
+        sessions.append(session_factory())
+        database = AsyncCharacterDatabase(sessions[-1], CharacterCache(**{"check_interval": 0, "max_age": 3600, **kwargs}))
+        await database.populate_characters()
+        return database
+
+    yield make
+    for session in sessions:
+        await session.close()
+
+async def _edit_behind_the_cache(session_factory, character_id, **values):
+    """Change a character the way another worker would, keeping its updated_at."""
+    async with session_factory() as session:
+        updated_at = (await session.scalars(select(Character.updated_at).where(Character.id == character_id))).one()
+        await session.execute(update(Character).where(Character.id == character_id).values(updated_at=updated_at, **values))
+        await session.commit()
+
+async def test_profiles_are_served_from_memory_after_preload(make_database):
+    database = await make_database()
+    character_id = await database.get_or_create_default_character()
+    profile = await database.get_profile(character_id)
+    assert profile is await database.get_profile(character_id)
+    assert database.cache.stats()["misses"] == 0
+
+async def test_own_writes_drop_the_cache(make_database):
+    database = await make_database()
+    character_id = await database.get_or_create_default_character()
+    version, invalidations = database.cache.version, database.cache.invalidations
+    await database.update_character(character_id, name="Renamed")
+    assert database.cache.version > version and database.cache.invalidations == invalidations + 1
+    assert (await database.get_profile(character_id)).name == "Renamed"
+
+async def test_edit_in_the_same_second_is_caught_by_the_stamp(session_factory, make_database):
+    database = await make_database()
+    character_id = await database.get_or_create_default_character()
+    before = (await database.get_profile(character_id)).description
+    await _edit_behind_the_cache(session_factory, character_id, description=before + " Loves chess.")
+
+    assert (await database.get_profile(character_id)).description == before + " Loves chess."
+    assert database.cache.stale_detected == 1
+
+async def test_edit_the_stamp_cannot_see_is_picked_up_after_max_age(session_factory, make_database):
+    database = await make_database(max_age=60)
+    character_id = await database.get_or_create_default_character()
+    profile = await database.get_profile(character_id)
+    # Same length, same second: the stamp does not move
+    await _edit_behind_the_cache(session_factory, character_id, name=profile.name[::-1])
+    assert (await database.get_profile(character_id)).name == profile.name
+
+    database.cache._loaded_at -= 61
+    assert (await database.get_profile(character_id)).name == profile.name[::-1]
+    assert database.cache.expired == 1 and database.cache.stale_detected == 0
+    # The reloaded set is trusted for another max_age
+    assert database.cache.validate(await database._stamp())
+
+async def test_profile_read_across_an_invalidation_is_not_kept(make_database):
+    database = await make_database()
+    character_id = await database.get_or_create_default_character()
+    database.cache.invalidate()
+    version = database.cache.version
+    character = await database.get_character_by_id(character_id)
+    database.cache.invalidate()
+    database.cache.put(character, version)
+    assert database.cache.stats()["profiles"] == 0
@@ -0,0 +1,71 @@
+# tests/test_chat_stream.py
+
+import json
+from app.api.v1.endpoints.chat import stream_chat_response
+from app.services.nlp.casual_conversation_handler import CasualConversation
+
+class FakeStreamingClient:
+    def __init__(self, deltas, fail_after=None):
+        self.deltas = deltas
+        self.fail_after = fail_after
+
+    async def stream_chat_completion(self, messages, **kwargs):
+        for i, delta in enumerate(self.deltas):
+            if i == self.fail_after:
+                raise ConnectionError("LM Studio went away")
+            yield delta
+
+class FakeQueue:
+    def __init__(self):
+        self.jobs = []
+
+    async def submit(self, kind, payload, key=None):
+        self.jobs.append((kind, payload))
+
+class FakeRecorder:
+    def __init__(self):
+        self.events = []
+
+    def record(self, user_id, character_id, interaction_type):
+        self.events.append(interaction_type)
+
+class FakeChatbot:
+    def get_personality_traits(self, user_id):
+        return None
+
+def _handler(deltas, fail_after=None):
+    handler = CasualConversation()
+    handler.lm_client = FakeStreamingClient(deltas, fail_after)
+    return handler
+
+async def _stream(handler):
+    queue, recorder = FakeQueue(), FakeRecorder()
+    events = [event async for event in stream_chat_response(
+        "test-model", "hello there", "u1", 1, [], None, handler, FakeChatbot(), queue, recorder
+    )]
+    assert events[-1] == "data: [DONE]\n\n"
+    chunks = [json.loads(event[len("data: "):]) for event in events[:-1]]
+    content = "".join(chunk["choices"][0]["delta"].get("content", "") for chunk in chunks)
+    return chunks, content, queue, recorder
+
+async def test_complete_stream_is_stored_as_a_turn():
+    chunks, content, queue, recorder = await _stream(_handler(["Hi! ", "Lovely ", "to see you."]))
+    assert content == "Hi! Lovely to see you."
+    assert chunks[-1]["choices"][0]["finish_reason"] == "stop"
+    [(kind, (user_id, messages))] = queue.jobs
+    assert [message.content for message in messages] == ["hello there", "Hi! Lovely to see you."]
+    assert recorder.events == ["chat_completion"]
+
+async def test_failure_after_the_first_token_ends_the_stream_as_an_error():
+    chunks, content, queue, recorder = await _stream(_handler(["Hi! ", "Lovely ", "to see you."], fail_after=2))
+    assert content.startswith("Hi!")
+    assert chunks[-1]["choices"][0]["finish_reason"] == "error"
+    assert chunks[-1]["error"]["type"] == "generation_error"
+    # The partial reply is not stored as a finished turn
+    assert queue.jobs == [] and recorder.events == []
+
+async def test_failure_before_any_output_falls_back_to_the_apology():
+    chunks, content, queue, _ = await _stream(_handler(["Hi!"], fail_after=0))
+    assert content == "I apologize, but I am unable to generate a response at the moment."
+    assert chunks[-1]["choices"][0]["finish_reason"] == "stop"
+    assert len(queue.jobs) == 1
@@ -0,0 +1,39 @@
+# tests/test_chatbot_registry.py
+
+import pytest
+from app.services.ai.chatbot_registry import ChatbotRegistry
+from app.services.ai.trait_store import TraitStore
+from app.services.characters.character_cache import CharacterCache
+from app.services.db.aio.character_database import AsyncCharacterDatabase
+
+@pytest.fixture
+async def character_database(session_factory):
+    async with session_factory() as session:
+        database = AsyncCharacterDatabase(session, CharacterCache(check_interval=0, max_age=3600))
+        await database.populate_characters()
+        yield database
+
+async def test_chatbots_are_shared_across_requests(character_database):
+    registry = ChatbotRegistry(TraitStore())
+    default = await registry.get_chatbot_async(None, character_database)
+    assert await registry.get_chatbot_async(None, character_database) is default
+    assert await registry.get_chatbot_async(default.character.id, character_database) is default
+    # Unknown characters fall back to the default one
+    assert await registry.get_chatbot_async(99999, character_database) is default
+    assert registry.stats()["chatbots"] == 1 and registry.misses == 1
+
+async def test_character_edits_rebuild_the_chatbot(character_database):
+    registry = ChatbotRegistry(TraitStore())
+    chatbot = await registry.get_chatbot_async(None, character_database)
+    await character_database.update_character(chatbot.character.id, description="Now a pirate.")
+    rebuilt = await registry.get_chatbot_async(chatbot.character.id, character_database)
+    assert rebuilt is not chatbot and rebuilt.character.description == "Now a pirate."
+    assert registry.rebuilds == 1
+
+async def test_traits_belong_to_the_user_not_the_shared_chatbot(character_database):
+    registry = ChatbotRegistry(TraitStore())
+    chatbot = await registry.get_chatbot_async(None, character_database)
+    assert chatbot.is_adaptive
+    chatbot.trait_store.apply("alice", chatbot.character.id, {"humor": 0.6})
+    assert chatbot.get_personality_traits("alice")["humor"] == pytest.approx(0.6)
+    assert chatbot.get_personality_traits("bob")["humor"] == 0.0
@@ -0,0 +1,39 @@
+# tests/test_context_manager.py
+
+import time
+import pytest
+from app.services.chat.context_manager import ChatContextManager
+from app.services.chat.context_record import ContextRecord
+from app.services.chat.context_store import InMemoryContextStore
+
+def _record(content, minutes_ago=0.0, relevance=None):
+    return ContextRecord(content, "user", content, "u1", time.time() - minutes_ago * 60, relevance)
+
+async def test_relevance_is_derived_from_age_on_read():
+    manager = ChatContextManager(max_age=3600, decay_rate=0.05)
+    await manager.update_context("u1", [_record("older", minutes_ago=10), _record("new")])
+    older, new = await manager.get_context("u1")
+    assert older.relevance == pytest.approx(0.5, abs=0.01)
+    assert new.relevance == pytest.approx(1.0, abs=0.01)
+    # Nothing is written back; the stored entry keeps its base relevance
+    [stored, _] = await manager.store.read("u1")
+    assert stored.base_relevance == 1.0 and stored.message.relevance is None
+
+async def test_decayed_messages_leave_the_context():
+    manager = ChatContextManager(max_age=3600, decay_rate=0.05)
+    # At 0.05 a minute, a message starting at 1.0 reaches MIN_RELEVANCE after 18 minutes
+    # and one starting at 0.5 after 8
+    await manager.update_context("u1", [
+        _record("too old", minutes_ago=19),
+        _record("weak", minutes_ago=9, relevance=0.5),
+        _record("kept", minutes_ago=9),
+    ])
+    assert [message.content for message in await manager.get_context("u1")] == ["kept"]
+
+async def test_updates_and_reads_are_one_store_call_each():
+    store = InMemoryContextStore()
+    manager = ChatContextManager(store=store, max_age=3600)
+    for i in range(5):
+        await manager.update_context("u1", [_record(f"m{i}")])
+    await manager.get_context("u1")
+    assert (store.appends, store.reads) == (5, 1)
@@ -0,0 +1,40 @@
+# tests/test_context_record.py
+
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from app.schemas.schemas import MessageRead
+from app.services.chat.context_manager import ChatContextManager
+from app.services.chat.context_record import ContextRecord
+
+def test_records_have_slots_and_share_role_and_user_strings():
+    first = ContextRecord("1", "".join(["ass", "istant"]), "hi", "".join(["user", "-1"]), time.time())
+    second = ContextRecord("2", "assistant", "there", "user-1", time.time())
+    assert not hasattr(first, "__dict__")
+    assert first.role is second.role and first.user_id is second.user_id
+
+def test_from_message_converts_schemas_and_orm_shaped_messages():
+    read = MessageRead(id="m1", role="user", content="hello", user_id="u1", timestamp=100.0, relevance=0.5)
+    record = ContextRecord.from_message(read)
+    assert (record.id, record.role, record.content, record.user_id, record.timestamp, record.relevance) == ("m1", "user", "hello", "u1", 100.0, 0.5)
+    assert ContextRecord.from_message(record) is record
+
+    orm_like = SimpleNamespace(id=7, role="user", content="hi", user_id=3, timestamp=datetime.fromtimestamp(200.0), relevance=None)
+    record = ContextRecord.from_message(orm_like)
+    assert (record.id, record.user_id, record.timestamp, record.relevance) == ("7", "3", 200.0, 1.0)
+
+def test_with_relevance_copies_without_touching_the_original():
+    record = ContextRecord("1", "user", "hello", "u1", 100.0)
+    copy = record.with_relevance(0.25)
+    assert copy is not record and copy.content is record.content
+    assert (record.relevance, copy.relevance) == (1.0, 0.25)
+
+async def test_context_reads_never_change_shared_records():
+    manager = ChatContextManager(max_age=3600)
+    record = ContextRecord("1", "user", "hello", "u1", time.time() - 600)
+    await manager.update_context("u1", [record])
+    [read] = await manager.get_context("u1")
+    assert read.relevance < 1.0 and record.relevance == 1.0
+    # The queue and the history hold the same record, not copies
+    [(history_record, _)] = manager.get_conversation_history("u1")
+    assert history_record is record
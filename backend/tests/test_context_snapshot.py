@@ -0,0 +1,150 @@
+# tests/test_context_snapshot.py
+
+import os
+import time
+import pytest
+from app.services.chat import context_snapshot
+from app.services.chat.context_manager import ChatContextManager
+from app.services.chat.context_record import ContextRecord
+from app.services.chat.context_snapshot import SnapshotReader, UserState, decode_state, encode_state, write_snapshot
+from app.services.chat.context_store import ContextEntry
+from app.services.chat.memory_budget import SpillStore
+
+def _record(content, id=None, timestamp=None):
+    return ContextRecord(str(id), "user", content, "u1", timestamp or time.time())
+
+def _state(now, contents=("a1", "a2"), saved_at=0.0):
+    records = [_record(content, timestamp=now) for content in contents]
+    return UserState(
+        context=[ContextEntry(record, 1.0, now + 600) for record in records],
+        idle_until=now + 900,
+        history=[(record, now) for record in records],
+        summary="earlier chat",
+        summary_expires_at=now + 3600,
+        saved_at=saved_at,
+    )
+
+def test_encode_decode_round_trip():
+    now = time.time()
+    state = _state(now, saved_at=now)
+    decoded = decode_state(encode_state(state))
+
+    assert [entry.message.content for entry in decoded.context] == ["a1", "a2"]
+    assert [message.content for message, _ in decoded.history] == ["a1", "a2"]
+    assert [entry.expires_at for entry in decoded.context] == [now + 600] * 2
+    assert (decoded.idle_until, decoded.summary, decoded.summary_expires_at, decoded.saved_at) == (now + 900, "earlier chat", now + 3600, now)
+    # Context and history share records, as in memory, even when messages have no ID
+    assert all(entry.message is message for entry, (message, _) in zip(decoded.context, decoded.history))
+
+def test_large_state_is_compressed():
+    state = _state(time.time(), contents=[f"message {i} " * 20 for i in range(50)])
+    data = encode_state(state)
+    assert data[:1] == b"z"
+    assert len(decode_state(data).history) == 50
+
+def test_decode_accepts_states_without_saved_at():
+    state = _state(time.time())
+    data = encode_state(state)
+    assert decode_state(data).saved_at == 0.0
+
+def test_snapshot_reader_takes_each_user_once(tmp_path):
+    now = time.time()
+    path = str(tmp_path / "contexts.snap")
+    users, size = write_snapshot(path, {"u1": (_state(now), now + 900), "old": (_state(now), now - 1)}, written_at=now)
+    assert users == 2 and size > 0
+
+    reader = SnapshotReader(path)
+    try:
+        assert "u1" in reader and len(reader) == 2
+        assert [user_id for user_id, _, _ in reader.remaining(now)] == ["u1"]
+        assert reader.take("old", now) is None
+        state = reader.take("u1", now)
+        assert [message.content for message, _ in state.history] == ["a1", "a2"]
+        assert reader.take("u1", now) is None
+        assert reader.stats()["restored_users"] == 1
+    finally:
+        reader.close()
+
+async def test_manager_restores_snapshot_lazily(tmp_path):
+    path = str(tmp_path / "contexts.snap")
+    first = ChatContextManager(snapshot_path=path)
+    await first.update_context("u1", [_record("hello", id=1), _record("there", id=2)])
+    await first.update_context("u2", [_record("other", id=3)])
+    await first.save_snapshot()
+
+    second = ChatContextManager(snapshot_path=path)
+    assert second.snapshot is not None and len(second.snapshot) == 2
+    assert "u1" not in second.conversation_history
+
+    context = await second.get_context("u1")
+    assert [message.content for message in context] == ["hello", "there"]
+    assert [message.content for message, _ in second.get_conversation_history("u1")] == ["hello", "there"]
+    # Only the user who was asked for has been decoded
+    assert second.snapshot.stats()["pending_users"] == 1
+
+    # The next snapshot carries the untouched user over, still encoded
+    await second.save_snapshot()
+    third = ChatContextManager(snapshot_path=path)
+    assert [message.content for message in await third.get_context("u2")] == ["other"]
+
+async def test_newest_copy_wins_when_user_is_in_snapshot_and_spill(tmp_path):
+    now = time.time()
+    path = str(tmp_path / "contexts.snap")
+    write_snapshot(path, {"u1": (_state(now, ("old",), saved_at=now - 10), now + 900)}, written_at=now - 10)
+    spill = SpillStore(str(tmp_path / "spill"))
+    spill.write("u1", _state(now, ("old", "new"), saved_at=now), now + 900)
+
+    manager = ChatContextManager(snapshot_path=path, spill=spill)
+    history = manager.get_conversation_history("u1")
+    assert [message.content for message, _ in history] == ["old", "new"]
+    assert [message.content for message in await manager.get_context("u1")] == ["old", "new"]
+    assert "u1" not in spill and "u1" not in manager.snapshot
+
+async def test_snapshot_is_replaced_only_after_its_map_is_closed(tmp_path, monkeypatch):
+    path = str(tmp_path / "contexts.snap")
+    first = ChatContextManager(snapshot_path=path)
+    for user_id in ("u1", "u2", "u3"):
+        await first.update_context(user_id, [_record(f"hello from {user_id}", id=user_id)])
+    await first.save_snapshot()
+
+    second = ChatContextManager(snapshot_path=path)
+    replace = os.replace
+
+    def windows_replace(source, target):
+        # Windows refuses to replace a file that is still mapped
+        if second.snapshot is not None and not second.snapshot._map.closed:
+            raise PermissionError("file is mapped")
+        replace(source, target)
+
+    monkeypatch.setattr(context_snapshot.os, "replace", windows_replace)
+    await second.get_context("u1")
+    await second.save_snapshot()
+    # Users not yet restored are still served from the new file; u1 is not restored twice
+    assert "u1" not in second.snapshot and len(second.snapshot) == 2
+    assert [message.content for message in await second.get_context("u2")] == ["hello from u2"]
+    assert [name for name in os.listdir(tmp_path) if name.startswith(".snapshot-")] == []
+
+    await second.get_context("u3")
+    await second.save_snapshot()
+    assert second.snapshot is None
+    third = ChatContextManager(snapshot_path=path)
+    assert len(third.snapshot) == 3
+
+def test_failed_replace_keeps_the_old_snapshot(tmp_path, monkeypatch):
+    now = time.time()
+    path = str(tmp_path / "contexts.snap")
+    write_snapshot(path, {"u1": (_state(now), now + 900)}, written_at=now)
+    reader = SnapshotReader(path)
+
+    def failing_replace(source, target):
+        raise PermissionError("file is in use")
+
+    temp_path, _, _ = context_snapshot.prepare_snapshot(path, {"u2": (_state(now), now + 900)}, written_at=now)
+    monkeypatch.setattr(context_snapshot.os, "replace", failing_replace)
+    try:
+        with pytest.raises(PermissionError):
+            reader.replace_with(temp_path)
+        assert not os.path.exists(temp_path)
+        assert reader.take("u1") is not None
+    finally:
+        reader.close()
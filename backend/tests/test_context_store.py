@@ -0,0 +1,116 @@
+# tests/test_context_store.py
+
+import asyncio
+import time
+import pytest
+from fakeredis import aioredis
+from app.services.chat.context_record import ContextRecord
+from app.services.chat.context_store import ContextEntry, InMemoryContextStore, RedisContextStore, create_context_store
+
+def _entries(*contents, expires_in=600.0):
+    now = time.time()
+    return [ContextEntry(ContextRecord(content, "user", content, "u1", now), 1.0, now + expires_in) for content in contents]
+
+def _contents(entries):
+    return [entry.message.content for entry in entries]
+
+@pytest.fixture
+def redis_store():
+    return RedisContextStore(aioredis.FakeRedis())
+
+@pytest.fixture(params=["memory", "redis"])
+def store(request):
+    if request.param == "memory":
+        return InMemoryContextStore()
+    return RedisContextStore(aioredis.FakeRedis())
+
+async def test_append_trims_and_hands_back_overflow_once(store):
+    assert await store.append("u1", _entries("m1", "m2"), max_length=3, ttl=60) == []
+    assert _contents(await store.append("u1", _entries("m3", "m4"), max_length=3, ttl=60)) == ["m1"]
+    assert _contents(await store.read("u1")) == ["m2", "m3", "m4"]
+    assert _contents(await store.append("u1", _entries("m5"), max_length=3, ttl=60)) == ["m2"]
+
+async def test_read_many_returns_every_user(store):
+    await store.append("u1", _entries("a"), max_length=10, ttl=60)
+    await store.append("u2", _entries("b", "c"), max_length=10, ttl=60)
+    queues = await store.read_many(["u1", "u2", "u3"])
+    assert {user_id: _contents(entries) for user_id, entries in queues.items()} == {"u1": ["a"], "u2": ["b", "c"], "u3": []}
+
+async def test_summaries_and_clear(store):
+    assert await store.read_summary("u1") is None
+    await store.write_summary("u1", "they like tea", ttl=60)
+    await store.append("u1", _entries("a"), max_length=10, ttl=60)
+    assert await store.read_summary("u1") == "they like tea"
+    await store.clear("u1")
+    assert await store.read("u1") == [] and await store.read_summary("u1") is None
+
+async def test_concurrent_appends_never_lose_or_repeat_entries(store):
+    results = await asyncio.gather(*[
+        store.append("u1", _entries(f"m{i}"), max_length=5, ttl=60) for i in range(20)
+    ])
+    handed_back = [content for evicted in results for content in _contents(evicted)]
+    remaining = _contents(await store.read("u1"))
+    assert len(remaining) == 5
+    assert sorted(handed_back + remaining) == sorted(f"m{i}" for i in range(20))
+
+async def test_redis_queue_ttl_is_refreshed_on_append(redis_store):
+    await redis_store.append("u1", _entries("a"), max_length=10, ttl=30)
+    assert 0 < await redis_store.redis.ttl("ctx:u1") <= 30
+    await redis_store.append("u1", _entries("b"), max_length=10, ttl=300)
+    assert 30 < await redis_store.redis.ttl("ctx:u1") <= 300
+
+async def test_redis_round_trips_relevance_from_base(redis_store):
+    entry = _entries("a")[0]
+    decayed = ContextEntry(entry.message.with_relevance(0.2), 0.9, entry.expires_at)
+    await redis_store.append("u1", [decayed], max_length=10, ttl=60)
+    [stored] = await redis_store.read("u1")
+    assert (stored.base_relevance, stored.message.relevance, stored.expires_at) == (0.9, 0.9, entry.expires_at)
+
+async def test_redis_read_many_is_one_round_trip(redis_store):
+    executed = []
+    pipeline = redis_store.redis.pipeline
+
+    def counting_pipeline(*args, **kwargs):
+        executed.append(kwargs)
+        return pipeline(*args, **kwargs)
+
+    redis_store.redis.pipeline = counting_pipeline
+    await redis_store.read_many([f"u{i}" for i in range(50)])
+    assert executed == [{"transaction": False}]
+    await redis_store.append("u1", _entries("a"), max_length=10, ttl=60)
+    assert executed[-1] == {"transaction": True}
+
+async def test_redis_errors_are_counted_and_raised(redis_store):
+    def broken_pipeline(*args, **kwargs):
+        raise ConnectionError("redis is down")
+
+    redis_store.redis.pipeline = broken_pipeline
+    with pytest.raises(ConnectionError):
+        await redis_store.read("u1")
+    assert redis_store.stats()["errors"] == 1
+
+async def test_memory_store_expires_entries_and_idle_queues():
+    store = InMemoryContextStore()
+    await store.append("u1", _entries("old", expires_in=-1) + _entries("new"), max_length=10, ttl=60)
+    # Decayed entries leave the head on read and are handed back by the next append
+    assert _contents(await store.read("u1")) == ["new"]
+    assert _contents(await store.append("u1", _entries("newer"), max_length=10, ttl=60)) == ["old"]
+
+    idle_until = store._idle_until["u1"]
+    assert await store.expire("u1", idle_until - 1) == idle_until
+    assert await store.expire("u1", idle_until) is None
+    assert store.resident_size("u1") == 0 and store.stats()["expired_queues"] == 1
+
+async def test_memory_store_detach_and_attach_keep_order():
+    store = InMemoryContextStore()
+    await store.append("u1", _entries("a", "b"), max_length=10, ttl=60)
+    entries, idle_until = store.detach("u1")
+    assert store.resident_users() == set()
+    await store.append("u1", _entries("c"), max_length=10, ttl=60)
+    store.attach("u1", entries, idle_until)
+    assert _contents(await store.read("u1")) == ["a", "b", "c"]
+
+def test_create_context_store_by_name():
+    assert isinstance(create_context_store("memory"), InMemoryContextStore)
+    with pytest.raises(ValueError):
+        create_context_store("sqlite")
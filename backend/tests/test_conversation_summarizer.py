@@ -0,0 +1,98 @@
+# tests/test_conversation_summarizer.py
+
+import time
+from types import SimpleNamespace
+from app.core.config import settings
+from app.services.chat.context_manager import ChatContextManager
+from app.services.chat.context_record import ContextRecord
+from app.services.chat.context_store import InMemoryContextStore
+from app.services.chat.conversation_summarizer import ConversationSummarizer
+
+class FakeLMClient:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.requests = []
+
+    async def create_chat_completion(self, messages, **kwargs):
+        self.requests.append(messages)
+        if self.fail:
+            raise ConnectionError("LM Studio is down")
+        return SimpleNamespace(content=f"summary #{len(self.requests)}")
+
+def _messages(*contents, timestamp=None):
+    return [ContextRecord(content, "user", content, "u1", timestamp or time.time()) for content in contents]
+
+def _summarizer(store, lm_client, **kwargs):
+    return ConversationSummarizer(store, lm_client, **{"min_batch": 3, "max_wait": 60, "ttl": 3600, **kwargs})
+
+async def test_batches_are_queued_once_min_batch_builds_up():
+    store = InMemoryContextStore()
+    lm_client = FakeLMClient()
+    summarizer = _summarizer(store, lm_client)
+    summarizer.fold("u1", _messages("a", "b"))
+    assert summarizer.stats()["queued"] == 0
+    summarizer.fold("u1", _messages("c"))
+    summarizer.fold("u1", _messages("d"))
+    assert summarizer.stats()["queued"] == 1
+
+    assert await summarizer.summarize("u1") == "summary #1"
+    assert await store.read_summary("u1") == "summary #1"
+    assert summarizer.stats()["pending_users"] == 0
+    # The previous summary and every buffered message go into the request
+    summarizer.fold("u1", _messages("e", "f", "g"))
+    await summarizer.summarize("u1")
+    prompt = lm_client.requests[-1][1].content
+    assert "summary #1" in prompt and "user: e" in prompt
+
+async def test_failed_summary_keeps_the_messages():
+    lm_client = FakeLMClient(fail=True)
+    summarizer = _summarizer(InMemoryContextStore(), lm_client)
+    summarizer.fold("u1", _messages("a", "b", "c"))
+    assert await summarizer.summarize("u1") is None
+    assert summarizer.stats()["pending_messages"] == 3 and summarizer.failures == 1
+
+    lm_client.fail = False
+    summarizer.fold("u1", _messages("d"))
+    assert await summarizer.summarize("u1") == "summary #2"
+    assert "user: a" in lm_client.requests[-1][1].content
+
+async def test_small_batches_are_summarized_after_max_wait_and_dropped_after_ttl():
+    summarizer = _summarizer(InMemoryContextStore(), FakeLMClient())
+    summarizer.fold("waiting", _messages("a"))
+    summarizer.fold("stale", _messages("b"))
+    now = time.time()
+    summarizer._pending_since["stale"] = now - 7200
+
+    summarizer.sweep(now + 1)
+    assert summarizer.stats()["queued"] == 0
+    assert "stale" not in summarizer._pending and summarizer.dropped_messages == 1
+
+    summarizer.sweep(now + 61)
+    assert summarizer.stats()["queued"] == 1
+    assert await summarizer.summarize("waiting") == "summary #1"
+    assert summarizer._pending_since == {}
+
+async def test_idle_queue_is_folded_into_the_summary():
+    store = InMemoryContextStore()
+    summarizer = _summarizer(store, FakeLMClient(), min_batch=1)
+    manager = ChatContextManager(store, max_age=60, summarizer=summarizer)
+    await manager.update_context("u1", _messages("remember this"))
+    # The queue is kept for max_age, not for as long as summaries live
+    deadline = manager.expiry._deadlines[("context", "u1")]
+    assert deadline <= time.time() + 60
+
+    await manager.expiry.run_due(now=deadline + 1)
+    assert store.resident_size("u1") == 0
+    assert [message.content for message in summarizer._pending["u1"]] == ["remember this"]
+    assert await summarizer.summarize("u1") == "summary #1"
+
+async def test_overflow_from_the_window_is_folded():
+    store = InMemoryContextStore()
+    summarizer = _summarizer(store, FakeLMClient(), min_batch=10)
+    manager = ChatContextManager(store, max_length=2, summarizer=summarizer)
+    await manager.update_context("u1", _messages("a", "b", "c"))
+    assert [message.content for message in await manager.get_context("u1")] == ["b", "c"]
+    assert [message.content for message in summarizer._pending["u1"]] == ["a"]
+
+def test_summarizing_keeps_the_full_context_window_by_default():
+    assert settings.CONTEXT_ACTIVE_WINDOW == ChatContextManager().max_length == 100
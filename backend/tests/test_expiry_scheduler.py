@@ -0,0 +1,89 @@
+# tests/test_expiry_scheduler.py
+
+import time
+from app.services.chat.context_manager import ChatContextManager
+from app.services.chat.context_record import ContextRecord
+from app.services.chat.expiry_scheduler import ExpiryScheduler
+
+async def test_handler_rearms_key_until_nothing_is_left():
+    scheduler = ExpiryScheduler()
+    deadlines = {"a": [150.0, 200.0, None]}
+    calls = []
+
+    async def handler(key, now):
+        calls.append((key, now))
+        return deadlines[key].pop(0)
+
+    scheduler.register("history", handler)
+    scheduler.schedule("history", "a", 100.0)
+
+    assert await scheduler.run_due(now=99.0) == 0
+    assert await scheduler.run_due(now=100.0) == 1
+    assert scheduler.stats()["scheduled"] == 1
+    # Not due again until the deadline the handler reported
+    assert await scheduler.run_due(now=149.0) == 0
+    assert await scheduler.run_due(now=150.0) == 1
+    assert await scheduler.run_due(now=300.0) == 1
+    assert calls == [("a", 100.0), ("a", 150.0), ("a", 300.0)]
+    assert scheduler.stats()["scheduled"] == 0
+    assert (scheduler.retained, scheduler.expired) == (2, 1)
+
+async def test_earlier_schedule_supersedes_later_one():
+    scheduler = ExpiryScheduler()
+    seen = []
+
+    async def handler(key, now):
+        seen.append(now)
+        return None
+
+    scheduler.register("context", handler)
+    scheduler.schedule("context", "a", 200.0)
+    # A later deadline for a key already scheduled earlier is ignored
+    scheduler.schedule("context", "a", 300.0)
+    scheduler.schedule("context", "a", 100.0)
+    assert await scheduler.run_due(now=500.0) == 1
+    assert seen == [500.0]
+    assert scheduler.stale == 1
+
+async def test_failing_handler_drops_the_key():
+    scheduler = ExpiryScheduler()
+
+    async def handler(key, now):
+        raise RuntimeError("boom")
+
+    scheduler.register("context", handler)
+    scheduler.schedule("context", "a", 1.0)
+    scheduler.cancel("context", "b")
+    assert await scheduler.run_due(now=2.0) == 1
+    assert scheduler.failures == 1 and scheduler.stats()["scheduled"] == 0
+
+async def test_batches_are_capped():
+    scheduler = ExpiryScheduler(batch_size=10)
+
+    async def handler(key, now):
+        return None
+
+    scheduler.register("history", handler)
+    for i in range(25):
+        scheduler.schedule("history", i, 1.0)
+    assert await scheduler.run_due(now=2.0) == 25
+    assert scheduler.batches == 3
+
+async def test_history_expiry_is_rearmed_by_the_context_manager():
+    manager = ChatContextManager(history_max_age=60)
+    now = time.time()
+    await manager.update_context("u1", [ContextRecord("1", "user", "first", "u1", now)])
+    await manager.update_context("u1", [ContextRecord("2", "user", "second", "u1", now)])
+    # Backdate the first message, as if it had arrived 50 seconds ago
+    history = manager.conversation_history["u1"]
+    history[0] = (history[0][0], now - 50)
+    manager.expiry.schedule("history", "u1", now + 10)
+
+    await manager.expiry.run_due(now=now + 15)
+    assert [message.content for message, _ in manager.conversation_history["u1"]] == ["second"]
+    # Re-armed for the remaining message rather than dropped
+    assert manager.expiry._deadlines[("history", "u1")] >= now + 60
+
+    await manager.expiry.run_due(now=now + 61)
+    assert "u1" not in manager.conversation_history
+    assert manager.expiry_stats()["history_messages_expired"] == 2
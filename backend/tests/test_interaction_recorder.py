@@ -0,0 +1,100 @@
+# tests/test_interaction_recorder.py
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import OperationalError
+from app.models.character import Character
+from app.models.interaction import Interaction
+from app.models.user import User
+from app.services.db.aio.character_database import AsyncCharacterDatabase
+from app.services.interaction_recorder import InteractionRecorder
+
+async def _seed(session_factory):
+    async with session_factory() as db:
+        db.add_all([
+            User(user_id="u1", username="u1", email="u1@example.com", hashed_password="x"),
+            Character(name="Default", character_type="default"),
+            Character(name="Friend"),
+        ])
+        await db.commit()
+        default_id, friend_id = (await db.scalars(select(Character.id).order_by(Character.id))).all()
+    # The character cache is process-wide; start each test from an empty one
+    async with session_factory() as db:
+        AsyncCharacterDatabase(db).cache.invalidate()
+    return default_id, friend_id
+
+async def _character_ids(session_factory):
+    async with session_factory() as db:
+        return (await db.scalars(select(Interaction.character_id).order_by(Interaction.id))).all()
+
+def _recorder(session_factory):
+    return InteractionRecorder(session_factory=session_factory, flush_size=100, flush_interval=60, max_buffer=100)
+
+async def test_unknown_users_are_dropped_and_missing_characters_use_the_default(session_factory):
+    default_id, friend_id = await _seed(session_factory)
+    recorder = _recorder(session_factory)
+    recorder.record("u1", friend_id, "chat")
+    recorder.record("u1", None, "chat")
+    recorder.record("u1", 999, "chat")
+    recorder.record("nobody", friend_id, "chat")
+
+    assert await recorder.flush() == 3
+    assert await _character_ids(session_factory) == [friend_id, default_id, default_id]
+    stats = recorder.stats()
+    assert (stats["dropped_unknown_user"], stats["remapped_unknown_character"], stats["buffered"]) == (1, 1, 0)
+
+async def test_deleted_character_is_revalidated_after_integrity_error(session_factory):
+    default_id, friend_id = await _seed(session_factory)
+    recorder = _recorder(session_factory)
+    recorder.record("u1", friend_id, "chat")
+    assert await recorder.flush() == 1
+
+    # The recorder still believes the character exists
+    async with session_factory() as db:
+        await db.execute(delete(Interaction))
+        await db.execute(delete(Character).where(Character.id == friend_id))
+        await db.commit()
+    recorder.record("u1", friend_id, "chat")
+    recorder.record("u1", None, "chat")
+
+    assert await recorder.flush() == 2
+    assert await _character_ids(session_factory) == [default_id, default_id]
+    stats = recorder.stats()
+    # Counted once, although the batch was validated twice
+    assert (stats["remapped_unknown_character"], stats["flush_failures"], stats["dropped_rejected"]) == (1, 0, 0)
+
+async def test_rows_rejected_twice_are_dropped_one_by_one(session_factory):
+    default_id, friend_id = await _seed(session_factory)
+    recorder = _recorder(session_factory)
+    recorder.record("u1", friend_id, "chat")
+    recorder.record("u1", friend_id, "like")
+    assert await recorder.flush() == 2
+
+    # A row the caches cannot fix, e.g. one that violates a constraint they know nothing about
+    validate = recorder._validate
+
+    async def validate_with_bad_row(db, batch):
+        rows, remapped = await validate(db, batch)
+        return rows + [{**rows[0], "user_id": "ghost"}], remapped
+
+    recorder._validate = validate_with_bad_row
+    recorder.record("u1", friend_id, "chat")
+    assert await recorder.flush() == 1
+    assert recorder.stats()["dropped_rejected"] == 1
+    assert recorder.stats()["buffered"] == 0
+    assert len(await _character_ids(session_factory)) == 3
+
+async def test_failed_flush_keeps_the_batch(session_factory):
+    await _seed(session_factory)
+    attempts = []
+
+    def flaky_factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OperationalError("INSERT", {}, Exception("connection lost"))
+        return session_factory()
+
+    recorder = _recorder(flaky_factory)
+    recorder.record("u1", None, "chat")
+    assert await recorder.flush() == 0
+    assert recorder.stats()["buffered"] == 1
+    assert await recorder.flush() == 1
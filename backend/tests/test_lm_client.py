@@ -0,0 +1,71 @@
+# tests/test_lm_client.py
+
+import json
+import httpx
+import pytest
+from app.services.ai import lm_client
+from app.services.ai.lm_client import LMStudioClient, close_shared_http_client, get_shared_http_client
+from app.services.ai.prompt_assembler import TokenUsage
+
+def _client(handler):
+    return LMStudioClient(httpx.AsyncClient(base_url="http://lm.test/v1", transport=httpx.MockTransport(handler)))
+
+async def test_clients_share_one_pool_until_it_is_closed():
+    first, second = LMStudioClient(), LMStudioClient()
+    assert first.client is second.client is get_shared_http_client()
+    # Closing a client leaves the shared pool alone
+    await first.close()
+    assert not second.client.is_closed
+
+    await close_shared_http_client()
+    assert second.client.is_closed
+    assert get_shared_http_client() is not second.client
+    await close_shared_http_client()
+
+async def test_completion_reports_usage_and_is_counted():
+    def handler(request):
+        assert json.loads(request.content)["messages"] == [{"role": "user", "content": "hi"}]
+        return httpx.Response(200, json={
+            "choices": [{"message": {"role": "assistant", "content": "hello"}}],
+            "usage": {"prompt_tokens": 3, "completion_tokens": 1},
+        })
+
+    requests_total = lm_client.pool_metrics.requests_total
+    usage = TokenUsage()
+    message = await _client(handler).create_chat_completion([{"role": "user", "content": "hi"}], "m", 0.7, 10, usage=usage)
+    assert message.content == "hello" and usage.as_dict()["total_tokens"] == 4 and usage.reported
+    assert lm_client.pool_metrics.requests_total == requests_total + 1
+    assert lm_client.pool_metrics.in_flight == 0
+
+async def test_stream_yields_deltas_and_skips_malformed_chunks():
+    def chunk(payload):
+        return f"data: {json.dumps(payload)}\n\n"
+
+    def handler(request):
+        assert json.loads(request.content)["stream_options"] == {"include_usage": True}
+        body = "".join([
+            chunk({"choices": [{"delta": {"role": "assistant"}}]}),
+            chunk({"choices": [{"delta": {"content": "Hel"}}]}),
+            "data: {not json\n\n",
+            chunk({"choices": [{"delta": {"content": "lo"}}]}),
+            chunk({"choices": [], "usage": {"prompt_tokens": 5, "completion_tokens": 2}}),
+            "data: [DONE]\n\n",
+        ])
+        return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+    usage = TokenUsage()
+    deltas = [delta async for delta in _client(handler).stream_chat_completion([], "m", 0.7, 10, usage=usage)]
+    assert deltas == ["Hel", "lo"] and usage.total_tokens == 7
+
+async def test_missing_model_errors_notify_listeners():
+    missing = []
+    lm_client.add_model_missing_listener(missing.append)
+    try:
+        client = _client(lambda request: httpx.Response(404, text='{"error": "model not found"}'))
+        failed = lm_client.pool_metrics.requests_failed
+        with pytest.raises(httpx.HTTPStatusError):
+            await client.create_chat_completion([], "gone-model", 0.7, 10)
+        assert missing == ["gone-model"]
+        assert lm_client.pool_metrics.requests_failed == failed + 1
+    finally:
+        lm_client._model_missing_listeners.remove(missing.append)
@@ -0,0 +1,79 @@
+# tests/test_long_term_memory.py
+
+import os
+import time
+from app.services.chat.context_manager import ChatContextManager
+from app.services.chat.context_record import ContextRecord
+from app.services.chat.long_term_memory import HashingEmbedder, LongTermMemory
+
+def _messages(user_id, *contents):
+    return [ContextRecord(f"{user_id}-{i}", "user", content, user_id, time.time()) for i, content in enumerate(contents)]
+
+def _memory(tmp_path, **kwargs):
+    return LongTermMemory(embedder=HashingEmbedder(1024), block_size=8, max_messages=16, directory=str(tmp_path / "ltm"), **kwargs)
+
+async def test_search_finds_related_messages(tmp_path):
+    memory = _memory(tmp_path)
+    await memory.add("u1", _messages("u1", "I am training for a marathon in April", "My sourdough starter died again"))
+    results = await memory.search("u1", "how is the marathon training going?", min_score=0.1)
+    assert [record.content for record in results] == ["I am training for a marathon in April"]
+    # Messages already in the context window are not recalled twice
+    assert await memory.search("u1", "marathon training", min_score=0.1, exclude=["I am training for a marathon in April"]) == []
+
+async def test_search_does_not_create_indexes(tmp_path):
+    memory = _memory(tmp_path)
+    assert await memory.search("nobody", "anything at all") == []
+    assert memory.stats()["users"] == 0
+    assert not os.path.exists(tmp_path / "ltm") or os.listdir(tmp_path / "ltm") == []
+
+async def test_unloaded_index_is_reopened_from_disk(tmp_path):
+    memory = _memory(tmp_path)
+    await memory.add("u1", _messages("u1", "my puppy is called Biscuit"))
+    assert memory.unload("u1")
+    # Reopening waits for the background write of the unloaded copy
+    results = await memory.search("u1", "what is my puppy called", min_score=0.1)
+    assert [record.content for record in results] == ["my puppy is called Biscuit"]
+
+    await memory.flush()
+    restarted = _memory(tmp_path)
+    assert [record.content for record in await restarted.search("u1", "puppy Biscuit", min_score=0.1)] == ["my puppy is called Biscuit"]
+
+async def test_records_file_is_compacted_and_reloads_the_newest_messages(tmp_path):
+    memory = _memory(tmp_path)
+    for i in range(40):
+        await memory.add("u1", _messages("u1", f"message number {i} about topic{i}"))
+    await memory.flush()
+    index = memory._indexes["u1"]
+    assert index.size == 16 and index.record_lines < 32
+
+    restarted = _memory(tmp_path)
+    results = await restarted.search("u1", "topic39", k=1, min_score=0.1)
+    assert [record.content for record in results] == ["message number 39 about topic39"]
+    assert await restarted.search("u1", "topic3", k=1, min_score=0.5) == []
+
+async def test_indexes_have_their_own_budget(tmp_path):
+    memory = _memory(tmp_path, max_resident=4)
+    await memory.add("a", _messages("a", "one", "two", "three"))
+    await memory.add("b", _messages("b", "four", "five"))
+    # "a" was least recently used; it is unloaded but not lost
+    assert memory.resident_size("a") == 0 and memory.resident_size("b") == 2
+    assert memory.budget.evictions == 1
+    assert [record.content for record in await memory.search("a", "three", min_score=0.1)] == ["three"]
+
+async def test_idle_indexes_expire(tmp_path):
+    memory = _memory(tmp_path, idle_ttl=60)
+    await memory.add("u1", _messages("u1", "hello there"))
+    now = time.time()
+    assert memory.expire("u1", now) > now
+    assert memory.expire("u1", now + 61) is None
+    assert memory.stats()["expired"] == 1
+    assert [record.content for record in await memory.search("u1", "hello there", min_score=0.1)] == ["hello there"]
+
+async def test_long_term_memory_is_not_charged_to_the_context_budget(tmp_path):
+    memory = _memory(tmp_path)
+    manager = ChatContextManager(memory=memory)
+    await manager.update_context("u1", _messages("u1", "first message", "second message"))
+    # The queue and the history hold two messages each; the index is counted separately
+    assert manager.budget.resident == 4
+    assert memory.budget.resident == 2
+    await manager.shutdown()
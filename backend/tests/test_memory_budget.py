@@ -0,0 +1,72 @@
+# tests/test_memory_budget.py
+
+import time
+from app.services.chat.context_manager import ChatContextManager
+from app.services.chat.context_record import ContextRecord
+from app.services.chat.context_snapshot import UserState
+from app.services.chat.memory_budget import MemoryBudget, SpillStore
+
+def _messages(user_id, *contents):
+    return [ContextRecord(f"{user_id}-{content}", "user", content, user_id, time.time()) for content in contents]
+
+def test_victims_are_least_recently_used_first():
+    budget = MemoryBudget(5)
+    for user_id in ("a", "b", "c"):
+        budget.resize(user_id, 2)
+    budget.touch("a")
+    assert budget.over_budget
+    assert budget.victims() == ["b"]
+    assert budget.victims(exclude="b") == ["c"]
+
+async def test_idle_users_spill_and_fault_back_in(tmp_path):
+    spill = SpillStore(str(tmp_path / "spill"))
+    # Each update puts a message in both the context queue and the history
+    manager = ChatContextManager(budget=MemoryBudget(8), spill=spill)
+    await manager.update_context("a", _messages("a", "a1", "a2"))
+    await manager.update_context("b", _messages("b", "b1", "b2"))
+    assert manager.budget.resident == 8 and "a" not in spill
+
+    await manager.update_context("c", _messages("c", "c1"))
+    # "a" was least recently used, so it went to disk to make room
+    assert "a" in spill
+    assert "a" not in manager.conversation_history
+    assert manager.store.resident_size("a") == 0
+    assert manager.budget.resident <= 8
+    assert manager.memory_stats()["evictions"] == 1
+
+    context = await manager.get_context("a")
+    assert [message.content for message in context] == ["a1", "a2"]
+    assert [message.content for message, _ in manager.get_conversation_history("a")] == ["a1", "a2"]
+    assert "a" not in spill
+    # Bringing "a" back pushed the budget over again, so the next idle user was spilled in turn
+    assert "b" in spill
+    assert spill.stats()["fault_ins"] == 1
+
+async def test_spilled_user_keeps_new_messages_after_fault_in(tmp_path):
+    spill = SpillStore(str(tmp_path / "spill"))
+    manager = ChatContextManager(budget=MemoryBudget(4), spill=spill)
+    await manager.update_context("a", _messages("a", "a1"))
+    await manager.update_context("b", _messages("b", "b1", "b2"))
+    assert "a" in spill
+
+    await manager.update_context("a", _messages("a", "a2"))
+    assert [message.content for message in await manager.get_context("a")] == ["a1", "a2"]
+
+def test_spill_files_survive_a_restart(tmp_path):
+    directory = str(tmp_path / "spill")
+    now = time.time()
+    SpillStore(directory).write("a", UserState(history=[(message, now) for message in _messages("a", "a1")]), now + 60)
+
+    reopened = SpillStore(directory)
+    assert "a" in reopened
+    state = reopened.take("a")
+    assert [message.content for message, _ in state.history] == ["a1"]
+    assert "a" not in reopened
+
+def test_expired_spill_files_are_deleted(tmp_path):
+    spill = SpillStore(str(tmp_path / "spill"))
+    now = time.time()
+    spill.write("a", UserState(), now + 10)
+    assert spill.expire("a", now) == now + 10
+    assert spill.expire("a", now + 11) is None
+    assert "a" not in spill and spill.stats()["expired"] == 1
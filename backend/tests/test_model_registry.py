@@ -0,0 +1,61 @@
+# tests/test_model_registry.py
+
+import asyncio
+from app.services.ai.model_registry import ModelRegistry
+
+class FakeLMClient:
+    def __init__(self, *model_ids):
+        self.model_ids = list(model_ids)
+        self.calls = 0
+
+    async def get_models(self):
+        self.calls += 1
+        await asyncio.sleep(0)
+        return {"data": [{"id": model_id} for model_id in self.model_ids]}
+
+def _registry(lm_client, **kwargs):
+    return ModelRegistry(lm_client, **{"ttl": 60, "refresh_interval": 30, "recheck_interval": 5, **kwargs})
+
+async def test_concurrent_lookups_share_one_fetch():
+    lm_client = FakeLMClient("m1")
+    registry = _registry(lm_client)
+    results = await asyncio.gather(*[registry.is_model_loaded("m1") for _ in range(20)])
+    assert all(results) and lm_client.calls == 1
+    assert registry.stats()["misses"] == 1 and registry.stats()["hits"] == 19
+
+async def test_unknown_models_recheck_at_most_once_per_interval():
+    lm_client = FakeLMClient("m1")
+    registry = _registry(lm_client, recheck_interval=0)
+    await registry.get_models()
+    lm_client.model_ids.append("m2")
+    # A model loaded after the last fetch is found by the re-check
+    assert await registry.is_model_loaded("m2")
+    assert lm_client.calls == 2 and registry.rechecks == 1
+
+    registry.recheck_interval = 60
+    for _ in range(10):
+        assert not await registry.is_model_loaded("nope")
+    assert lm_client.calls == 2 and registry.rechecks_skipped == 10
+    # The cached list survives misses, so known models stay hits
+    assert await registry.is_model_loaded("m1") and lm_client.calls == 2
+
+async def test_missing_model_report_invalidates_the_list():
+    lm_client = FakeLMClient("m1")
+    registry = _registry(lm_client)
+    await registry.get_models()
+    registry._on_model_missing("m1")
+    assert not registry.stats()["cached"]
+    await registry.get_models()
+    assert lm_client.calls == 2 and registry.invalidations == 1
+
+async def test_background_refresh_keeps_the_list_current():
+    lm_client = FakeLMClient("m1")
+    registry = _registry(lm_client, refresh_interval=0.01)
+    registry.start()
+    try:
+        await asyncio.sleep(0.05)
+    finally:
+        await registry.stop()
+    assert registry.refreshes >= 2
+    calls = lm_client.calls
+    assert await registry.is_model_loaded("m1") and lm_client.calls == calls
@@ -0,0 +1,104 @@
+# tests/test_nlp_service.py
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from app.services.nlp import nlp_service
+from app.services.nlp.analysis_cache import AnalysisCache
+from app.services.nlp.nlp_service import NLPEngine, NLPService, NLPWorkerPool, get_nlp_engine
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = NLPEngine("blank:en", exclude=[])
+    ruler = engine.nlp.add_pipe("entity_ruler")
+    ruler.add_patterns([{"label": "GPE", "pattern": "Lisbon"}])
+    return engine
+
+@pytest.fixture
+def service(engine):
+    pool = NLPWorkerPool(kind="thread", max_workers=1, max_pending=4, timeout=5)
+    yield NLPService(engine=engine, worker_pool=pool, cache=AnalysisCache(max_entries=16, ttl=60))
+    pool.shutdown()
+
+async def test_entities_are_recognized_in_the_worker_pool(service, engine, monkeypatch):
+    threads = []
+    entities = engine.entities
+
+    def recording_entities(text):
+        threads.append(threading.current_thread().name)
+        return entities(text)
+
+    monkeypatch.setattr(service, "_entities", recording_entities)
+    assert await service.recognize_entities("I moved to Lisbon") == [("Lisbon", "GPE")]
+    assert len(threads) == 1 and threads[0].startswith("nlp")
+    assert service.worker_pool.stats()["completed"] == 1
+
+    # A cache hit is served without going back to the pool
+    assert await service.recognize_entities("I moved to Lisbon") == [("Lisbon", "GPE")]
+    assert len(threads) == 1 and service.cache.hits == 1
+
+async def test_full_analysis_fills_the_entity_cache(service):
+    analysis = await service.analyze_text("Lisbon in spring")
+    assert analysis["entities"] == [("Lisbon", "GPE")]
+    completed = service.worker_pool.stats()["completed"]
+    assert await service.recognize_entities("Lisbon in spring") == [("Lisbon", "GPE")]
+    assert service.worker_pool.stats()["completed"] == completed
+
+def test_services_share_the_process_engine():
+    first, second = NLPService(), NLPService()
+    assert first.engine is second.engine is get_nlp_engine()
+    assert first.nlp is second.nlp
+    assert nlp_service.get_nlp_engine_stats()["model"] == "blank:en"
+
+def test_engine_is_loaded_once_under_concurrent_first_use(monkeypatch):
+    loads = []
+
+    class CountingEngine:
+        def __init__(self):
+            loads.append(threading.current_thread().name)
+
+    monkeypatch.setattr(nlp_service, "_engine", None)
+    monkeypatch.setattr(nlp_service, "NLPEngine", CountingEngine)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        engines = list(executor.map(lambda _: get_nlp_engine(), range(32)))
+    assert len(loads) == 1 and all(engine is engines[0] for engine in engines)
+
+def test_batch_analysis_matches_single_analysis_and_scores_each_text_once(engine, monkeypatch):
+    scored = []
+    polarity_scores = engine.sentiment_backend.polarity_scores
+
+    def counting_scores(text):
+        scored.append(text)
+        return polarity_scores(text)
+
+    monkeypatch.setattr(engine.sentiment_backend, "polarity_scores", counting_scores)
+    texts = ["I love Lisbon", "this is awful", "I love Lisbon"]
+    batch = engine.analyze_batch(texts)
+    assert sorted(scored) == ["I love Lisbon", "this is awful"]
+    assert batch == [engine.analyze(text) for text in texts]
+
+async def test_service_batch_only_sends_uncached_texts(service, monkeypatch):
+    await service.analyze_text("already seen")
+    sent = []
+    analyze_batch = service._analyze_batch
+
+    def recording_batch(texts):
+        sent.append(list(texts))
+        return analyze_batch(texts)
+
+    monkeypatch.setattr(service, "_analyze_batch", recording_batch)
+    results = await service.analyze_batch(["new one", "already seen", "new two"])
+    assert sent == [["new one", "new two"]]
+    assert [result["tokens"][0][0] for result in results] == ["new", "already", "new"]
+    assert await service.analyze_batch([]) == []
+
+async def test_micro_batcher_coalesces_concurrent_requests(engine):
+    pool = NLPWorkerPool(kind="thread", max_workers=1, max_pending=4, timeout=5)
+    batcher = nlp_service.NLPMicroBatcher(pool, engine.analyze_batch, window=0.01, max_size=8)
+    try:
+        results = await asyncio.gather(*[batcher.analyze(f"text number {i}") for i in range(5)])
+    finally:
+        pool.shutdown()
+    assert [result["tokens"][2][0] for result in results] == ["0", "1", "2", "3", "4"]
+    assert batcher.stats()["batches"] == 1 and batcher.stats()["items"] == 5
@@ -0,0 +1,162 @@
+# tests/test_post_response_queue.py
+
+import asyncio
+import json
+from app.services.post_response_queue import PostResponseQueue, create_post_response_queue
+
+def _queue(**kwargs):
+    return PostResponseQueue(**{"batch_window": 0, "retry_delay": 0.01, "max_attempts": 3, "dead_letter_path": None, **kwargs})
+
+async def _until(predicate, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.005)
+
+async def test_only_failed_jobs_are_retried_in_lane_order():
+    queue = _queue()
+    applied = []
+    failures = {"a1": 1}
+    calls = []
+
+    async def handler(payloads):
+        calls.append(list(payloads))
+        errors = []
+        for payload in payloads:
+            if failures.get(payload, 0) > 0:
+                failures[payload] -= 1
+                errors.append(RuntimeError(f"{payload} failed"))
+            else:
+                applied.append(payload)
+                errors.append(None)
+        return errors
+
+    queue.register("context", handler)
+    queue.start()
+    try:
+        for payload, key in [("a1", "a"), ("b1", "b"), ("a2", "a"), ("b2", "b"), ("a3", "a")]:
+            await queue.submit("context", payload, key=key)
+        await _until(lambda: len(applied) == 5)
+    finally:
+        await queue.stop()
+
+    # Each payload applied exactly once, and "a" in order despite its first job failing
+    assert sorted(applied) == ["a1", "a2", "a3", "b1", "b2"]
+    assert [payload for payload in applied if payload.startswith("a")] == ["a1", "a2", "a3"]
+    assert [payload for payload in applied if payload.startswith("b")] == ["b1", "b2"]
+    # A handler call never holds two jobs from the same lane
+    assert all(len({payload[0] for payload in call}) == len(call) for call in calls)
+    stats = queue.stats()
+    assert (stats["processed"], stats["failures"], stats["retries"], stats["dead_lettered"]) == (5, 1, 1, 0)
+
+async def test_jobs_that_keep_failing_are_dead_lettered(tmp_path):
+    path = tmp_path / "dead_letters.jsonl"
+    queue = _queue(dead_letter_path=str(path))
+
+    async def handler(payloads):
+        raise RuntimeError("store is down")
+
+    queue.register("context", handler)
+    queue.start()
+    try:
+        await queue.submit("context", {"n": 1}, key="a")
+        await _until(lambda: queue.dead_lettered == 1)
+    finally:
+        await queue.stop()
+
+    record = json.loads(path.read_text().strip())
+    assert record["attempts"] == 3 and record["key"] == "a" and record["payload"] == {"n": 1}
+    assert queue.failures == 3 and queue.retries == 2
+
+async def test_stop_runs_held_jobs_once_more_in_order():
+    queue = _queue(retry_delay=60)
+    applied = []
+    failed = set()
+
+    async def handler(payloads):
+        errors = []
+        for payload in payloads:
+            if payload == "a1" and payload not in failed:
+                failed.add(payload)
+                errors.append(RuntimeError("first try"))
+            else:
+                applied.append(payload)
+                errors.append(None)
+        return errors
+
+    queue.register("context", handler)
+    queue.start()
+    await queue.submit("context", "a1", key="a")
+    await _until(lambda: queue.stats()["retrying_lanes"] == 1)
+    await queue.submit("context", "a2", key="a")
+    await _until(lambda: queue.stats()["held"] == 2)
+    await queue.stop()
+    assert applied == ["a1", "a2"]
+
+async def test_full_queue_without_a_worker_applies_the_queue_in_order():
+    queue = _queue(max_size=1)
+    applied = []
+
+    async def handler(payloads):
+        applied.extend(payloads)
+
+    queue.register("context", handler)
+    await queue.submit("context", 1, key="a")
+    await queue.submit("context", 2, key="a")
+    assert applied == [1, 2] and queue.inline == 1
+    await queue.stop()
+    assert applied == [1, 2]
+
+async def test_full_queue_waits_for_room_and_keeps_lane_order():
+    queue = _queue(max_size=1)
+    applied = []
+    gate = asyncio.Event()
+    failed = set()
+
+    async def handler(payloads):
+        await gate.wait()
+        errors = []
+        for payload in payloads:
+            if payload == "a2" and payload not in failed:
+                failed.add(payload)
+                errors.append(RuntimeError("first try"))
+            else:
+                applied.append(payload)
+                errors.append(None)
+        return errors
+
+    queue.register("context", handler)
+    queue.start()
+    try:
+        await queue.submit("context", "a1", key="a")
+        await _until(lambda: queue.stats()["queued"] == 0)
+        await queue.submit("context", "a2", key="a")
+        # The queue is full while the worker is stuck on a1, so this waits rather than overtaking
+        blocked = asyncio.create_task(queue.submit("context", "a3", key="a"))
+        await asyncio.sleep(0.02)
+        assert not blocked.done() and applied == []
+        gate.set()
+        await blocked
+        await _until(lambda: len(applied) == 3)
+    finally:
+        await queue.stop()
+
+    # a2 failed once and was retried before a3 was applied
+    assert applied == ["a1", "a2", "a3"]
+    assert queue.blocked == 1 and queue.inline == 0 and queue.retries == 1
+
+async def test_context_updates_fail_independently():
+    class FlakyContextManager:
+        def __init__(self):
+            self.updates = []
+
+        async def update_context(self, user_id, messages):
+            if user_id == "bad":
+                raise RuntimeError("store is down")
+            self.updates.append((user_id, messages))
+
+    manager = FlakyContextManager()
+    queue = create_post_response_queue(manager)
+    errors = await queue._handlers["context"]([("u1", ["m1"]), ("bad", ["m2"]), ("u2", ["m3"])])
+    assert [error is None for error in errors] == [True, False, True]
+    assert manager.updates == [("u1", ["m1"]), ("u2", ["m3"])]
@@ -0,0 +1,68 @@
+# tests/test_prompt_assembler.py
+
+import time
+from app.models.messages import Message
+from app.services.ai.prompt_assembler import PromptAssembler, TokenCounter, estimate_tokens
+from app.services.nlp.casual_conversation_handler import CasualConversation, MAX_RESPONSE_TOKENS
+
+def _assembler(context_window):
+    return PromptAssembler(TokenCounter(tokenizer_path=""), context_window=context_window)
+
+def _history(*contents, relevance=1.0):
+    return [Message(role="user", content=content, user_id="u1", timestamp=time.time(), relevance=relevance) for content in contents]
+
+def test_estimate_counts_words_and_punctuation():
+    assert estimate_tokens("Hello, world!") == 4
+    assert estimate_tokens("internationalization") == 5
+
+def test_history_fills_the_budget_most_relevant_first():
+    assembler = _assembler(60)
+    context = _history("one two three", "four five six", "seven eight nine")
+    context[1].relevance = 0.1
+    # System and user turn take 11 tokens, leaving room for two of the three messages
+    prompt = assembler.assemble("system", context, "question", max_tokens=34)
+    assert [msg.content for msg in prompt.context] == ["one two three", "seven eight nine"]
+    assert prompt.dropped_messages == 1 and prompt.prompt_tokens == 25
+    assert [msg.role for msg in prompt.messages] == ["system", "user", "user", "user"]
+
+def test_memories_then_summary_give_way_before_the_user_turn():
+    assembler = _assembler(100)
+    memories = [f"- user: memory number {i} " + "word " * 10 for i in range(3)]
+    summary = "they like tea " * 10
+    prompt = assembler.assemble("system", _history("old message"), "what should I drink?", 20, summary, memories)
+    system, user = prompt.messages[0].content, prompt.messages[-1].content
+    assert prompt.prompt_tokens <= 80
+    assert "memory number 0" in user and "memory number 2" not in user
+    assert user.endswith("what should I drink?") and "they like tea" in system
+    assert assembler.dropped_memories == 2 and assembler.truncated_turns == 0
+
+    assembler = _assembler(40)
+    prompt = assembler.assemble("system", [], "what should I drink?", 20, summary, memories)
+    assert [msg.content for msg in prompt.messages] == ["system", "what should I drink?"]
+    assert assembler.dropped_memories == 3 and assembler.dropped_summaries == 1
+
+def test_user_turn_is_truncated_as_a_last_resort():
+    assembler = _assembler(40)
+    user_turn = " ".join(f"word{i}" for i in range(100))
+    prompt = assembler.assemble("system", _history("dropped"), user_turn, max_tokens=10)
+    assert prompt.prompt_tokens <= 30
+    assert user_turn.startswith(prompt.messages[-1].content) and prompt.messages[-1].content
+    assert assembler.truncated_turns == 1 and prompt.dropped_messages == 1
+
+def test_casual_prompt_counts_the_summary_against_the_history_budget():
+    handler = CasualConversation()
+    handler.prompt_assembler = _assembler(MAX_RESPONSE_TOKENS + 200)
+    context = _history(*[f"message {i} " + "filler " * 5 for i in range(20)])
+    without_summary = handler.build_prompt("hi there", context)
+    with_summary = handler.build_prompt("hi there", context, summary="we talked about " + "gardening " * 20)
+    assert "gardening" in with_summary.messages[0].content
+    assert len(with_summary.context) < len(without_summary.context)
+    assert with_summary.prompt_tokens <= 200 and without_summary.prompt_tokens <= 200
+
+def test_casual_prompt_truncates_an_oversized_input():
+    handler = CasualConversation()
+    handler.prompt_assembler = _assembler(MAX_RESPONSE_TOKENS + 80)
+    prompt = handler.build_prompt("hello " * 200, _history("earlier"), summary="a long summary " * 20)
+    assert prompt.prompt_tokens <= 80
+    assert "a long summary" not in prompt.messages[0].content
+    assert prompt.messages[-1].content.endswith("Assistant:")
@@ -0,0 +1,43 @@
+# tests/test_sentiment.py
+
+import pytest
+from app.services.nlp.sentiment import (
+    SCORE_KEYS,
+    EnsembleSentimentBackend,
+    SentimentBackend,
+    VaderSentimentBackend,
+    create_sentiment_backend,
+)
+
+class FixedBackend(SentimentBackend):
+    name = "fixed"
+
+    def __init__(self, compound):
+        self.compound = compound
+
+    def polarity_scores(self, text):
+        return {"neg": 0.0, "neu": 0.5, "pos": 0.5, "compound": self.compound}
+
+def test_vader_backend_scores_polarity():
+    backend = create_sentiment_backend("vader")
+    assert isinstance(backend, VaderSentimentBackend)
+    positive, negative = backend.polarity_scores_batch(["I love this", "I hate this"])
+    assert set(positive) >= set(SCORE_KEYS)
+    assert positive["compound"] > 0.05 > -0.05 > negative["compound"]
+
+def test_ensemble_averages_its_members():
+    ensemble = EnsembleSentimentBackend([FixedBackend(1.0), FixedBackend(0.0)])
+    assert ensemble.polarity_scores("anything") == {"neg": 0.0, "neu": 0.5, "pos": 0.5, "compound": 0.5}
+    with pytest.raises(ValueError):
+        EnsembleSentimentBackend([])
+
+def test_nltk_backend_is_available_by_name():
+    try:
+        backend = create_sentiment_backend("nltk")
+    except LookupError:
+        pytest.skip("NLTK's vader_lexicon is not downloaded")
+    assert backend.polarity_scores("I love this")["compound"] > 0
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="vader, nltk, ensemble"):
+        create_sentiment_backend("textblob")
@@ -0,0 +1,53 @@
+# tests/test_stage_timings.py
+
+import asyncio
+from types import SimpleNamespace
+from app.services.ai.personalized_chatbot import PersonalizedChatbot
+from app.services.ai.trait_store import TraitStore
+from app.services.characters.character_details import get_character_details
+from app.services.characters.character_profile import CharacterProfile
+from app.utils.stage_timings import StageStats, StageTimings
+
+async def test_concurrent_stages_overlap():
+    timings = StageTimings()
+    await asyncio.gather(
+        timings.timed("lookup", asyncio.sleep(0.05)),
+        timings.timed("model", asyncio.sleep(0.05))
+    )
+    assert min(timings.stages.values()) >= 0.04
+    assert timings.total < sum(timings.stages.values())
+    header = timings.server_timing()
+    assert header.startswith("lookup;dur=") and ", model;dur=" in header and header.split(", ")[-1].startswith("total;dur=")
+
+def test_stage_stats_aggregate_requests():
+    stats = StageStats()
+    for seconds in (0.01, 0.03):
+        timings = StageTimings()
+        timings.stages["generate"] = seconds
+        stats.record(timings)
+    generate = stats.stats()["stages"]["generate"]
+    assert stats.stats()["requests"] == 2
+    assert (generate["count"], generate["avg_ms"], generate["max_ms"]) == (2, 20.0, 30.0)
+
+async def test_trait_analysis_runs_alongside_the_llm_call(session_factory):
+    class SlowLMClient:
+        async def create_chat_completion(self, messages, **kwargs):
+            await asyncio.sleep(0.1)
+            return SimpleNamespace(role="assistant", content="Hello!", user_id="assistant", timestamp=0.0, relevance=1.0)
+
+    class SlowNLPService:
+        async def analyze_text(self, text):
+            await asyncio.sleep(0.1)
+            return {"sentiment": {"compound": 0.5, "pos": 0.5}, "primary_conversation_intent": "joke"}
+
+    profile = CharacterProfile(1, "Ada", "Adapts", "Adaptive", "adaptive", get_character_details("adaptive"))
+    chatbot = PersonalizedChatbot(profile, TraitStore(session_factory=session_factory))
+    chatbot.lm_client, chatbot.nlp_service, chatbot.long_term_memory = SlowLMClient(), SlowNLPService(), None
+
+    timings = StageTimings()
+    reply = await chatbot.generate_response("tell me a joke", [], "u1", timings=timings)
+    assert reply.startswith("Hello!")
+    assert timings.stages["llm"] >= 0.09 and timings.stages["nlp"] >= 0.09
+    assert timings.total < 0.18
+    # The analysis is applied before the reply is returned
+    assert chatbot.get_personality_traits("u1")["humor"] > 0
@@ -0,0 +1,43 @@
+# tests/test_text_cleaning.py
+
+import pytest
+from app.utils.text_cleaning import StreamingResponseCleaner, clean_ai_response
+from app.utils.text_processing import post_process_response
+
+def _stream(deltas):
+    cleaner = StreamingResponseCleaner()
+    pieces = [cleaner.feed(delta) for delta in deltas]
+    return pieces, "".join(pieces) + cleaner.flush()
+
+def _chunks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+@pytest.mark.parametrize("text", [
+    "Hello there, how are you today?",
+    "As an AI language model, I think you should rest.",
+    "Sure (Spark: thinking about it) here it is.",
+    "I'm an AI, so I don't have feelings, but I like tea.",
+    "Wait - that is a good point.",
+    "Great answer (Answering the user with enthusiasm) ignored tail",
+])
+@pytest.mark.parametrize("size", [1, 3, 7, 64])
+def test_streamed_output_matches_cleaning_the_whole_response(text, size):
+    _, streamed = _stream(_chunks(text, size))
+    assert streamed == post_process_response(clean_ai_response(text))
+
+def test_phrase_split_across_deltas_is_held_back():
+    pieces, streamed = _stream(["Well. As an ", "AI language ", "model, I would ", "say yes"])
+    assert "As an" not in "".join(pieces)
+    assert streamed == "Well. I would say yes"
+
+def test_open_parenthetical_is_held_until_closed():
+    cleaner = StreamingResponseCleaner()
+    assert cleaner.feed("Okay (thinking ") == "Okay"
+    assert cleaner.feed("hard) done ") == " done"
+    assert cleaner.flush() == ""
+
+def test_nothing_is_released_after_the_answering_marker():
+    cleaner = StreamingResponseCleaner()
+    assert cleaner.feed("Bye now (Answering the user with") == "Bye now"
+    assert cleaner.feed(" more text ") == ""
+    assert cleaner.flush() == ""
@@ -0,0 +1,110 @@
+# tests/test_trait_store.py
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from app.models.adaptive_trait import AdaptiveTrait
+from app.models.character import Character
+from app.models.user import User
+from app.services.ai.trait_store import DEFAULT_TRAITS, TraitStore
+
+async def _seed(session_factory, user_ids=("u1",)) -> int:
+    async with session_factory() as db:
+        db.add_all([User(user_id=user_id, username=user_id, email=f"{user_id}@example.com", hashed_password="x") for user_id in user_ids])
+        character = Character(name="Friend")
+        db.add(character)
+        await db.commit()
+        return character.id
+
+async def test_flush_round_trip(session_factory):
+    character_id = await _seed(session_factory)
+    store = TraitStore(session_factory=session_factory)
+
+    assert await store.load("u1", character_id) == DEFAULT_TRAITS
+    store.apply("u1", character_id, {"humor": 0.4, "empathy": 2})
+    store.apply("u1", character_id, {"humor": 0.2})
+    assert await store.flush() == 1
+    assert await store.flush() == 0
+
+    reloaded = TraitStore(session_factory=session_factory)
+    traits = await reloaded.load("u1", character_id)
+    assert traits["humor"] == pytest.approx(0.6)
+    assert traits["empathy"] == 1
+
+    # A second flush updates the existing row instead of adding another
+    reloaded.apply("u1", character_id, {"formality": -0.5})
+    assert await reloaded.flush() == 1
+    async with session_factory() as db:
+        rows = (await db.scalars(select(AdaptiveTrait))).all()
+    assert len(rows) == 1 and rows[0].formality == -0.5
+
+async def test_failed_flush_keeps_pairs_dirty(session_factory):
+    character_id = await _seed(session_factory)
+    attempts = []
+
+    def flaky_factory():
+        attempts.append(1)
+        # The first session is the load; the second, the first flush, fails
+        if len(attempts) == 2:
+            raise OperationalError("INSERT", {}, Exception("database is gone"))
+        return session_factory()
+
+    store = TraitStore(session_factory=flaky_factory)
+    await store.load("u1", character_id)
+    store.apply("u1", character_id, {"humor": 0.5})
+    assert await store.flush() == 0
+    assert store.stats()["dirty"] == 1 and store.flush_failures == 1
+
+    # Changes made while the write was failing go out with the retry
+    store.apply("u1", character_id, {"humor": 0.25})
+    assert await store.flush() == 1
+    assert store.stats()["dirty"] == 0
+    async with session_factory() as db:
+        row = (await db.scalars(select(AdaptiveTrait))).one()
+    assert row.humor == 0.75
+
+async def test_failed_load_never_overwrites_saved_traits(session_factory):
+    character_id = await _seed(session_factory)
+    saved = TraitStore(session_factory=session_factory)
+    await saved.load("u1", character_id)
+    saved.apply("u1", character_id, {"humor": 0.8})
+    await saved.flush()
+
+    reads = []
+
+    def flaky_factory():
+        reads.append(1)
+        if len(reads) == 1:
+            raise OperationalError("SELECT", {}, Exception("database is gone"))
+        return session_factory()
+
+    store = TraitStore(session_factory=flaky_factory)
+    assert await store.load("u1", character_id) == DEFAULT_TRAITS
+    assert store.load_failures == 1
+    store.apply("u1", character_id, {"humor": 0.1, "empathy": 0.2})
+    # Nothing is written for a pair whose saved values are unknown
+    assert await store.flush() == 0
+    assert store.stats()["unloaded"] == 1
+
+    # The next turn reads again and applies what it missed on top of the saved row
+    traits = await store.load("u1", character_id)
+    assert traits["humor"] == pytest.approx(0.9) and traits["empathy"] == pytest.approx(0.2)
+    assert await store.flush() == 1
+    async with session_factory() as db:
+        row = (await db.scalars(select(AdaptiveTrait))).one()
+    assert row.humor == pytest.approx(0.9)
+
+async def test_cache_is_bounded_but_keeps_unflushed_pairs(session_factory):
+    character_id = await _seed(session_factory, ("a", "b", "c", "d"))
+    store = TraitStore(session_factory=session_factory, max_pairs=2)
+    for user_id in ("a", "b", "c"):
+        await store.load(user_id, character_id)
+    assert store.stats()["pairs"] == 2 and store.evicted == 1
+
+    store.apply("b", character_id, {"humor": 0.1})
+    store.apply("c", character_id, {"humor": 0.1})
+    await store.load("d", character_id)
+    # Both cached pairs have changes waiting, so the cache runs over rather than lose them
+    assert store.stats()["pairs"] == 3
+    await store.flush()
+    assert store.stats()["pairs"] == 2
@@ -0,0 +1,103 @@
+# tests/test_user_cache.py
+
+from types import SimpleNamespace
+from sqlalchemy import event
+from app.schemas.schemas import UserCreate
+from app.services.db import user_cache
+from app.services.db.aio import AsyncUserManager
+from app.services.db.user_cache import UserCache, UserIdentity
+
+def _user(user_id="u1", email="u1@example.com"):
+    return SimpleNamespace(id=1, user_id=user_id, username=user_id, email=email, is_active=True, hashed_password="hash")
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_identity_is_reachable_by_every_key():
+    cache = UserCache(ttl=60, max_entries=10)
+    identity = cache.put(_user(), subject="u1@example.com")
+    assert identity == UserIdentity(1, "u1", "u1", "u1@example.com", True)
+    assert not hasattr(identity, "hashed_password")
+    assert cache.get("u1") is cache.get_by_email("u1@example.com") is cache.get_by_subject("u1@example.com") is identity
+    assert cache.get("u2") is None
+    assert (cache.hits, cache.misses) == (3, 1)
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(user_cache.time, "monotonic", clock)
+    cache = UserCache(ttl=60, max_entries=10)
+    cache.put(_user())
+    clock.now += 59
+    assert cache.get("u1") is not None
+    clock.now += 1
+    assert cache.get_by_email("u1@example.com") is None
+    assert cache.stats()["expirations"] == 1 and cache.stats()["entries"] == 0
+
+def test_invalidate_drops_every_key():
+    cache = UserCache(ttl=60, max_entries=10)
+    cache.put(_user(), subject="token-subject")
+    cache.invalidate("u1")
+    cache.invalidate("u1")
+    assert cache.get("u1") is None and cache.get_by_email("u1@example.com") is None and cache.get_by_subject("token-subject") is None
+    assert cache.invalidations == 1
+
+def test_changed_email_drops_the_old_subjects():
+    cache = UserCache(ttl=60, max_entries=10)
+    cache.put(_user(), subject="u1@example.com")
+    cache.put(_user(email="new@example.com"))
+    assert cache.get_by_email("u1@example.com") is None and cache.get_by_subject("u1@example.com") is None
+    assert cache.get_by_email("new@example.com").email == "new@example.com"
+
+def test_least_recently_used_entries_are_evicted():
+    cache = UserCache(ttl=60, max_entries=2)
+    cache.put(_user("a", "a@example.com"))
+    cache.put(_user("b", "b@example.com"))
+    cache.get("a")
+    cache.put(_user("c", "c@example.com"))
+    assert cache.get("b") is None and cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+def _count_queries(session_factory):
+    queries = []
+    event.listen(session_factory.kw["bind"].sync_engine, "before_cursor_execute", lambda *args: queries.append(args[2]))
+    return queries
+
+async def test_warm_lookups_make_no_queries(session_factory):
+    cache = UserCache(ttl=60, max_entries=10)
+    async with session_factory() as db:
+        identity = await AsyncUserManager(db, user_cache=cache).get_or_create_test_user("ignored", "tester", "tester@example.com", "password")
+    queries = _count_queries(session_factory)
+
+    async with session_factory() as db:
+        manager = AsyncUserManager(db, user_cache=cache)
+        assert await manager.get_or_create_test_user("ignored", "tester", "tester@example.com", "password") == identity
+        assert await manager.get_identity(identity.user_id) == identity
+    assert queries == []
+
+    # The auth path caches under the token subject on its first lookup
+    async with session_factory() as db:
+        manager = AsyncUserManager(db, user_cache=cache)
+        assert await manager.get_identity_by_token_subject("tester@example.com") == identity
+        assert await manager.get_identity_by_token_subject("nobody@example.com") is None
+        assert len(queries) == 2
+        assert await manager.get_identity_by_token_subject("tester@example.com") == identity
+    assert len(queries) == 2
+
+async def test_update_and_delete_invalidate(session_factory):
+    cache = UserCache(ttl=60, max_entries=10)
+    async with session_factory() as db:
+        manager = AsyncUserManager(db, user_cache=cache)
+        user = await manager.create_user(UserCreate(username="ana", email="ana@example.com", password="secret123"))
+        assert (await manager.get_identity_by_token_subject("ana@example.com")).username == "ana"
+
+        await manager.update_user(user.user_id, username="ana2")
+        assert cache.get(user.user_id) is None
+        assert (await manager.get_identity(user.user_id)).username == "ana2"
+
+        await manager.delete_user(user.user_id)
+        assert await manager.get_identity(user.user_id) is None
+        assert await manager.get_identity_by_token_subject("ana@example.com") is None